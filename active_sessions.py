@@ -0,0 +1,88 @@
+# active_sessions.py
+# In-process map of plate -> open parking_logs row (time_out IS NULL).
+#
+# The scan routes use it to decide entry vs. exit/transfer without a read
+# round trip. Every write they make is still guarded in SQL (NOT EXISTS /
+# time_out IS NULL), so a stale entry (e.g. a row written by another worker)
+# only costs one extra statement, and reconcile() repairs the drift.
+import threading
+
+
+class ActiveSessionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.warmed = False
+        self._stats = {"hits": 0, "misses": 0, "reconciles": 0, "repaired": 0}
+
+    @staticmethod
+    def _entry(log_id, area, time_in):
+        return {"id": log_id, "parking_area": area, "time_in": time_in}
+
+    # -----------------------------
+    # Loading / repair
+    # -----------------------------
+    def warm(self, rows):
+        sessions = {}
+        for row in rows:
+            # rows come ordered by id, so the newest open log wins
+            sessions[row["plate_number"]] = self._entry(
+                row["id"], row["parking_area"], row["time_in"]
+            )
+        with self._lock:
+            self._sessions = sessions
+            self.warmed = True
+
+    def reconcile(self, rows):
+        fresh = {}
+        for row in rows:
+            fresh[row["plate_number"]] = self._entry(
+                row["id"], row["parking_area"], row["time_in"]
+            )
+
+        with self._lock:
+            current = self._sessions
+            added = [p for p in fresh if p not in current]
+            removed = [p for p in current if p not in fresh]
+            changed = [p for p in fresh if p in current and current[p] != fresh[p]]
+
+            self._sessions = fresh
+            self.warmed = True
+            self._stats["reconciles"] += 1
+            self._stats["repaired"] += len(added) + len(removed) + len(changed)
+
+        return {"added": added, "removed": removed, "changed": changed}
+
+    # -----------------------------
+    # Lookups / updates
+    # -----------------------------
+    def get(self, plate):
+        with self._lock:
+            entry = self._sessions.get(plate)
+            self._stats["hits" if entry else "misses"] += 1
+            return dict(entry) if entry else None
+
+    def opened(self, plate, log_id, area, time_in):
+        with self._lock:
+            self._sessions[plate] = self._entry(log_id, area, time_in)
+
+    def moved(self, plate, area):
+        with self._lock:
+            entry = self._sessions.get(plate)
+            if entry:
+                entry["parking_area"] = area
+
+    def closed(self, plate):
+        with self._lock:
+            self._sessions.pop(plate, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["open_sessions"] = len(self._sessions)
+            s["warmed"] = self.warmed
+        return s
@@ -1,12 +1,35 @@
 # app.py (FULL FIXED VERSION WITH WORKING ADMIN LOGIN)
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g, has_app_context
+from flask import stream_template, Response
+import click
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 import psycopg2
 import psycopg2.extras
-import qrcode
+from contextlib import contextmanager
+from db_pool import ConnectionPool
+from ttl_cache import TTLCache
+from active_sessions import ActiveSessionIndex
+from occupancy_feed import OccupancyHub
+from overstay import OverstayMonitor
+import batch_scans
+import cooldown
+import exports
+import metrics
+import partitions
+import qr_cache
+import qr_sign
+import registration
+import rollups
+import scan_transactions
+import schema
+import threading
+import uuid
 import os
-from datetime import datetime, date
+import sys
+from datetime import datetime, date, timedelta
 import time
 import json
+import random
 
 app = Flask(__name__)
 app.secret_key = "ADMIN"
@@ -20,11 +43,42 @@ DB_NAME = "parking_system"
 DB_USER = "postgres"
 DB_PASS = "leyrosxvi"
 
+# Connection pool sizing (override with env vars on the gate servers)
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+DB_POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800))
+DB_POOL_HEALTH_CHECK = float(os.environ.get("DB_POOL_HEALTH_CHECK", 30))
+
 # -----------------------------
-# QR Code Folder
+# QR Codes
 # -----------------------------
+# images are rendered on demand by /qr/<plate>; this folder only holds the
+# PNGs written by older versions
 QR_FOLDER = os.path.join("static", "qrcodes")
-os.makedirs(QR_FOLDER, exist_ok=True)
+QR_CACHE_ITEMS = int(os.environ.get("QR_CACHE_ITEMS", 2048))
+# optional content-addressed disk cache shared by all workers (unset = memory only)
+QR_CACHE_DIR = os.environ.get("QR_CACHE_DIR") or None
+QR_MAX_AGE = int(os.environ.get("QR_MAX_AGE", 86400))
+# /qr/<plate> is served to admins, or through a link that only pages shown to
+# the plate's owner (registration) or a records viewer hand out, valid this long
+QR_LINK_TTL = int(os.environ.get("QR_LINK_TTL", 600))
+
+# QR payloads are signed (see qr_sign.py) with secrets from the environment:
+# QR_SIGNING_KEYS="k2=new,k1=old" keeps codes signed with k1 valid while new
+# ones are issued with QR_SIGNING_KID. With no keys configured, codes are
+# issued unsigned ("Plate: ...") and signed ones can't be verified.
+QR_SIGNING_KEYS = qr_sign.parse_keys(os.environ.get("QR_SIGNING_KEYS"))
+QR_SIGNING_KID = os.environ.get("QR_SIGNING_KID", next(iter(QR_SIGNING_KEYS), None))
+QR_VALID_DAYS = int(os.environ.get("QR_VALID_DAYS", 365))
+# a plate's payload (and so its image, ETag and disk cache file) changes once
+# per window of this many days; codes stay valid QR_VALID_DAYS or a bit longer
+QR_RENEW_DAYS = int(os.environ.get("QR_RENEW_DAYS", 30))
+# reject every unsigned plate (old stickers, typed plates) once everyone has a signed code
+QR_REQUIRE_SIGNED = os.environ.get("QR_REQUIRE_SIGNED", "0") == "1"
+
+if QR_REQUIRE_SIGNED and not QR_SIGNING_KEYS:
+    raise RuntimeError("QR_REQUIRE_SIGNED=1 needs QR_SIGNING_KEYS")
 
 # -----------------------------
 # Load Config (customizable home text)
@@ -51,37 +105,514 @@ def inject_config():
 # -----------------------------
 # Database Helper
 # -----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                minconn=DB_POOL_MIN,
+                maxconn=DB_POOL_MAX,
+                timeout=DB_POOL_TIMEOUT,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                health_check_after=DB_POOL_HEALTH_CHECK,
+                host=DB_HOST,
+                dbname=DB_NAME,
+                user=DB_USER,
+                password=DB_PASS
+            )
+    return _pool
+
+
+def get_db():
+    # one pooled connection per request, handed back in close_db()
+    if "db_conn" not in g:
+        g.db_conn = get_pool().getconn()
+    return g.db_conn
+
+
+@app.teardown_appcontext
+def close_db(exc):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        get_pool().putconn(conn, discard=conn.closed != 0)
+
+
 def query_db(query, args=(), fetch=True, one=False):
-    conn = None
+    # outside a request (CLI, background threads) borrow a connection just for this call
+    borrowed = not has_app_context()
+    conn = get_pool().getconn() if borrowed else get_db()
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur = conn.cursor(cursor_factory=metrics.TimedCursor)
         cur.execute(query, args)
 
-        if fetch:
-            data = cur.fetchall()
-            if one:
-                return data[0] if data else None
-            return data
+        data = cur.fetchall() if fetch else None
+        cur.close()
+        conn.commit()
+
+        if fetch and one:
+            return data[0] if data else None
+        return data
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if borrowed:
+            get_pool().putconn(conn)
+
 
+@contextmanager
+def db_transaction():
+    # several statements committed (or rolled back) together
+    borrowed = not has_app_context()
+    conn = get_pool().getconn() if borrowed else get_db()
+    cur = conn.cursor(cursor_factory=metrics.TimedCursor)
+    try:
+        yield cur
         conn.commit()
-        return None
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
     finally:
-        if conn:
-            conn.close()
+        cur.close()
+        if borrowed:
+            get_pool().putconn(conn)
+
+
+# -----------------------------
+# Instrumentation (Server-Timing, slow-query log, /metrics)
+# -----------------------------
+# Share of requests whose SQL is timed (Server-Timing header, slow-query and
+# slow-request logs, per-request DB histograms). Route latency and scan
+# outcomes are always counted; at 0 the cursor cost is one g lookup.
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", 1.0))
+metrics.SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", metrics.SLOW_QUERY_MS))
+metrics.SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", metrics.SLOW_REQUEST_MS))
+
+SCAN_ENDPOINTS = {"scan_area", "scan_qr_browser", "scan_batch"}
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    if METRICS_SAMPLE_RATE > 0 and (METRICS_SAMPLE_RATE >= 1 or random.random() < METRICS_SAMPLE_RATE):
+        g.sql = metrics.RequestSQL()
+
+
+def record_scan_outcomes(endpoint, response):
+    data = response.get_json(silent=True) if response.is_json else None
+    if endpoint == "scan_batch" and isinstance(data, dict) and "results" in data:
+        for result in data["results"]:
+            metrics.SCAN_OUTCOMES.inc(endpoint, (result or {}).get("status", "error"))
+        return
+    outcome = data.get("status") if isinstance(data, dict) else None
+    metrics.SCAN_OUTCOMES.inc(endpoint, outcome or ("error" if response.status_code >= 400 else "unknown"))
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    route = request.endpoint or "unmatched"
+    metrics.REQUEST_SECONDS.observe(elapsed, route, request.method, str(response.status_code))
+
+    stats = g.get("sql")
+    if stats is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(stats, elapsed)
+        metrics.SQL_QUERIES.observe(stats.count, route)
+        metrics.SQL_SECONDS.observe(stats.seconds, route)
+        metrics.log_slow_request(route, request.method, stats, elapsed)
+
+    if route in SCAN_ENDPOINTS:
+        record_scan_outcomes(route, response)
+    return response
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    for state, value in get_pool().stats().items():
+        if isinstance(value, (int, float)):
+            metrics.POOL.set(state, value=value)
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/stats")
+def stats():
+    # internals of the in-process caches, pool and background workers; the
+    # headline numbers are on /metrics
+    if "admin" not in session:
+        return redirect(url_for("admin_login"))
+
+    return jsonify({
+        "pool": get_pool().stats(),
+        "cooldown": scan_cooldown.stats(),
+        "lookup_cache": lookup_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "qr_cache": qr_images.stats(),
+        "active_sessions": active_sessions.stats(),
+        "occupancy_feed": occupancy_hub.stats(),
+        "overstay_monitor": overstay_monitor.stats(),
+    })
+
+
+# -----------------------------
+# Paging / streaming large tables
+# -----------------------------
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_ITERSIZE = 2000
+
+
+def page_args():
+    # ?after=<id> is the keyset cursor, ?limit= the page size
+    after = request.args.get("after", type=int)
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    return after, min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def keyset_page(select, after=None, limit=PAGE_SIZE, descending=True):
+    # select is "SELECT ... FROM table"; pages walk the primary key, so page N
+    # is an index range scan just like page 1 (no OFFSET)
+    op, order = ("<", "DESC") if descending else (">", "ASC")
+    if after is None:
+        rows = query_db(f"{select} ORDER BY id {order} LIMIT %s", (limit + 1,))
+    else:
+        rows = query_db(f"{select} WHERE id {op} %s ORDER BY id {order} LIMIT %s", (after, limit + 1))
+
+    next_after = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_after
+
+
+def stream_rows(query, args=(), itersize=STREAM_ITERSIZE):
+    # server-side (named) cursor: rows arrive itersize at a time, so memory
+    # stays flat however big the table is
+    conn = get_db()
+    cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}",
+                      cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.itersize = itersize
+    try:
+        cur.execute(query, args)
+        for row in cur:
+            yield row
+    finally:
+        cur.close()
+        conn.commit()
+
+
+def wants_stream():
+    return request.args.get("stream") == "1"
+
+
+# -----------------------------
+# CLI: schema + rollups
+# -----------------------------
+@app.cli.command("migrate")
+def migrate_command():
+    conn = get_pool().getconn()
+    try:
+        applied = schema.migrate(conn)
+    finally:
+        get_pool().putconn(conn)
+    print("Applied:", ", ".join(applied) if applied else "nothing, schema is up to date")
+
+
+@app.cli.command("check-indexes")
+def check_indexes_command():
+    conn = get_pool().getconn()
+    try:
+        results = schema.check_index_usage(conn)
+    finally:
+        get_pool().putconn(conn)
+
+    failed = 0
+    for label, indexed, node_types in results:
+        print(f"{'OK  ' if indexed else 'SEQ '} {label}: {' > '.join(node_types)}")
+        failed += not indexed
+
+    if failed:
+        raise SystemExit(f"{failed} quer{'y' if failed == 1 else 'ies'} not served by an index")
+
+
+@app.cli.command("recount-occupancy")
+def recount_occupancy_command():
+    query_db(schema.RECOUNT_OCCUPANCY_SQL, fetch=False)
+    invalidate_areas()
+    for area in query_db("SELECT area_code, capacity, current_count FROM parking_areas ORDER BY area_code"):
+        print(f"{area['area_code']}: {area['current_count']}/{area['capacity']}")
+
+
+@app.cli.command("rebuild-rollups")
+@click.option("--since", help="YYYY-MM: only rebuild from this month on "
+                              "(default: start of the log retention window)")
+def rebuild_rollups_command(since):
+    if since:
+        since = datetime.strptime(since, "%Y-%m").date()
+    else:
+        # older months may already be archived: keep their totals
+        since = partitions.retention_start(PARKING_LOGS_RETENTION_MONTHS)
+    with db_transaction() as cur:
+        days = rollups.rebuild(cur, since)
+    print(f"Rebuilt report rollups ({days} day/area rows)" + (f" from {since:%Y-%m}" if since else ""))
+
+
+# -----------------------------
+# parking_logs partitions (see partitions.py)
+# -----------------------------
+# Future months are created by a background thread in every web process; the
+# retention / archive step only runs from `flask maintain-partitions` (cron).
+PARKING_LOGS_RETENTION_MONTHS = int(os.environ.get("PARKING_LOGS_RETENTION_MONTHS", 24))   # 0 keeps everything
+PARKING_LOGS_ARCHIVE = os.environ.get("PARKING_LOGS_ARCHIVE", "file")
+PARKING_LOGS_ARCHIVE_DIR = os.environ.get("PARKING_LOGS_ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), "archive"))
+PARTITION_CHECK_SEC = 6 * 3600
+
+_partition_thread = None
+_partition_lock = threading.Lock()
+
+
+def partition_maintenance(fn, *args, **kwargs):
+    # partitions.py works on plain tuple cursors, in its own transaction
+    conn = get_pool().getconn()
+    cur = conn.cursor()
+    try:
+        if not partitions.is_partitioned(cur):
+            conn.rollback()
+            return None
+        result = fn(cur, *args, **kwargs)
+        conn.commit()
+        return result
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+        get_pool().putconn(conn)
+
+
+def _partition_loop():
+    # also the periodic cleanup: expired replay scan ids, stale QR images
+    while True:
+        try:
+            created = partition_maintenance(partitions.ensure_partitions)
+            if created:
+                app.logger.info("created parking_logs partitions: %s", ", ".join(created))
+        except Exception as e:
+            app.logger.warning("parking_logs partition check failed: %s", e)
+        try:
+            with db_transaction() as cur:
+                removed = scan_transactions.run(cur, scan_transactions.prune_scan_ids())
+            if removed:
+                app.logger.info("forgot %s replayed scan ids", removed)
+        except Exception as e:
+            app.logger.warning("processed_scans cleanup failed: %s", e)
+        if QR_CACHE_DIR:
+            try:
+                removed = qr_cache.prune(QR_CACHE_DIR, QR_RENEW_DAYS * 86400)
+                if removed:
+                    app.logger.info("removed %s stale QR images from %s", removed, QR_CACHE_DIR)
+            except Exception as e:
+                app.logger.warning("QR cache cleanup failed: %s", e)
+        time.sleep(PARTITION_CHECK_SEC)
+
+
+@app.before_request
+def start_partition_maintenance():
+    global _partition_thread
+    if _partition_thread is not None:
+        return
+    with _partition_lock:
+        if _partition_thread is None:
+            _partition_thread = threading.Thread(target=_partition_loop, name="partition-maintenance", daemon=True)
+            _partition_thread.start()
+
+
+@app.cli.command("maintain-partitions")
+@click.option("--keep-months", type=int, default=PARKING_LOGS_RETENTION_MONTHS, show_default=True,
+              help="months of logs kept in parking_logs (0 = no archiving)")
+@click.option("--mode", type=click.Choice(partitions.ARCHIVE_MODES), default=PARKING_LOGS_ARCHIVE, show_default=True)
+@click.option("--dir", "archive_dir", default=PARKING_LOGS_ARCHIVE_DIR, show_default=True,
+              help="where --mode file writes the .csv.gz archives")
+def maintain_partitions_command(keep_months, mode, archive_dir):
+    created = partition_maintenance(partitions.ensure_partitions)
+    if created is None:
+        raise SystemExit("parking_logs is not partitioned yet, run: flask migrate")
+    print("Created:", ", ".join(created) if created else "nothing, future months already exist")
+
+    if keep_months <= 0:
+        return
+    archived, skipped = partition_maintenance(
+        partitions.archive_expired, keep_months, mode=mode, archive_dir=archive_dir
+    )
+    for name, destination in archived:
+        print(f"Archived {name} -> {destination}")
+    for name in skipped:
+        print(f"Kept {name}: it still has open sessions")
+    if not archived and not skipped:
+        print(f"Nothing older than {keep_months} months to archive")
 
 
 # -----------------------------
 # Cooldown
 # -----------------------------
-scan_cooldown = {}
 COOLDOWN_SEC = 2.5
+COOLDOWN_MAX_KEYS = int(os.environ.get("COOLDOWN_MAX_KEYS", 100000))
+# "memory" (per worker) or "sqlite" (shared by all workers on this host)
+COOLDOWN_BACKEND = os.environ.get("COOLDOWN_BACKEND", "memory")
+COOLDOWN_DB = os.environ.get("COOLDOWN_DB", os.path.join(os.path.dirname(__file__), "cooldown.sqlite3"))
+
+scan_cooldown = cooldown.make_store(
+    COOLDOWN_BACKEND, COOLDOWN_SEC, max_size=COOLDOWN_MAX_KEYS, path=COOLDOWN_DB
+)
+
+
+# -----------------------------
+# Cached lookups (areas, dashboard)
+# -----------------------------
+# Per-process read-through cache. Writes in this process invalidate the keys
+# they affect; other workers catch up within the TTL.
+AREA_CACHE_TTL = float(os.environ.get("AREA_CACHE_TTL", 60))
+AREA_COUNTS_TTL = float(os.environ.get("AREA_COUNTS_TTL", 2))
+DASHBOARD_CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", 5))
+
+lookup_cache = TTLCache(AREA_CACHE_TTL, max_size=256)
+
+DASHBOARD_KEYS = ("kpis", "series", "lot_summary")
+
+
+def get_areas():
+    # area_code -> {area_code, area_name, capacity}
+    return lookup_cache.get_or_load("areas", lambda: {
+        row["area_code"]: row
+        for row in query_db("SELECT area_code, area_name, capacity FROM parking_areas ORDER BY area_code")
+    })
+
+
+def get_area(area_code):
+    return get_areas().get(area_code)
+
+
+def area_counts():
+    return lookup_cache.get_or_load("area_counts", lambda: {
+        row["area_code"]: row["current_count"]
+        for row in query_db("SELECT area_code, current_count FROM parking_areas")
+    }, ttl=AREA_COUNTS_TTL)
+
+
+def area_with_count(area):
+    return dict(area, current_count=area_counts().get(area["area_code"], 0))
+
+
+def invalidate_scans():
+    # a scan committed: occupancy and every dashboard figure may have moved
+    lookup_cache.invalidate("area_counts", *DASHBOARD_KEYS)
+
+
+def invalidate_registrations():
+    lookup_cache.invalidate("kpis")
+
+
+def invalidate_areas():
+    lookup_cache.invalidate("areas", "area_counts", *DASHBOARD_KEYS)
+
+
+def on_area_change(state):
+    # occupancy_feed notifications cover every worker: refresh area metadata
+    # when a lot was added or resized, counts on any change
+    area = get_areas().get(state["area_code"])
+    if area is None or area["capacity"] != state["capacity"]:
+        invalidate_areas()
+    else:
+        invalidate_scans()
+
+
+
+# -----------------------------
+# Active Sessions (plate -> open log)
+# -----------------------------
+ACTIVE_SESSION_RECONCILE_SEC = 60
+
+OPEN_SESSIONS_SQL = (
+    "SELECT id, plate_number, parking_area, time_in FROM parking_logs "
+    "WHERE time_out IS NULL ORDER BY id"
+)
 
+active_sessions = ActiveSessionIndex()
+_active_sessions_lock = threading.Lock()
+
+
+def reconcile_active_sessions():
+    return active_sessions.reconcile(query_db(OPEN_SESSIONS_SQL))
+
+
+def _reconcile_loop():
+    while True:
+        time.sleep(ACTIVE_SESSION_RECONCILE_SEC)
+        try:
+            drift = reconcile_active_sessions()
+            fixed = sum(len(v) for v in drift.values())
+            if fixed:
+                app.logger.warning("active session index repaired %s plates: %s", fixed, drift)
+        except Exception as e:
+            app.logger.warning("active session reconcile failed: %s", e)
+
+
+def ensure_active_sessions():
+    if active_sessions.warmed:
+        return
+    with _active_sessions_lock:
+        if active_sessions.warmed:
+            return
+        active_sessions.warm(query_db(OPEN_SESSIONS_SQL))
+        threading.Thread(target=_reconcile_loop, name="session-reconcile", daemon=True).start()
+
+
+# The scan transactions themselves (SQL, guards, lock order) are in
+# scan_transactions.py, shared with scan_service.py.
+def toggle_plate(plate, now, scan_id=None):
+    ensure_active_sessions()
+    inside = active_sessions.get(plate) is not None
+
+    with db_transaction() as cur:
+        result = scan_transactions.run(cur, scan_transactions.toggle(plate, now, inside, scan_id))
+    if result["status"] == "ignored":
+        return "ignored"
+    invalidate_scans()
+
+    if result["status"] == "entered":
+        active_sessions.opened(plate, result["log"]["id"], None, now)
+    else:
+        active_sessions.closed(plate)
+    return result["status"]
+
+
+def scan_time(value):
+    # a scan's own timestamp (spooled / buffered scans), as naive local time
+    when = datetime.fromisoformat(value) if value else datetime.now()
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+def replayed_scan(payload):
+    # A replayed spool (own `time` / `scan_id`) sends an entry and an exit
+    # read hours apart back-to-back, so the wall-clock cooldown is for live
+    # scans only: the scanner applied its cooldown when it read them, and
+    # scan_id dedupes retries in the transaction.
+    return bool(payload.get("time") or payload.get("scan_id"))
+
+
+def duplicate_scan(key, payload):
+    return not replayed_scan(payload) and scan_cooldown.hit(key)
 
 
 # -----------------------------
@@ -96,6 +627,40 @@ def extract_plate(qr_text: str):
     return first_line
 
 
+qr_signer = qr_sign.Signer(QR_SIGNING_KEYS, QR_SIGNING_KID) if QR_SIGNING_KEYS else None
+if qr_signer is None:
+    app.logger.warning("QR_SIGNING_KEYS is not set: issuing unsigned QR codes")
+
+
+def qr_payload(plate_number):
+    # valid for at least QR_VALID_DAYS, so downloading the code again renews it
+    if qr_signer is None:
+        return f"Plate: {plate_number}"
+    return qr_signer.sign(plate_number, qr_sign.expiry(date.today(), QR_VALID_DAYS, QR_RENEW_DAYS))
+
+
+def read_plate(payload):
+    # camera scans arrive as qr_text, typed plates as plate_number. Signed
+    # payloads must verify; anything unsigned is only accepted while
+    # QR_REQUIRE_SIGNED is off. Returns (plate, None) or (None, reason) - no
+    # DB access.
+    text = (payload.get("qr_text") or payload.get("plate_number") or "").strip()
+
+    if qr_sign.is_signed(text):
+        if qr_signer is None:
+            return None, "QR signing is not configured"
+        try:
+            plate, _ = qr_signer.verify(text)
+        except qr_sign.InvalidQR as e:
+            return None, str(e)
+        return plate, None
+
+    plate = extract_plate(text).strip()
+    if plate and QR_REQUIRE_SIGNED:
+        return None, "Unsigned QR code"
+    return plate, None
+
+
 
 # -----------------------------
 # Registration
@@ -110,7 +675,16 @@ def register():
         id_number = request.form.get("id_number")
         vehicle_type = request.form.get("vehicle_type")
         mobile_no = request.form.get("mobile_no")
-        plate_number = request.form.get("plate_number")
+        plate_number = (request.form.get("plate_number") or "").strip()
+
+        problem = registration.plate_problem(plate_number)
+        if problem:
+            return render_template(
+                "index.html",
+                message=problem,
+                left_text=left_text,
+                right_text=right_text
+            )
 
         try:
             query_db(
@@ -126,10 +700,7 @@ def register():
                 left_text=left_text,
                 right_text=right_text
             )
-
-        qr_data = f"Plate: {plate_number}\nValid Until: {datetime.now().strftime('%Y-%m-%d')}"
-        img = qrcode.make(qr_data)
-        img.save(os.path.join(QR_FOLDER, f"{plate_number}.png"))
+        invalidate_registrations()
 
         return render_template("success.html", plate_number=plate_number)
 
@@ -141,6 +712,127 @@ def register():
 
 
 
+# -----------------------------
+# QR images
+# -----------------------------
+qr_images = qr_cache.QRCache(max_items=QR_CACHE_ITEMS, disk_dir=QR_CACHE_DIR)
+qr_links = URLSafeTimedSerializer(app.secret_key, salt="qr-image")
+
+
+@app.template_global()
+def qr_image_url(plate, **args):
+    return url_for("qr_image", plate=plate, t=qr_links.dumps(plate), **args)
+
+
+def may_view_qr(plate):
+    if "admin" in session:
+        return True
+    token = request.args.get("t")
+    if not token:
+        return False
+    try:
+        return qr_links.loads(token, max_age=QR_LINK_TTL) == plate
+    except BadSignature:
+        return False
+
+
+@app.route("/qr/<plate>")
+def qr_image(plate):
+    if not may_view_qr(plate):
+        return "Forbidden", 403
+
+    fmt = request.args.get("format", "png")
+    if fmt not in qr_cache.FORMATS:
+        return f"Unknown format '{fmt}'", 400
+
+    user = query_db(
+        "SELECT plate_number FROM users WHERE plate_number = %s LIMIT 1",
+        (plate,), one=True
+    )
+    if not user:
+        return "Not registered", 404
+
+    payload = qr_payload(user["plate_number"])
+    etag = qr_cache.content_key(payload, fmt)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        _, data = qr_images.get(payload, fmt)
+        response = Response(data, mimetype=qr_cache.FORMATS[fmt])
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = QR_MAX_AGE
+    return response
+
+
+# -----------------------------
+# Bulk registration import
+# -----------------------------
+QR_WORKERS = int(os.environ.get("QR_WORKERS", os.cpu_count() or 1))
+
+
+def bulk_register_csv(text, workers=QR_WORKERS):
+    rows, errors = registration.parse_csv(text)
+    with db_transaction() as cur:
+        inserted, conflicts = registration.import_rows(cur, rows)
+    invalidate_registrations()
+
+    errors += [
+        {"line": row["line"], "plate_number": row["plate_number"], "error": "plate already registered"}
+        for row in conflicts
+    ]
+    errors.sort(key=lambda e: e["line"])
+    if qr_images.disk_dir:
+        qr_cache.prewarm(
+            [qr_payload(plate) for plate, _ in inserted],
+            qr_images.disk_dir, workers=workers
+        )
+    return [plate for plate, _ in inserted], errors
+
+
+@app.route("/bulk_register", methods=["GET", "POST"])
+def bulk_register():
+    if "admin" not in session:
+        return redirect(url_for("admin_login"))
+
+    if request.method == "GET":
+        return render_template("bulk_register.html")
+
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return render_template("bulk_register.html", error="Choose a CSV file to import"), 400
+
+    try:
+        text = upload.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return render_template("bulk_register.html", error="CSV must be UTF-8"), 400
+
+    started = time.perf_counter()
+    inserted, errors = bulk_register_csv(text)
+    return render_template(
+        "bulk_register.html",
+        inserted=inserted,
+        errors=errors,
+        elapsed=round(time.perf_counter() - started, 2)
+    )
+
+
+@app.cli.command("import-users")
+@click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", type=int, default=QR_WORKERS, help="QR generation processes")
+def import_users_command(csv_path, workers):
+    with open(csv_path, encoding="utf-8-sig") as f:
+        text = f.read()
+
+    started = time.perf_counter()
+    inserted, errors = bulk_register_csv(text, workers=workers)
+    for err in errors:
+        print(f"line {err['line']}: {err['plate_number'] or '-'}: {err['error']}")
+    print(f"Registered {len(inserted)} vehicle(s), {len(errors)} rejected, "
+          f"{time.perf_counter() - started:.2f}s")
+
+
 # -----------------------------
 # ADMIN LOGIN (FIXED)
 # -----------------------------
@@ -193,9 +885,19 @@ def records():
     if "validated" not in session:
         return redirect(url_for("records_password"))
 
-    users = query_db("SELECT * FROM users")
-    session.pop("validated", None)
-    return render_template("records.html", users=users)
+    if wants_stream():
+        session.pop("validated", None)
+        return stream_template(
+            "records.html", users=stream_rows("SELECT * FROM users ORDER BY id")
+        )
+
+    after, limit = page_args()
+    users, next_after = keyset_page("SELECT * FROM users", after, limit, descending=False)
+
+    # stay unlocked while paging; the password is asked again after the last page
+    if next_after is None:
+        session.pop("validated", None)
+    return render_template("records.html", users=users, next_after=next_after)
 
 
 
@@ -208,8 +910,14 @@ def records():
 # -----------------------------
 @app.route("/logs")
 def logs():
-    logs = query_db("SELECT * FROM parking_logs ORDER BY id DESC")
-    return render_template("logs.html", logs=logs)
+    if wants_stream():
+        return stream_template(
+            "logs.html", logs=stream_rows("SELECT * FROM parking_logs ORDER BY id DESC")
+        )
+
+    after, limit = page_args()
+    logs, next_after = keyset_page("SELECT * FROM parking_logs", after, limit)
+    return render_template("logs.html", logs=logs, next_after=next_after)
 
 
 
@@ -221,34 +929,23 @@ def entry_exit():
     message = ""
 
     if request.method == "POST":
-        plate = request.form.get("plate_number")
+        # same check as the scan endpoints: with QR_REQUIRE_SIGNED a typed
+        # plate is refused, only a signed payload pasted from a code passes
+        plate, rejected = read_plate(request.form)
         now = datetime.now()
 
-        last_log = query_db(
-            "SELECT id, time_out FROM parking_logs WHERE plate_number=%s "
-            "ORDER BY id DESC LIMIT 1",
-            (plate,)
-        )
-
-        entering = (not last_log) or (last_log[0]["time_out"] is not None)
-
-        try:
-            if entering:
-                query_db(
-                    "INSERT INTO parking_logs (plate_number, time_in) VALUES (%s,%s)",
-                    (plate, now),
-                    fetch=False
-                )
-                message = f"{plate} entered at {now}"
-            else:
-                query_db(
-                    "UPDATE parking_logs SET time_out=%s WHERE plate_number=%s AND time_out IS NULL",
-                    (now, plate),
-                    fetch=False
-                )
-                message = f"{plate} exited at {now}"
-        except Exception as e:
-            message = f"DB error: {e}"
+        if rejected:
+            message = f"Rejected: {rejected}"
+        elif not plate:
+            message = "No plate found"
+        else:
+            try:
+                if toggle_plate(plate, now) == "entered":
+                    message = f"{plate} entered at {now}"
+                else:
+                    message = f"{plate} exited at {now}"
+            except Exception as e:
+                message = f"DB error: {e}"
 
     return render_template("entry_exit.html", message=message)
 
@@ -259,42 +956,29 @@ def entry_exit():
 # -----------------------------
 @app.route("/scan_qr_browser", methods=["POST"])
 def scan_qr_browser():
+    # scanners replaying their spool send the original `time` and a `scan_id`,
+    # so a retried scan is applied once, at the time it was read
     payload = request.get_json() or {}
-    plate = extract_plate(payload.get("plate_number", "")).strip()
-    now = datetime.now()
+    plate, rejected = read_plate(payload)
 
+    if rejected:
+        return jsonify({"status": "rejected", "message": rejected}), 403
     if not plate:
         return jsonify({"status": "error", "message": "No plate found"}), 400
 
-    t = time.time()
-    if t - scan_cooldown.get(plate, 0) < COOLDOWN_SEC:
-        return jsonify({"status": "ignored", "message": "Duplicate scan"}), 200
-
-    scan_cooldown[plate] = t
-
     try:
-        last_log = query_db(
-            "SELECT id, time_out FROM parking_logs WHERE plate_number=%s "
-            "ORDER BY id DESC LIMIT 1",
-            (plate,)
-        )
+        now = scan_time(payload.get("time"))
+    except (ValueError, TypeError):
+        return jsonify({"status": "error", "message": "Invalid time"}), 400
 
-        entering = (not last_log) or (last_log[0]["time_out"] is not None)
+    if duplicate_scan(plate, payload):
+        return jsonify({"status": "ignored", "message": "Duplicate scan"}), 200
 
-        if entering:
-            query_db(
-                "INSERT INTO parking_logs (plate_number, time_in) VALUES (%s,%s)",
-                (plate, now),
-                fetch=False
-            )
-            return jsonify({"status": "entered", "plate": plate, "time": str(now)})
-        else:
-            query_db(
-                "UPDATE parking_logs SET time_out=%s WHERE plate_number=%s AND time_out IS NULL",
-                (now, plate),
-                fetch=False
-            )
-            return jsonify({"status": "exited", "plate": plate, "time": str(now)})
+    try:
+        status = toggle_plate(plate, now, payload.get("scan_id"))
+        if status == "ignored":
+            return jsonify({"status": "ignored", "message": "Already applied", "plate": plate}), 200
+        return jsonify({"status": status, "plate": plate, "time": str(now)})
 
     except Exception as e:
         return jsonify({"status": "error", "message": f"DB error: {e}"}), 500
@@ -308,11 +992,14 @@ def scan_qr_browser():
 # -----------------------------
 @app.route("/history")
 def history():
-    logs = query_db(
-        "SELECT id, plate_number, time_in, time_out, parking_area "
-        "FROM parking_logs ORDER BY id DESC"
-    )
-    return render_template("history.html", logs=logs)
+    select = "SELECT id, plate_number, time_in, time_out, parking_area FROM parking_logs"
+
+    if wants_stream():
+        return stream_template("history.html", logs=stream_rows(f"{select} ORDER BY id DESC"))
+
+    after, limit = page_args()
+    logs, next_after = keyset_page(select, after, limit)
+    return render_template("history.html", logs=logs, next_after=next_after)
 
 
 
@@ -322,10 +1009,7 @@ def history():
 # -----------------------------
 @app.route("/select_area")
 def select_area():
-    areas = query_db(
-        "SELECT area_code, area_name, capacity, current_count "
-        "FROM parking_areas ORDER BY area_code"
-    )
+    areas = [area_with_count(a) for a in get_areas().values()]
     return render_template("select_area.html", areas=areas)
 
 
@@ -336,17 +1020,63 @@ def select_area():
 # -----------------------------
 @app.route("/scanner/<area_code>")
 def scanner_page(area_code):
-    area = query_db(
-        "SELECT area_code, area_name, capacity, current_count FROM parking_areas WHERE area_code=%s",
-        (area_code,), one=True
-    )
+    area = get_area(area_code)
 
     if not area:
         return "Area not found", 404
+    area = area_with_count(area)
 
     return render_template("scanner.html", area=area)
 
 
+# -----------------------------
+# Live occupancy (SSE)
+# -----------------------------
+OCCUPANCY_HEARTBEAT_SEC = 15
+
+
+def connect_listener():
+    # LISTEN needs its own long-lived connection, so this one is not pooled
+    return psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
+
+
+occupancy_hub = OccupancyHub(
+    connect_listener,
+    lambda: query_db("SELECT area_code, capacity, current_count FROM parking_areas"),
+    on_change=on_area_change
+)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.route("/occupancy/stream")
+def occupancy_stream():
+    # ?area=A&area=B to watch specific areas, nothing for all of them
+    areas = request.args.getlist("area") or None
+    occupancy_hub.start()
+    sub = occupancy_hub.subscribe(areas)
+
+    def events():
+        try:
+            yield "retry: 3000\n" + sse("snapshot", occupancy_hub.snapshot(areas))
+            while True:
+                changes = sub.wait(OCCUPANCY_HEARTBEAT_SEC)
+                if not changes:
+                    yield ": ping\n\n"
+                for change in changes:
+                    yield sse("occupancy", change)
+        finally:
+            occupancy_hub.unsubscribe(sub)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 
 
 # -----------------------------
@@ -355,84 +1085,76 @@ def scanner_page(area_code):
 @app.route("/scan_area/<area_code>", methods=["POST"])
 def scan_area(area_code):
     payload = request.get_json() or {}
-    plate_raw = payload.get("qr_text", "") or payload.get("plate_number", "")
-    plate = extract_plate(plate_raw).strip()
+    plate, rejected = read_plate(payload)
     now = datetime.now()
 
+    if rejected:
+        return jsonify({"status": "rejected", "message": rejected}), 403
     if not plate:
         return jsonify({"status": "error", "message": "No plate found"}), 400
 
-    key = (area_code, plate)
-    t = time.time()
-
-    if t - scan_cooldown.get(key, 0) < COOLDOWN_SEC:
+    if scan_cooldown.hit(f"{area_code}|{plate}"):
         return jsonify({"status": "ignored", "message": "Duplicate scan"}), 200
 
-    scan_cooldown[key] = t
-
     try:
-        area_info = query_db(
-            "SELECT area_name, capacity, current_count FROM parking_areas WHERE area_code=%s",
-            (area_code,), one=True
-        )
+        area_info = get_area(area_code)
 
         if not area_info:
             return jsonify({"status": "error", "message": "Unknown area"}), 404
 
         name = area_info["area_name"]
-        cap = area_info["capacity"]
-        count = area_info["current_count"]
+        leaving = payload.get("action") == "exit"
 
-        # Check last parking status
-        last_log = query_db(
-            "SELECT id, time_out FROM parking_logs WHERE plate_number=%s ORDER BY id DESC LIMIT 1",
-            (plate,)
-        )
+        ensure_active_sessions()
+        known = active_sessions.get(plate)
 
-        # If vehicle is currently inside ANY parking area → update only parking_area
-        if last_log and last_log[0]["time_out"] is None:
-
-            query_db(
-                "UPDATE parking_logs SET parking_area=%s WHERE id=%s",
-                (area_code, last_log[0]["id"]),
-                fetch=False
+        with db_transaction() as cur:
+            result = scan_transactions.run(
+                cur, scan_transactions.admit(plate, area_code, now, known, leaving=leaving)
             )
+        invalidate_scans()
 
+        status = result["status"]
+
+        if status == "exited":
+            active_sessions.closed(plate)
             return jsonify({
-                "status": "updated",
+                "status": "exited",
                 "plate": plate,
                 "area": area_code,
                 "area_name": name,
-                "time": str(now),
-                "note": "Vehicle already inside, parking area updated."
+                "time": str(now)
             })
 
-        # Vehicle is entering
-        else:
-            if count >= cap:
-                return jsonify({"status": "full", "message": f"{name} is full"}), 200
+        if status == "not_inside":
+            active_sessions.closed(plate)
+            return jsonify({"status": "ignored", "message": f"{plate} is not parked"}), 200
 
-            query_db(
-                "INSERT INTO parking_logs (plate_number, time_in, parking_area) VALUES (%s,%s,%s)",
-                (plate, now, area_code),
-                fetch=False
-            )
+        if status == "full":
+            return jsonify({"status": "full", "message": f"{name} is full"}), 200
 
-            query_db(
-                "UPDATE parking_areas SET current_count = current_count + 1 WHERE area_code=%s",
-                (area_code,),
-                fetch=False
-            )
+        log = result["log"]
+        active_sessions.opened(plate, log["id"], area_code, log.get("time_in", now))
 
+        if status == "updated":
             return jsonify({
-                "status": "entered",
+                "status": "updated",
                 "plate": plate,
                 "area": area_code,
                 "area_name": name,
-                "occupancy": count + 1,
-                "time": str(now)
+                "time": str(now),
+                "note": "Vehicle already inside, parking area updated."
             })
 
+        return jsonify({
+            "status": "entered",
+            "plate": plate,
+            "area": area_code,
+            "area_name": name,
+            "occupancy": result["occupancy"],
+            "time": str(now)
+        })
+
     except Exception as e:
         return jsonify({"status": "error", "message": f"DB error: {e}"}), 500
 
@@ -440,6 +1162,87 @@ def scan_area(area_code):
 
 
 
+# -----------------------------
+# Batch Scan (offline gate buffers)
+# -----------------------------
+BATCH_MAX_SCANS = 5000
+
+
+def parse_batch_item(item, default_area):
+    if not isinstance(item, dict):
+        raise ValueError("scan must be an object")
+
+    plate, rejected = read_plate(item)
+    if rejected:
+        raise ValueError(rejected)
+    if not plate:
+        raise ValueError("No plate found")
+
+    area_code = item.get("area_code") or default_area
+    if not area_code:
+        raise ValueError("No area_code")
+
+    return {
+        "plate": plate,
+        "area_code": area_code,
+        "time": scan_time(item.get("time")),
+        "action": item.get("action"),
+        "scan_id": item.get("scan_id")
+    }
+
+
+@app.route("/scan_batch", methods=["POST"])
+def scan_batch():
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        items, default_area = payload.get("scans"), payload.get("area_code")
+    else:
+        items, default_area = payload, None
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "message": "Expected a non-empty list of scans"}), 400
+    if len(items) > BATCH_MAX_SCANS:
+        return jsonify({"status": "error", "message": f"At most {BATCH_MAX_SCANS} scans per batch"}), 413
+
+    results = [None] * len(items)
+    scans, positions = [], []
+    for i, item in enumerate(items):
+        try:
+            scans.append(parse_batch_item(item, default_area))
+            positions.append(i)
+        except (ValueError, TypeError) as e:
+            results[i] = {"status": "error", "message": str(e)}
+
+    try:
+        if scans:
+            with db_transaction() as cur:
+                applied, sessions = batch_scans.apply_batch(cur, scans, COOLDOWN_SEC)
+            invalidate_scans()
+
+            for i, result in zip(positions, applied):
+                results[i] = result
+
+            ensure_active_sessions()
+            for plate, sess in sessions.items():
+                if sess.time_out is None:
+                    active_sessions.opened(plate, sess.id, sess.area, sess.time_in)
+                else:
+                    active_sessions.closed(plate)
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"DB error: {e}"}), 500
+
+    summary = {}
+    for i, result in enumerate(results):
+        result["index"] = i
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+    return jsonify({"results": results, "summary": summary})
+
+
+
+
+
 # -----------------------------
 # Delete Vehicle
 # -----------------------------
@@ -451,7 +1254,9 @@ def delete_vehicle(plate_number):
             (plate_number,),
             fetch=False
         )
+        invalidate_registrations()
 
+        # pre-on-demand registrations still have a PNG on disk
         qr_path = os.path.join(QR_FOLDER, f"{plate_number}.png")
         if os.path.exists(qr_path):
             os.remove(qr_path)
@@ -461,8 +1266,8 @@ def delete_vehicle(plate_number):
     except Exception as e:
         message = f"Error deleting vehicle: {e}"
 
-    users = query_db("SELECT * FROM users")
-    return render_template("records.html", users=users, message=message)
+    users, next_after = keyset_page("SELECT * FROM users", limit=PAGE_SIZE, descending=False)
+    return render_template("records.html", users=users, message=message, next_after=next_after)
 
 
 
@@ -471,36 +1276,92 @@ def delete_vehicle(plate_number):
 # -----------------------------
 # Search endpoint
 # -----------------------------
+SEARCH_LIMIT = 200
+# typeahead repeats the same prefixes a lot; results may be this many seconds stale
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", 5))
+SEARCH_MIN_SUBSTRING = 3    # pg_trgm can't serve shorter substring patterns
+
+search_cache = TTLCache(SEARCH_CACHE_TTL, max_size=4096)
+
+
+def like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_logs_sql(q, limit):
+    # (sql, args) shared with the async scan service
+    cols = "id, plate_number, time_in, time_out, parking_area"
+    args = {"prefix": like_escape(q.upper()) + "%", "limit": limit}
+
+    # plate prefix uses idx_parking_logs_plate_prefix, substring the trigram index
+    parts = [
+        f"(SELECT {cols} FROM parking_logs WHERE upper(plate_number) LIKE %(prefix)s "
+        "ORDER BY id DESC LIMIT %(limit)s)"
+    ]
+    if len(q) >= SEARCH_MIN_SUBSTRING:
+        args["like"] = "%" + like_escape(q) + "%"
+        parts.append(
+            f"(SELECT {cols} FROM parking_logs WHERE plate_number ILIKE %(like)s "
+            "ORDER BY id DESC LIMIT %(limit)s)"
+        )
+    # exact log id: primary key lookup instead of CAST(id AS TEXT)
+    if q.isdigit() and len(q) < 19:
+        args["id"] = int(q)
+        parts.append(f"(SELECT {cols} FROM parking_logs WHERE id = %(id)s)")
+
+    return " UNION ".join(parts) + " ORDER BY id DESC LIMIT %(limit)s", args
+
+
+def search_vehicles_sql(q, limit):
+    cols = "plate_number, full_name, vehicle_type, mobile_no"
+    args = {"prefix": like_escape(q.upper()) + "%", "like": "%" + like_escape(q) + "%", "limit": limit}
+
+    parts = [f"(SELECT {cols} FROM users WHERE upper(plate_number) LIKE %(prefix)s LIMIT %(limit)s)"]
+    if len(q) >= SEARCH_MIN_SUBSTRING:
+        parts.append(f"(SELECT {cols} FROM users WHERE plate_number ILIKE %(like)s LIMIT %(limit)s)")
+    parts.append(f"(SELECT {cols} FROM users WHERE full_name ILIKE %(like)s LIMIT %(limit)s)")
+
+    return " UNION ".join(parts) + " ORDER BY plate_number LIMIT %(limit)s", args
+
+
+def search_logs(q, limit):
+    return query_db(*search_logs_sql(q, limit))
+
+
+def search_vehicles(q, limit):
+    return query_db(*search_vehicles_sql(q, limit))
+
+
+def search_params(q, limit=None):
+    # normalised (q, limit) from the query string, as used for the cache key
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = SEARCH_LIMIT
+    return " ".join((q or "").split()), min(max(limit, 1), SEARCH_LIMIT)
+
+
 @app.route("/search")
 def search():
-    q = request.args.get("q", "").strip()
+    q, limit = search_params(request.args.get("q"), request.args.get("limit"))
     if not q:
         return jsonify({"logs": [], "vehicles": []})
 
-    like = f"%{q}%"
+    key = (q.lower(), limit)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return jsonify(cached)
 
     try:
-        logs = query_db(
-            "SELECT id, plate_number, time_in, time_out, parking_area FROM parking_logs "
-            "WHERE plate_number ILIKE %s OR CAST(id AS TEXT)=%s "
-            "ORDER BY id DESC LIMIT 200",
-            (like, q)
-        )
-
-        vehicles = query_db(
-            "SELECT plate_number, full_name, vehicle_type, mobile_no FROM users "
-            "WHERE plate_number ILIKE %s OR full_name ILIKE %s "
-            "ORDER BY plate_number LIMIT 200",
-            (like, like)
-        )
-
+        result = {
+            "logs": search_logs(q, limit) or [],
+            "vehicles": search_vehicles(q, limit) or []
+        }
     except Exception as e:
         return jsonify({"error": str(e), "logs": [], "vehicles": []}), 500
 
-    return jsonify({
-        "logs": logs if logs else [],
-        "vehicles": vehicles if vehicles else []
-    })
+    search_cache.set(key, result)
+    return jsonify(result)
 
 
 
@@ -508,163 +1369,156 @@ def search():
 
 
 # -----------------------------
-# Admin Dashboard (unchanged)
+# Dashboard Statistics
 # -----------------------------
-@app.route("/admin_dashboard")
-def admin_dashboard():
-
-    if "admin" not in session:
-        return redirect(url_for("admin_login"))
-
-    # ------------------------------------
-    # SUMMARY COUNTS
-    # ------------------------------------
-    users_today = query_db(
-        "SELECT COUNT(*) AS count FROM users WHERE DATE(created_at) = CURRENT_DATE",
-        one=True
-    )["count"]
-
-    total_registered = query_db(
-        "SELECT COUNT(*) AS count FROM users",
-        one=True
-    )["count"]
-
-    active_parked = query_db(
-        "SELECT COUNT(*) AS count FROM parking_logs WHERE time_out IS NULL",
-        one=True
-    )["count"]
-
-    entries_today = query_db(
-        "SELECT COUNT(*) AS count FROM parking_logs WHERE DATE(time_in) = CURRENT_DATE",
-        one=True
-    )["count"]
-
-    exits_today = query_db(
-        "SELECT COUNT(*) AS count FROM parking_logs WHERE DATE(time_out) = CURRENT_DATE",
-        one=True
-    )["count"]
-
-    overstay = query_db("""
-        SELECT plate_number
-        FROM parking_logs
-        WHERE time_out IS NULL 
-        AND DATE(time_in) < CURRENT_DATE
+DAILY_REPORT_DAYS = 30
+
+
+def dashboard_kpis():
+    return lookup_cache.get_or_load("kpis", load_dashboard_kpis, ttl=DASHBOARD_CACHE_TTL)
+
+
+def load_dashboard_kpis():
+    # every summary card in one round trip; each count is a half-open range
+    # (or partial index) lookup so the indexes from schema.py can serve it
+    return query_db("""
+        SELECT
+            (SELECT COUNT(*) FROM users
+              WHERE created_at >= CURRENT_DATE
+                AND created_at <  CURRENT_DATE + 1)          AS users_today,
+            (SELECT COUNT(*) FROM users)                     AS total_registered,
+            (SELECT COUNT(*) FROM parking_logs
+              WHERE time_out IS NULL)                        AS active_parked,
+            (SELECT COUNT(*) FROM parking_logs
+              WHERE time_in >= CURRENT_DATE
+                AND time_in <  CURRENT_DATE + 1)             AS entries_today,
+            (SELECT COUNT(*) FROM parking_logs
+              WHERE time_out >= CURRENT_DATE
+                AND time_out <  CURRENT_DATE + 1)            AS exits_today,
+            (SELECT COUNT(DISTINCT log_id) FROM overstay_alerts
+              WHERE resolved_at IS NULL)                     AS overstay_count
+    """, one=True)
+
+
+def dashboard_series():
+    return lookup_cache.get_or_load("series", load_dashboard_series, ttl=DASHBOARD_CACHE_TTL)
+
+
+def load_dashboard_series():
+    # read from the rollup tables (see rollups.py): one row per day / month
+    daily_report = query_db("""
+        SELECT day AS date, SUM(entries) AS entries, SUM(exits) AS exits
+        FROM parking_daily_stats
+        GROUP BY day
+        HAVING SUM(entries) > 0
+        ORDER BY day DESC
+        LIMIT %s
+    """, (DAILY_REPORT_DAYS,))
+
+    monthly_report = query_db("""
+        SELECT TO_CHAR(month, 'YYYY-MM') AS month,
+               SUM(entries) AS entries, SUM(exits) AS exits
+        FROM parking_monthly_stats
+        GROUP BY parking_monthly_stats.month
+        HAVING SUM(entries) > 0
+        ORDER BY parking_monthly_stats.month DESC
     """)
-    overstay_count = len(overstay)
 
-    # ------------------------------------
-    # PARKING LOT SUMMARY
-    # ------------------------------------
-    areas = query_db(
-        "SELECT area_code, area_name, capacity FROM parking_areas ORDER BY area_code"
-    )
+    return daily_report, monthly_report
 
-    active_logs = query_db(
-        "SELECT plate_number, parking_area FROM parking_logs WHERE time_out IS NULL"
-    )
-
-    # Build mapping: area -> plates inside
-    area_occupants = {area["area_code"]: [] for area in areas}
 
-    for log in active_logs:
-        if log["parking_area"] in area_occupants:
-            area_occupants[log["parking_area"]].append(log["plate_number"])
+def parking_lot_summary():
+    return lookup_cache.get_or_load("lot_summary", load_parking_lot_summary, ttl=DASHBOARD_CACHE_TTL)
 
-    # Build final parking_lots list using correct field names
-    parking_lots = []
-    for area in areas:
-        code = area["area_code"]
 
-        parking_lots.append({
-            "area_code": code,                       # ⭐ FIXED
-            "name": f"Lot {code}",
+def load_parking_lot_summary():
+    # one row per area from the parking_area_occupancy view (schema 009): the
+    # live counter plus the newest plates, never the full list of open logs
+    return [
+        {
+            "area_code": area["area_code"],
+            "name": f"Lot {area['area_code']}",
             "area_name": area["area_name"],
             "capacity": area["capacity"],
-            "current_count": len(area_occupants[code]),
-            "parked_today": area_occupants[code]
-        })
+            "current_count": area["current_count"],
+            "parked_today": area["recent_plates"]
+        }
+        for area in query_db("SELECT * FROM parking_area_occupancy ORDER BY area_code")
+    ]
 
 
-    # ------------------------------------
-    # DAILY REPORT
-    # ------------------------------------
-    daily_entries = query_db("""
-        SELECT DATE(time_in) AS day, COUNT(*) AS total
-        FROM parking_logs
-        GROUP BY DATE(time_in)
-        ORDER BY DATE(time_in) DESC
-        LIMIT 30
-    """)
+def render_dashboard(**extra):
+    kpis = dashboard_kpis()
+    daily_report, monthly_report = dashboard_series()
+
+    context = {
+        "total_registered_today": kpis["users_today"],
+        "total_registered": kpis["total_registered"],
+        "active_parked": kpis["active_parked"],
+        "entries_today": kpis["entries_today"],
+        "exits_today": kpis["exits_today"],
+        "overstay_count": kpis["overstay_count"],
+        "parking_lots": parking_lot_summary(),
+        "daily_report": daily_report,
+        "monthly_report": monthly_report
+    }
+    context.update(extra)
+
+    return render_template("admin_dashboard.html", **context)
+
+
+# -----------------------------
+# Admin Dashboard
+# -----------------------------
+@app.route("/admin_dashboard")
+def admin_dashboard():
+
+    if "admin" not in session:
+        return redirect(url_for("admin_login"))
+
+    return render_dashboard()
 
-    daily_report = [
-        {
-            "date": row["day"],
-            "entries": row["total"],
-            "exits": query_db(
-                "SELECT COUNT(*) AS c FROM parking_logs WHERE DATE(time_out)=%s",
-                (row["day"],),
-                one=True
-            )["c"]
-        }
-        for row in daily_entries
-    ]
 
-    # ------------------------------------
-    # MONTHLY REPORT
-    # ------------------------------------
-    monthly_entries = query_db("""
-        SELECT TO_CHAR(DATE_TRUNC('month', time_in), 'YYYY-MM') AS month,
-               COUNT(*) AS total
-        FROM parking_logs
-        GROUP BY DATE_TRUNC('month', time_in)
-        ORDER BY DATE_TRUNC('month', time_in) DESC
-    """)
 
-    monthly_report = [
-        {
-            "month": m["month"],
-            "entries": m["total"],
-            "exits": query_db(
-                "SELECT COUNT(*) AS c FROM parking_logs "
-                "WHERE TO_CHAR(DATE_TRUNC('month', time_out), 'YYYY-MM') = %s",
-                (m["month"],),
-                one=True
-            )["c"]
-        }
-        for m in monthly_entries
-    ]
 
-    # ------------------------------------
-    # RENDER TEMPLATE
-    # ------------------------------------
-    return render_template(
-        "admin_dashboard.html",
-        total_registered_today=users_today,
-        total_registered=total_registered,
-        active_parked=active_parked,
-        entries_today=entries_today,
-        exits_today=exits_today,
-        overstay_count=overstay_count,
-        parking_lots=parking_lots,
-        daily_report=daily_report,
-        monthly_report=monthly_report
-    )
 
 
+# ---------------- DATE RANGES ---------------- #
+# Filters are written as [start, end) on the raw column instead of
+# DATE(col) = x, so the time_in / time_out indexes can be used.
+def day_range(date_text):
+    start = datetime.strptime(date_text, "%Y-%m-%d")
+    return start, start + timedelta(days=1)
 
 
+def month_range(month_text):
+    start = datetime.strptime(month_text, "%Y-%m")
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def today_range():
+    return day_range(date.today().isoformat())
 
 
 # ---------------- DAILY CLICK VIEW ---------------- #
 @app.route("/view_daily/<date_text>")
 def view_daily(date_text):
+    try:
+        start, end = day_range(date_text)
+    except ValueError:
+        return f"Invalid date '{date_text}'", 400
+
     vehicles = query_db(
         """
         SELECT * FROM parking_logs
-        WHERE DATE(time_in) = %s
+        WHERE time_in >= %s AND time_in < %s
         ORDER BY time_in DESC
         """,
-        (date_text,)
+        (start, end)
     )
 
     return render_template("view_daily.html", date=date_text, vehicles=vehicles)
@@ -674,13 +1528,18 @@ def view_daily(date_text):
 # ---------------- MONTH CLICK VIEW ---------------- #
 @app.route("/view_month/<month>")
 def view_month(month):
+    try:
+        start, end = month_range(month)
+    except ValueError:
+        return f"Invalid month '{month}'", 400
+
     vehicles = query_db(
         """
         SELECT * FROM parking_logs
-        WHERE TO_CHAR(DATE_TRUNC('month', time_in), 'YYYY-MM') = %s
+        WHERE time_in >= %s AND time_in < %s
         ORDER BY time_in DESC
         """,
-        (month,)
+        (start, end)
     )
 
     return render_template("view_month.html", month=month, vehicles=vehicles)
@@ -689,13 +1548,13 @@ def view_month(month):
 def daily_summary():
 
     summary = query_db("""
-        SELECT 
-            DATE(time_in) AS date,
-            COUNT(*) AS total_entries,
-            SUM(CASE WHEN time_out IS NOT NULL THEN 1 ELSE 0 END) AS total_exits
-        FROM parking_logs
-        GROUP BY DATE(time_in)
-        ORDER BY DATE(time_in) DESC
+        SELECT
+            day AS date,
+            SUM(entries) AS total_entries,
+            SUM(exits) AS total_exits
+        FROM parking_daily_stats
+        GROUP BY day
+        ORDER BY day DESC
     """)
 
     return render_template("daily_summary.html", summary=summary)
@@ -703,14 +1562,11 @@ def daily_summary():
 @app.route("/view_lot/<lot_code>")
 def view_lot(lot_code):
     # FIXED: parking_lots → parking_areas
-    lot = query_db("""
-        SELECT area_code, area_name, capacity, current_count
-        FROM parking_areas
-        WHERE area_code = %s
-    """, (lot_code,), one=True)
+    lot = get_area(lot_code)
 
     if not lot:
         return f"Parking lot '{lot_code}' not found", 404
+    lot = area_with_count(lot)
 
     # FIXED: parking_logs uses parking_area, NOT area_code
     # FIXED: status='IN' does NOT exist → use time_out IS NULL
@@ -725,6 +1581,10 @@ def view_lot(lot_code):
     return render_template(
         "view_lot.html",
         lot=lot,
+        lot_name=lot["area_name"],
+        capacity=lot["capacity"],
+        count=lot["current_count"],
+        available=max(lot["capacity"] - lot["current_count"], 0),
         vehicles=vehicles
     )
 
@@ -733,44 +1593,35 @@ def view_lot(lot_code):
 @app.route('/dashboard')
 def dashboard_only():
 
-    total_registered_today = query_db("SELECT COUNT(*) AS c FROM registered WHERE DATE(registration_date)=CURDATE()", one=True)["c"]
-
-    total_registered = query_db("SELECT COUNT(*) AS c FROM registered", one=True)["c"]
-
-    active_parked = query_db("SELECT COUNT(*) AS c FROM parking_logs WHERE time_out IS NULL", one=True)["c"]
-
-    entries_today = query_db("SELECT COUNT(*) AS c FROM parking_logs WHERE DATE(time_in)=CURDATE()", one=True)["c"]
-
-    exits_today = query_db("SELECT COUNT(*) AS c FROM parking_logs WHERE DATE(time_out)=CURDATE()", one=True)["c"]
-
-    overstay_count = query_db(
-        "SELECT COUNT(*) AS c FROM parking_logs WHERE time_out IS NULL AND DATE(time_in) < CURDATE()",
-        one=True
-    )["c"]
+    kpis = dashboard_kpis()
 
     return render_template(
         'dashboard.html',
-        total_registered_today=total_registered_today,
-        total_registered=total_registered,
-        active_parked=active_parked,
-        entries_today=entries_today,
-        exits_today=exits_today,
-        overstay_count=overstay_count
+        total_registered_today=kpis["users_today"],
+        total_registered=kpis["total_registered"],
+        active_parked=kpis["active_parked"],
+        entries_today=kpis["entries_today"],
+        exits_today=kpis["exits_today"],
+        overstay_count=kpis["overstay_count"]
     )
 # ---------------- FIXED DASHBOARD EXTRA VIEWS (POSTGRES SAFE) ---------------- #
 
 @app.route('/view_registered_today')
 def registered_today_page():
     users = query_db(
-        "SELECT * FROM users WHERE DATE(created_at) = CURRENT_DATE"
+        "SELECT * FROM users WHERE created_at >= %s AND created_at < %s",
+        today_range()
     )
     return render_template("admin_dashboard.html", section="registered_today", users=users)
 
 
 @app.route('/view_total_registered')
 def total_registered_page():
-    users = query_db("SELECT * FROM users")
-    return render_template("admin_dashboard.html", section="total_registered", users=users)
+    after, limit = page_args()
+    users, next_after = keyset_page("SELECT * FROM users", after, limit, descending=False)
+    return render_template(
+        "admin_dashboard.html", section="total_registered", users=users, next_after=next_after
+    )
 
 
 @app.route('/view_active_parked')
@@ -784,149 +1635,195 @@ def active_parked_page():
 @app.route('/view_entries_today')
 def entries_today_page():
     entries = query_db(
-        "SELECT * FROM parking_logs WHERE DATE(time_in) = CURRENT_DATE"
+        "SELECT * FROM parking_logs WHERE time_in >= %s AND time_in < %s",
+        today_range()
     )
     return render_template("admin_dashboard.html", section="entries_today", entries=entries)
 
 @app.route('/view_exits_today')
 def exits_today_page():
     exits = query_db(
-        "SELECT * FROM parking_logs WHERE DATE(time_out) = CURRENT_DATE"
+        "SELECT * FROM parking_logs WHERE time_out >= %s AND time_out < %s",
+        today_range()
     )
     return render_template("admin_dashboard.html", section="exits_today", exits=exits)
 
 
-@app.route("/view_overstay")
-def view_overstay():
-
-    vehicles = query_db("""
-        SELECT plate_number, time_in, parking_area
-        FROM parking_logs
-        WHERE time_out IS NULL
-        AND DATE(time_in) < CURRENT_DATE
+# -----------------------------
+# Overstay alerts (see overstay.py)
+# -----------------------------
+OVERSTAY_MONITOR = os.environ.get("OVERSTAY_MONITOR", "1") == "1"
+OVERSTAY_EVAL_SEC = float(os.environ.get("OVERSTAY_EVAL_SEC", 30))
+OVERSTAY_RESYNC_SEC = float(os.environ.get("OVERSTAY_RESYNC_SEC", 600))
+OVERSTAY_ALERTS_LIMIT = 500
+
+
+def on_overstay_change(flagged, resolved):
+    lookup_cache.invalidate("kpis")
+
+
+overstay_monitor = OverstayMonitor(
+    db_transaction, OVERSTAY_EVAL_SEC, OVERSTAY_RESYNC_SEC, on_change=on_overstay_change
+)
+
+
+@app.before_request
+def start_overstay_monitor():
+    if OVERSTAY_MONITOR:
+        overstay_monitor.start()
+
+
+def load_overstays(area=None, include_resolved=False, limit=OVERSTAY_ALERTS_LIMIT):
+    # one row per flagged session, with every rule it broke
+    where = [] if include_resolved else ["resolved_at IS NULL"]
+    args = []
+    if area:
+        where.append("parking_area = %s")
+        args.append(area)
+    return query_db(f"""
+        SELECT log_id, plate_number, parking_area, time_in,
+               string_agg(rule, ', ' ORDER BY due_at) AS rules,
+               MIN(due_at) AS due_at, MIN(flagged_at) AS flagged_at,
+               MAX(resolved_at) AS resolved_at
+        FROM overstay_alerts
+        {"WHERE " + " AND ".join(where) if where else ""}
+        GROUP BY log_id, plate_number, parking_area, time_in
         ORDER BY time_in DESC
-    """)
-
-    # 🔁 RELOAD DASHBOARD DATA (same as admin_dashboard)
-    users_today = query_db(
-        "SELECT COUNT(*) AS count FROM users WHERE DATE(created_at) = CURRENT_DATE",
-        one=True
-    )["count"]
-
-    total_registered = query_db(
-        "SELECT COUNT(*) AS count FROM users",
-        one=True
-    )["count"]
-
-    active_parked = query_db(
-        "SELECT COUNT(*) AS count FROM parking_logs WHERE time_out IS NULL",
-        one=True
-    )["count"]
-
-    entries_today = query_db(
-        "SELECT COUNT(*) AS count FROM parking_logs WHERE DATE(time_in) = CURRENT_DATE",
-        one=True
-    )["count"]
-
-    exits_today = query_db(
-        "SELECT COUNT(*) AS count FROM parking_logs WHERE DATE(time_out) = CURRENT_DATE",
-        one=True
-    )["count"]
-
-    overstay_count = len(vehicles)
-
-    # Parking lots
-    areas = query_db(
-        "SELECT area_code, area_name, capacity FROM parking_areas ORDER BY area_code"
-    )
+        LIMIT %s
+    """, (*args, limit))
 
-    active_logs = query_db(
-        "SELECT plate_number, parking_area FROM parking_logs WHERE time_out IS NULL"
-    )
-
-    area_occupants = {area["area_code"]: [] for area in areas}
-    for log in active_logs:
-        if log["parking_area"] in area_occupants:
-            area_occupants[log["parking_area"]].append(log["plate_number"])
-
-    parking_lots = []
-    for area in areas:
-        code = area["area_code"]
-        parking_lots.append({
-            "area_code": code,
-            "name": f"Lot {code}",
-            "area_name": area["area_name"],
-            "capacity": area["capacity"],
-            "current_count": len(area_occupants[code]),
-            "parked_today": area_occupants[code]
-        })
-
-    # Daily Report
-    daily_entries = query_db("""
-        SELECT DATE(time_in) AS day, COUNT(*) AS total
-        FROM parking_logs
-        GROUP BY DATE(time_in)
-        ORDER BY DATE(time_in) DESC
-        LIMIT 30
-    """)
 
-    daily_report = [
-        {
-            "date": row["day"],
-            "entries": row["total"],
-            "exits": query_db(
-                "SELECT COUNT(*) AS c FROM parking_logs WHERE DATE(time_out)=%s",
-                (row["day"],),
-                one=True
-            )["c"]
-        }
-        for row in daily_entries
-    ]
+@app.route("/view_overstay")
+def view_overstay():
+    return render_dashboard(section="overstay", vehicles=load_overstays())
 
-    # Monthly Report
-    monthly_entries = query_db("""
-        SELECT TO_CHAR(DATE_TRUNC('month', time_in), 'YYYY-MM') AS month,
-               COUNT(*) AS total
-        FROM parking_logs
-        GROUP BY DATE_TRUNC('month', time_in)
-        ORDER BY DATE_TRUNC('month', time_in) DESC
-    """)
 
-    monthly_report = [
-        {
-            "month": m["month"],
-            "entries": m["total"],
-            "exits": query_db(
-                "SELECT COUNT(*) AS c FROM parking_logs "
-                "WHERE TO_CHAR(DATE_TRUNC('month', time_out), 'YYYY-MM') = %s",
-                (m["month"],),
-                one=True
-            )["c"]
-        }
-        for m in monthly_entries
-    ]
+@app.route("/overstay_alerts")
+def overstay_alerts():
+    if "admin" not in session:
+        return redirect(url_for("admin_login"))
 
-    return render_template(
-        "admin_dashboard.html",
-        section="overstay",
-        vehicles=vehicles,
-        total_registered_today=users_today,
-        total_registered=total_registered,
-        active_parked=active_parked,
-        entries_today=entries_today,
-        exits_today=exits_today,
-        overstay_count=overstay_count,
-        parking_lots=parking_lots,
-        daily_report=daily_report,
-        monthly_report=monthly_report
+    limit = min(max(request.args.get("limit", OVERSTAY_ALERTS_LIMIT, type=int), 1), OVERSTAY_ALERTS_LIMIT)
+    alerts = load_overstays(
+        area=request.args.get("area") or None,
+        include_resolved=request.args.get("status") == "all",
+        limit=limit
     )
+    return jsonify({"alerts": alerts})
+
+
+@app.cli.command("evaluate-overstays")
+def evaluate_overstays_command():
+    result = overstay_monitor.tick()
+    if result is None:
+        raise SystemExit("another process is evaluating overstays right now")
+    print(f"Flagged {result[0]}, resolved {result[1]}")
+
+
+@app.cli.command("set-overstay-rule")
+@click.argument("area_code")
+@click.option("--max-minutes", type=int, help="longest allowed stay (0 = no limit)")
+@click.option("--overnight/--no-overnight", default=None, help="allow staying past midnight")
+@click.option("--closes-at", help="HH:MM closing time ('none' = never closes)")
+def set_overstay_rule_command(area_code, max_minutes, overnight, closes_at):
+    changes = {}
+    if max_minutes is not None:
+        changes["max_stay_minutes"] = max_minutes or None
+    if overnight is not None:
+        changes["overnight_allowed"] = overnight
+    if closes_at is not None:
+        changes["closes_at"] = None if closes_at == "none" else datetime.strptime(closes_at, "%H:%M").time()
+    if not changes:
+        raise SystemExit("nothing to change")
+
+    row = query_db(
+        "UPDATE parking_areas SET " + ", ".join(f"{col} = %s" for col in changes) +
+        " WHERE area_code = %s RETURNING area_code, max_stay_minutes, overnight_allowed, closes_at",
+        (*changes.values(), area_code), one=True
+    )
+    if not row:
+        raise SystemExit(f"Unknown area '{area_code}'")
+    print(f"{row['area_code']}: max stay {row['max_stay_minutes'] or '-'} min, "
+          f"overnight {'allowed' if row['overnight_allowed'] else 'flagged'}, "
+          f"closes at {row['closes_at'] or '-'}")
+
 
+# -----------------------------
+# Exports (CSV / Parquet / Arrow)
+# -----------------------------
+def export_bound(text):
+    # accepts YYYY-MM-DD or YYYY-MM
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d", "%Y-%m"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    raise exports.ExportError(f"Invalid date '{text}', expected YYYY-MM-DD or YYYY-MM")
 
 
+def export_filters(start, end, area, plate):
+    return {
+        "start": export_bound(start),
+        "end": export_bound(end),
+        "area": area or None,
+        "plate": plate.strip().upper() if plate else None,
+    }
 
 
+@app.route("/export/<table>")
+def export_table(table):
+    if "admin" not in session:
+        return redirect(url_for("admin_login"))
 
+    fmt = request.args.get("format", "csv")
+    try:
+        filters = export_filters(
+            request.args.get("start"), request.args.get("end"),
+            request.args.get("area"), request.args.get("plate")
+        )
+        pool = get_pool()
+        pipe = exports.stream_export(pool.getconn, pool.putconn, table, fmt, **filters)
+    except exports.ExportError as e:
+        return str(e), 400
+
+    mimetype, ext = exports.FORMATS[fmt]
+    filename = f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    response = Response(
+        pipe.chunks(),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+    response.call_on_close(pipe.cancel)
+    return response
+
+
+@app.cli.command("export")
+@click.argument("table", type=click.Choice(sorted(exports.TABLES)))
+@click.option("--format", "fmt", type=click.Choice(sorted(exports.FORMATS)), default="csv")
+@click.option("--start", help="YYYY-MM-DD or YYYY-MM (inclusive)")
+@click.option("--end", help="YYYY-MM-DD or YYYY-MM (exclusive)")
+@click.option("--area")
+@click.option("--plate")
+@click.option("--out", help="output file (default: stdout)")
+def export_command(table, fmt, start, end, area, plate, out):
+    try:
+        filters = export_filters(start, end, area, plate)
+        exports.check_export(table, fmt, filters["area"])
+    except exports.ExportError as e:
+        raise SystemExit(str(e))
 
+    conn = get_pool().getconn()
+    try:
+        if out:
+            with open(out, "wb") as f:
+                exports.write_export(conn, table, fmt, f, **filters)
+            print(f"Exported {table} to {out}", file=sys.stderr)
+        else:
+            exports.write_export(conn, table, fmt, sys.stdout.buffer, **filters)
+    finally:
+        get_pool().putconn(conn)
 
 
 # -----------------------------
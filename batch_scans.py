@@ -0,0 +1,204 @@
+# batch_scans.py
+# Applies an ordered list of buffered gate scans in one transaction.
+#
+# Every plate and area touched by the batch is locked up front, the scans are
+# replayed in order against that in-memory state (same rules as /scan_area),
+# and the outcome is written back with a handful of multi-row statements.
+
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+import rollups
+
+
+class Session:
+    def __init__(self, log_id, area, time_in):
+        self.id = log_id            # None until inserted
+        self.area = area
+        self.first_area = area      # where the entry is currently counted
+        self.time_in = time_in
+        self.time_out = None
+        self.touched = False
+
+
+def _lock(cur, plates, areas_from_scans):
+    cur.execute(
+        "SELECT pg_advisory_xact_lock(h) FROM "
+        "(SELECT hashtext(p) AS h FROM unnest(%s::text[]) AS p ORDER BY 1) locks",
+        (sorted(plates),)
+    )
+
+    cur.execute(
+        "SELECT DISTINCT ON (plate_number) id, plate_number, parking_area, time_in "
+        "FROM parking_logs WHERE plate_number = ANY(%s) AND time_out IS NULL "
+        "ORDER BY plate_number, id DESC",
+        (list(plates),)
+    )
+    sessions = {
+        row["plate_number"]: Session(row["id"], row["parking_area"], row["time_in"])
+        for row in cur.fetchall()
+    }
+
+    areas = set(areas_from_scans) | {s.area for s in sessions.values() if s.area}
+    cur.execute(
+        "SELECT area_code, area_name, capacity, current_count FROM parking_areas "
+        "WHERE area_code = ANY(%s) ORDER BY area_code FOR UPDATE",
+        (sorted(areas),)
+    )
+    area_rows = {row["area_code"]: dict(row) for row in cur.fetchall()}
+    return sessions, area_rows
+
+
+def _fresh_scan_ids(cur, scans):
+    ids = [s["scan_id"] for s in scans if s.get("scan_id")]
+    if not ids:
+        return set()
+
+    cur.execute(
+        "INSERT INTO processed_scans (scan_id) SELECT unnest(%s::text[]) "
+        "ON CONFLICT DO NOTHING RETURNING scan_id",
+        (ids,)
+    )
+    return {row["scan_id"] for row in cur.fetchall()}
+
+
+def apply_batch(cur, scans, cooldown_sec):
+    """
+    scans: [{"plate", "area_code", "time", "action", "scan_id"}] in gate order.
+    Returns (results, sessions) where sessions maps plate -> final Session
+    (time_out set when the vehicle left) for the caller's session index.
+    """
+    fresh_ids = _fresh_scan_ids(cur, scans)
+    plates = {s["plate"] for s in scans}
+    sessions, areas = _lock(cur, plates, {s["area_code"] for s in scans})
+    counts = {code: a["current_count"] for code, a in areas.items()}
+    existing = list(sessions.values())
+
+    results = []
+    new_sessions = []
+    closed = []
+    last_seen = {}
+
+    for scan in scans:
+        plate, code, when = scan["plate"], scan["area_code"], scan["time"]
+        result = {"plate": plate, "area": code, "time": str(when)}
+        results.append(result)
+
+        area = areas.get(code)
+        if area is None:
+            result.update(status="error", message="Unknown area")
+            continue
+        result["area_name"] = area["area_name"]
+
+        scan_id = scan.get("scan_id")
+        if scan_id:
+            result["scan_id"] = scan_id
+            if scan_id not in fresh_ids:
+                result.update(status="ignored", message="Already applied")
+                continue
+            fresh_ids.discard(scan_id)
+
+        key = (code, plate)
+        seen = last_seen.get(key)
+        if seen is not None and abs(when - seen) < timedelta(seconds=cooldown_sec):
+            result.update(status="ignored", message="Duplicate scan")
+            continue
+        last_seen[key] = when
+
+        current = sessions.get(plate)
+        if current is not None and current.time_out is not None:
+            current = None
+
+        if scan.get("action") == "exit":
+            if current is None:
+                result.update(status="ignored", message=f"{plate} is not parked")
+                continue
+            current.time_out = when
+            current.touched = True
+            if current.area in counts:
+                counts[current.area] = max(counts[current.area] - 1, 0)
+            closed.append(current)
+            result["status"] = "exited"
+            continue
+
+        if current is not None:
+            if current.area != code:
+                if counts[code] >= area["capacity"]:
+                    result.update(status="full", message=f"{area['area_name']} is full")
+                    continue
+                counts[code] += 1
+                if current.area in counts:
+                    counts[current.area] = max(counts[current.area] - 1, 0)
+                current.area = code
+                current.touched = True
+            result.update(status="updated", note="Vehicle already inside, parking area updated.")
+            continue
+
+        if counts[code] >= area["capacity"]:
+            result.update(status="full", message=f"{area['area_name']} is full")
+            continue
+
+        counts[code] += 1
+        session = Session(None, code, when)
+        session.first_area = None
+        sessions[plate] = session
+        new_sessions.append((plate, session))
+        result.update(status="entered", occupancy=counts[code])
+
+    _write(cur, existing, new_sessions, closed, counts, areas)
+    return results, sessions
+
+
+def _write(cur, existing, new_sessions, closed, counts, areas):
+    daily = {}
+
+    def bump(when, area, entries=0, exits=0):
+        rollups.add(daily, when, area, entries, exits)
+
+    # existing open logs that were moved and/or closed
+    changed = [s for s in existing if s.touched]
+    if changed:
+        execute_values(
+            cur,
+            "UPDATE parking_logs AS l SET parking_area = v.area, time_out = v.time_out, "
+            "moved_at = CASE WHEN l.parking_area IS DISTINCT FROM v.area THEN NOW() ELSE l.moved_at END "
+            "FROM (VALUES %s) AS v(id, area, time_out) WHERE l.id = v.id",
+            [(s.id, s.area, s.time_out) for s in changed],
+            template="(%s, %s, %s::timestamp)",
+            page_size=1000
+        )
+        for s in changed:
+            if s.area != s.first_area and s.time_in is not None:
+                bump(s.time_in, s.first_area, entries=-1)
+                bump(s.time_in, s.area, entries=1)
+
+    # logs opened inside this batch are inserted in their final state
+    if new_sessions:
+        rows = execute_values(
+            cur,
+            "INSERT INTO parking_logs (plate_number, time_in, time_out, parking_area) "
+            "VALUES %s RETURNING id",
+            [(plate, s.time_in, s.time_out, s.area) for plate, s in new_sessions],
+            template="(%s, %s, %s::timestamp, %s)",
+            page_size=1000,
+            fetch=True
+        )
+        for (plate, s), row in zip(new_sessions, rows):
+            s.id = row["id"]
+            bump(s.time_in, s.area, entries=1)
+
+    for s in closed:
+        bump(s.time_out, s.area, exits=1)
+
+    # rollup rows last: every area row is already locked (see _lock)
+    rollups.record_many(cur, daily)
+
+    dirty = [(code, n) for code, n in counts.items() if n != areas[code]["current_count"]]
+    if dirty:
+        execute_values(
+            cur,
+            "UPDATE parking_areas AS a SET current_count = v.n "
+            "FROM (VALUES %s) AS v(code, n) WHERE a.area_code = v.code",
+            dirty
+        )
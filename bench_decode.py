@@ -0,0 +1,132 @@
+# bench_decode.py
+# Compare QR decode strategies from qr_decode.py on recorded fixtures.
+#
+#   python bench_decode.py static/qrcodes/           # the registration QR images
+#   python bench_decode.py gate_cam.mp4 fixtures/frames/ still.png
+#   python bench_decode.py gate_cam.mp4 --strategies full fast --json bench_decode.json
+#
+# For each strategy it reports frames decoded per second and detection recall.
+# The reference is the full-frame decoder, unless --expected gives the QR text.
+#   frame_recall - frames where the reference saw a code and the strategy did too
+#   code_recall  - distinct codes (per fixture) the strategy found at least once
+import argparse
+import json
+import os
+import time
+
+import cv2
+
+from qr_decode import STRATEGIES, make_decoder
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".bmp"}
+
+
+def load_frames(path, limit):
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if os.path.splitext(n)[1].lower() in IMAGE_EXTS)
+        frames = [cv2.imread(os.path.join(path, n)) for n in names[:limit]]
+        return [f for f in frames if f is not None]
+
+    if os.path.splitext(path)[1].lower() in IMAGE_EXTS:
+        frame = cv2.imread(path)
+        return [frame] if frame is not None else []
+
+    frames = []
+    cap = cv2.VideoCapture(path)
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run(decoder, frames):
+    seen = []
+    started = time.perf_counter()
+    for frame in frames:
+        seen.append({text for text, _ in decoder.decode(frame)})
+    return seen, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QR decode strategy benchmark")
+    parser.add_argument("fixtures", nargs="+", help="video files, images or image folders")
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES),
+                        default=sorted(STRATEGIES))
+    parser.add_argument("--expected", help="QR text every fixture frame should contain")
+    parser.add_argument("--limit", type=int, default=3000, help="max frames per fixture")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    fixtures = {}
+    for path in args.fixtures:
+        frames = load_frames(path, args.limit)
+        if frames:
+            fixtures[path] = frames
+        else:
+            print(f"skipping {path}: no frames")
+
+    if not fixtures:
+        raise SystemExit("no usable fixtures")
+
+    # reference detections per fixture
+    reference = {}
+    for path, frames in fixtures.items():
+        if args.expected:
+            reference[path] = [{args.expected} for _ in frames]
+        else:
+            reference[path], _ = run(make_decoder("full"), frames)
+
+    report = {}
+    for name in args.strategies:
+        total_frames = total_time = 0
+        ref_frames = hit_frames = 0
+        ref_codes = hit_codes = 0
+        counters = {}
+
+        for path, frames in fixtures.items():
+            decoder = make_decoder(name)
+            seen, elapsed = run(decoder, frames)
+            total_frames += len(frames)
+            total_time += elapsed
+
+            expected_codes = set()
+            found_codes = set()
+            for want, got in zip(reference[path], seen):
+                if want:
+                    ref_frames += 1
+                    hit_frames += bool(want & got)
+                expected_codes |= want
+                found_codes |= got
+            ref_codes += len(expected_codes)
+            hit_codes += len(expected_codes & found_codes)
+
+            for key, value in decoder.stats().items():
+                counters[key] = counters.get(key, 0) + value
+
+        report[name] = {
+            "frames": total_frames,
+            "decodes_per_sec": round(total_frames / total_time, 1) if total_time else None,
+            "ms_per_frame": round(total_time / total_frames * 1000, 3),
+            "frame_recall": round(hit_frames / ref_frames, 4) if ref_frames else None,
+            "code_recall": round(hit_codes / ref_codes, 4) if ref_codes else None,
+            "paths": counters,
+        }
+
+    print(f"{'strategy':<10}{'frames':>8}{'dec/s':>10}{'ms/frame':>10}{'frame rec':>11}{'code rec':>10}")
+    for name, r in report.items():
+        print(f"{name:<10}{r['frames']:>8}{r['decodes_per_sec']!s:>10}{r['ms_per_frame']:>10}"
+              f"{r['frame_recall']!s:>11}{r['code_recall']!s:>10}")
+        if r["paths"]:
+            print(f"{'':<10}{r['paths']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"fixtures": list(fixtures), "results": report}, f, indent=2)
+        print("saved", args.json)
+
+
+if __name__ == "__main__":
+    main()
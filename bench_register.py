@@ -0,0 +1,113 @@
+# bench_register.py
+# Per-row registration (POST / once per vehicle) vs the bulk CSV import.
+#
+# Needs the real database (run `flask migrate` first). Plates are prefixed so
+# they can be removed afterwards. The bulk run also pre-renders every QR into
+# a temporary disk cache, the per-row run leaves QR rendering to /qr/<plate>.
+#   python bench_register.py --rows 10000 --workers 8 --json bench_register.json
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import app as app_module
+from app import app, query_db
+from registration import FIELDS
+
+
+def make_rows(prefix, count):
+    return [
+        {
+            "full_name": f"Bench User {i}",
+            "id_number": f"{prefix}-{i:06d}",
+            "vehicle_type": "Car" if i % 3 else "Motorcycle",
+            "mobile_no": f"09{i:09d}",
+            "plate_number": f"{prefix}{i:06d}",
+        }
+        for i in range(count)
+    ]
+
+
+def to_csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def cleanup(prefix):
+    query_db("DELETE FROM users WHERE plate_number LIKE %s", (prefix + "%",), fetch=False)
+
+
+def bench_per_row(rows):
+    client = app.test_client()
+    started = time.perf_counter()
+    for row in rows:
+        res = client.post("/", data=row)
+        if res.status_code != 200:
+            raise SystemExit(f"register failed for {row['plate_number']}: {res.status_code}")
+    return time.perf_counter() - started
+
+
+def bench_bulk(rows, workers):
+    text = to_csv(rows)
+    started = time.perf_counter()
+    with app.app_context():
+        inserted, errors = app_module.bulk_register_csv(text, workers=workers)
+    elapsed = time.perf_counter() - started
+    if errors or len(inserted) != len(rows):
+        raise SystemExit(f"bulk import rejected {len(errors)} row(s): {errors[:3]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registration throughput benchmark")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--skip-per-row", action="store_true", help="only time the bulk import")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    qr_dir = tempfile.mkdtemp(prefix="bench_qr_")
+    app_module.qr_images.disk_dir = qr_dir
+    results = {"rows": args.rows, "workers": args.workers}
+
+    try:
+        if not args.skip_per_row:
+            prefix = "BR" + uuid.uuid4().hex[:4].upper()
+            try:
+                elapsed = bench_per_row(make_rows(prefix, args.rows))
+            finally:
+                cleanup(prefix)
+            results["per_row"] = {"seconds": round(elapsed, 2), "rows_per_sec": round(args.rows / elapsed, 1)}
+
+        prefix = "BB" + uuid.uuid4().hex[:4].upper()
+        try:
+            elapsed = bench_bulk(make_rows(prefix, args.rows), args.workers)
+        finally:
+            cleanup(prefix)
+        results["bulk"] = {"seconds": round(elapsed, 2), "rows_per_sec": round(args.rows / elapsed, 1)}
+    finally:
+        shutil.rmtree(qr_dir, ignore_errors=True)
+
+    for name in ("per_row", "bulk"):
+        if name in results:
+            r = results[name]
+            print(f"{name:<8} {r['seconds']:>8}s {r['rows_per_sec']:>10} rows/s")
+    if "per_row" in results:
+        print(f"speedup  {results['per_row']['seconds'] / results['bulk']['seconds']:.1f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("saved", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# cooldown.py
+# Duplicate-scan suppression.
+#
+# store.hit(key) answers "was this key seen less than `ttl` seconds ago?" and,
+# if not, starts a new cooldown window for it, as one atomic step.
+#
+#   MemoryCooldownStore  - per process, bounded, expired keys evicted as it goes
+#   SQLiteCooldownStore  - a small SQLite file shared by every worker on the host
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCooldownStore:
+    def __init__(self, ttl, max_size=100000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._expires = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _evict(self, now):
+        # keys are kept in expiry order (ttl is fixed), so expired ones sit at the front
+        while self._expires:
+            key, expires = next(iter(self._expires.items()))
+            if expires > now and len(self._expires) <= self.max_size:
+                break
+            self._expires.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            expires = self._expires.get(key)
+            if expires is not None and expires > now:
+                self._stats["hits"] += 1
+                return True
+
+            self._stats["misses"] += 1
+            self._expires[key] = now + self.ttl
+            self._expires.move_to_end(key)
+            self._evict(now)
+            return False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._expires)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._expires)
+        s["backend"] = "memory"
+        return s
+
+
+class SQLiteCooldownStore:
+    PURGE_EVERY = 500
+
+    def __init__(self, path, ttl, max_size=100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cooldown (key TEXT PRIMARY KEY, expires REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cooldown_expires ON cooldown (expires)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; every statement below is atomic on its own
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _evict(self, conn, now):
+        removed = conn.execute("DELETE FROM cooldown WHERE expires <= ?", (now,)).rowcount
+        over = conn.execute("SELECT COUNT(*) FROM cooldown").fetchone()[0] - self.max_size
+        if over > 0:
+            removed += conn.execute(
+                "DELETE FROM cooldown WHERE key IN "
+                "(SELECT key FROM cooldown ORDER BY expires LIMIT ?)",
+                (over,)
+            ).rowcount
+        self._count("evictions", removed)
+
+    def hit(self, key):
+        now = time.time()
+        conn = self._conn()
+
+        # insert, or restart an expired window; 0 rows changed means still cooling down
+        changed = conn.execute(
+            "INSERT INTO cooldown (key, expires) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET expires = excluded.expires "
+            "WHERE cooldown.expires <= ?",
+            (key, now + self.ttl, now)
+        ).rowcount
+
+        if not changed:
+            self._count("hits")
+            return True
+
+        self._count("misses")
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self._evict(conn, now)
+        return False
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cooldown").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        s["size"] = len(self)
+        s["backend"] = "sqlite"
+        return s
+
+
+def make_store(backend, ttl, max_size=100000, path=None):
+    if backend == "sqlite":
+        return SQLiteCooldownStore(path or "cooldown.sqlite3", ttl, max_size)
+    if backend == "memory":
+        return MemoryCooldownStore(ttl, max_size)
+    raise ValueError(f"unknown cooldown backend: {backend}")
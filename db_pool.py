@@ -0,0 +1,223 @@
+# db_pool.py
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool.
+
+    - keeps at least `minconn` connections open, never more than `maxconn`
+    - callers wait (up to `timeout` seconds) when every connection is busy
+    - idle connections are pinged before reuse and recycled after `max_lifetime`
+    """
+
+    def __init__(self, minconn=2, maxconn=10, timeout=10.0,
+                 max_lifetime=1800.0, health_check_after=30.0, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size: min=%s max=%s" % (minconn, maxconn))
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()
+        self._in_use = {}
+        self._closed = False
+
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "checkout_time_total": 0.0,
+            "checkout_time_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+        }
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    # -----------------------------
+    # Internal helpers
+    # -----------------------------
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        with self._lock:
+            self._metrics["created"] += 1
+        return PooledConnection(conn)
+
+    def _close_quietly(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, pooled, now):
+        return self.max_lifetime and now - pooled.created_at > self.max_lifetime
+
+    def _healthy(self, pooled, now):
+        if pooled.conn.closed:
+            return False
+        if now - pooled.last_used < self.health_check_after:
+            return True
+        try:
+            cur = pooled.conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            pooled.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # -----------------------------
+    # Checkout / return
+    # -----------------------------
+    def getconn(self):
+        started = time.monotonic()
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+
+                if self._idle:
+                    pooled = self._idle.popleft()
+                    break
+
+                if len(self._in_use) < self.maxconn:
+                    pooled = None
+                    break
+
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolTimeout(
+                        "no database connection available after %.1fs" % self.timeout
+                    )
+                waited = True
+                self._available.wait(remaining)
+
+            # reserve the slot before doing any network work outside the lock
+            slot = object()
+            self._in_use[id(slot)] = slot
+
+        try:
+            now = time.monotonic()
+            if pooled is not None and self._expired(pooled, now):
+                self._close_quietly(pooled)
+                with self._lock:
+                    self._metrics["recycled"] += 1
+                pooled = None
+            elif pooled is not None and not self._healthy(pooled, now):
+                self._close_quietly(pooled)
+                with self._lock:
+                    self._metrics["health_check_failures"] += 1
+                pooled = None
+
+            if pooled is None:
+                pooled = self._connect()
+        except Exception:
+            with self._lock:
+                self._in_use.pop(id(slot), None)
+                self._available.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._in_use.pop(id(slot), None)
+            self._in_use[id(pooled.conn)] = pooled
+
+            m = self._metrics
+            m["checkouts"] += 1
+            m["checkout_time_total"] += elapsed
+            m["checkout_time_max"] = max(m["checkout_time_max"], elapsed)
+            if waited:
+                m["waits"] += 1
+                m["wait_time_total"] += elapsed
+                m["wait_time_max"] = max(m["wait_time_max"], elapsed)
+
+        return pooled.conn
+
+    def putconn(self, conn, discard=False):
+        with self._lock:
+            pooled = self._in_use.pop(id(conn), None)
+
+        if pooled is None:
+            # not ours (or already returned)
+            return
+
+        if not discard and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if conn.closed or discard or self._expired(pooled, now) or self._closed:
+            self._close_quietly(pooled)
+            with self._lock:
+                self._metrics["discarded" if discard else "recycled"] += 1
+                self._available.notify()
+            return
+
+        pooled.last_used = now
+        with self._lock:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            m["in_use"] = len(self._in_use)
+            m["idle"] = len(self._idle)
+            m["minconn"] = self.minconn
+            m["maxconn"] = self.maxconn
+
+        checkouts = m["checkouts"] or 1
+        waits = m["waits"] or 1
+        m["checkout_time_avg_ms"] = round(m["checkout_time_total"] / checkouts * 1000, 3)
+        m["checkout_time_max_ms"] = round(m["checkout_time_max"] * 1000, 3)
+        m["wait_time_avg_ms"] = round(m["wait_time_total"] / waits * 1000, 3)
+        m["wait_time_max_ms"] = round(m["wait_time_max"] * 1000, 3)
+        return m
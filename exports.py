@@ -0,0 +1,260 @@
+# exports.py
+# Streaming exports of parking_logs / users.
+#
+#   csv      - Postgres COPY (SELECT ...) TO STDOUT, bytes passed straight through
+#   parquet  - server-side cursor -> Arrow record batches -> Parquet (needs pyarrow)
+#   arrow    - same, as an Arrow IPC stream (needs pyarrow)
+#
+# Rows are never collected in Python: the HTTP response (or CLI output file)
+# consumes chunks from a small bounded pipe, so memory use is constant.
+import queue
+import threading
+import uuid
+
+TABLES = {
+    "parking_logs": {
+        "columns": "id, plate_number, time_in, time_out, parking_area",
+        "time_column": "time_in",
+        "area_column": "parking_area",
+        "plate_column": "plate_number",
+    },
+    "users": {
+        "columns": "*",
+        "time_column": "created_at",
+        "area_column": None,
+        "plate_column": "plate_number",
+    },
+}
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+ARROW_BATCH_ROWS = 50000
+
+
+class ExportError(Exception):
+    pass
+
+
+def build_query(cur, table, start=None, end=None, area=None, plate=None):
+    spec = TABLES.get(table)
+    if spec is None:
+        raise ExportError(f"unknown table '{table}'")
+
+    where, args = [], []
+    # half-open range on the raw column so the time index can be used
+    if start:
+        where.append(f"{spec['time_column']} >= %s")
+        args.append(start)
+    if end:
+        where.append(f"{spec['time_column']} < %s")
+        args.append(end)
+    if area:
+        if not spec["area_column"]:
+            raise ExportError(f"'{table}' cannot be filtered by area")
+        where.append(f"{spec['area_column']} = %s")
+        args.append(area)
+    if plate:
+        # case-insensitive like /search; matches the upper(plate_number) indexes
+        where.append(f"upper({spec['plate_column']}) = upper(%s)")
+        args.append(plate)
+
+    sql = f"SELECT {spec['columns']} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+
+    # COPY can't take bind parameters, so inline them with psycopg2's quoting
+    return cur.mogrify(sql, args).decode()
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+def copy_csv(conn, sql, out):
+    cur = conn.cursor()
+    try:
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+    finally:
+        cur.close()
+
+
+def _arrow_schema(pa, description):
+    # psycopg2 type OIDs -> Arrow types; anything unknown is exported as text
+    types = {
+        16: pa.bool_(),
+        20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+        700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(col.name, types.get(col.type_code, pa.string())) for col in description])
+
+
+def write_arrow(conn, sql, out, fmt):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("pyarrow is not installed; use format=csv or pip install pyarrow")
+
+    cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+    cur.itersize = ARROW_BATCH_ROWS
+    writer = None
+    try:
+        cur.execute(sql)
+        rows = cur.fetchmany(ARROW_BATCH_ROWS)
+        schema = _arrow_schema(pa, cur.description)
+        text_columns = [i for i, f in enumerate(schema) if pa.types.is_string(f.type)]
+
+        sink = pa.PythonFile(out, mode="w")
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+
+        while rows:
+            columns = [list(col) for col in zip(*rows)]
+            for i in text_columns:
+                columns[i] = [None if v is None else str(v) for v in columns[i]]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows = cur.fetchmany(ARROW_BATCH_ROWS)
+    finally:
+        if writer is not None:
+            writer.close()
+        cur.close()
+        conn.rollback()
+
+
+def write_export(conn, table, fmt, out, **filters):
+    if fmt not in FORMATS:
+        raise ExportError(f"unknown format '{fmt}'")
+    cur = conn.cursor()
+    sql = build_query(cur, table, **filters)
+    cur.close()
+
+    if fmt == "csv":
+        copy_csv(conn, sql, out)
+        conn.commit()
+    else:
+        write_arrow(conn, sql, out, fmt)
+
+
+# -----------------------------
+# HTTP streaming
+# -----------------------------
+class ChunkPipe:
+    # file-like sink for the export thread; the bounded queue applies
+    # backpressure so a slow client never makes the export buffer rows
+    def __init__(self, max_chunks=16):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._pos = 0
+        self.closed = False
+        self.cancelled = threading.Event()
+
+    def _put(self, item):
+        # gives up once the response is cancelled instead of blocking on a
+        # full queue nobody reads any more
+        while True:
+            if self.cancelled.is_set():
+                raise IOError("export cancelled: client went away")
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data):
+        data = bytes(data)
+        if data:
+            self._put(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def finish(self, error=None):
+        try:
+            self._put(error if error is not None else StopIteration)
+        except IOError:
+            pass
+
+    def cancel(self):
+        # the response was closed (finished, abandoned or never started):
+        # unblock the producer so it hands its connection back
+        self.cancelled.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def chunks(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is StopIteration:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+
+def check_export(table, fmt, area=None):
+    # fail before any response bytes are sent
+    if table not in TABLES:
+        raise ExportError(f"unknown table '{table}'")
+    if fmt not in FORMATS:
+        raise ExportError(f"unknown format '{fmt}'")
+    if area and not TABLES[table]["area_column"]:
+        raise ExportError(f"'{table}' cannot be filtered by area")
+    if fmt != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError("pyarrow is not installed; use format=csv or pip install pyarrow")
+
+
+def stream_export(get_conn, put_conn, table, fmt, **filters):
+    # returns the ChunkPipe: serve pipe.chunks() and call pipe.cancel() when
+    # the response is closed, which also covers a client that leaves before
+    # the first chunk (the generator never starts, so its finally never runs)
+    check_export(table, fmt, filters.get("area"))
+    pipe = ChunkPipe()
+
+    def produce():
+        conn = None
+        done = False
+        try:
+            conn = get_conn()
+            write_export(conn, table, fmt, pipe, **filters)
+            done = True
+            pipe.finish()
+        except BaseException as e:
+            pipe.finish(e)
+        finally:
+            # a COPY cut off half way leaves the connection unusable
+            if conn is not None:
+                put_conn(conn, discard=not done)
+
+    threading.Thread(target=produce, name=f"export-{table}", daemon=True).start()
+    return pipe
@@ -0,0 +1,418 @@
+# load_test.py
+# Gate-rush load test for the scan, search and dashboard paths.
+#
+# Seeds the real database (run `flask migrate` first) with tagged users, areas
+# and parking_logs, drives a weighted mix of endpoints from many threads, and
+# reports throughput, p50/p95/p99 latency and SQL statements per request.
+# Everything it seeds is removed afterwards unless --keep is given.
+#
+#   python load_test.py --users 20000 --logs 500000 --threads 32 --duration 60
+#   python load_test.py --mix scan_area=70,search=20,history=10 --json run.json
+#   python load_test.py --json new.json --compare old.json
+#
+# Requests go through app.test_client() in-process, so queries per request
+# can be counted exactly. With --url they go over HTTP to a running server
+# instead (seed the same database it uses); queries per request is then null.
+import argparse
+import csv
+import io
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import psycopg2.extensions
+
+import app as app_module
+from app import app, db_transaction
+from db_pool import ConnectionPool
+import partitions
+import rollups
+import schema
+
+DEFAULT_MIX = "scan_area=50,scan_qr_browser=15,search=20,admin_dashboard=5,history=10"
+
+
+# -----------------------------
+# Statement counting
+# -----------------------------
+_counter = threading.local()
+
+
+def statements():
+    return getattr(_counter, "n", 0)
+
+
+def _count(n=1):
+    _counter.n = statements() + n
+
+
+_counting_classes = {}
+
+
+def _counting(factory):
+    # subclass whatever cursor class the caller asked for (RealDictCursor, ...)
+    cls = _counting_classes.get(factory)
+    if cls is None:
+        class CountingCursor(factory):
+            def execute(self, *args, **kwargs):
+                _count()
+                return super().execute(*args, **kwargs)
+
+            def executemany(self, *args, **kwargs):
+                _count()
+                return super().executemany(*args, **kwargs)
+
+            def copy_expert(self, *args, **kwargs):
+                _count()
+                return super().copy_expert(*args, **kwargs)
+
+        cls = _counting_classes[factory] = CountingCursor
+    return cls
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _counting(factory)
+        return super().cursor(*args, **kwargs)
+
+
+def install_counting_pool(maxconn):
+    app_module._pool = ConnectionPool(
+        minconn=2,
+        maxconn=maxconn,
+        timeout=app_module.DB_POOL_TIMEOUT,
+        host=app_module.DB_HOST,
+        dbname=app_module.DB_NAME,
+        user=app_module.DB_USER,
+        password=app_module.DB_PASS,
+        connection_factory=CountingConnection
+    )
+
+
+# -----------------------------
+# Seeding
+# -----------------------------
+def _copy(cur, table, columns, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def seed(prefix, users, areas, capacity, logs, days, open_ratio, rng):
+    started = time.perf_counter()
+    area_codes = [f"{prefix}A{i}" for i in range(areas)]
+    plates = [f"{prefix}{i:07d}" for i in range(users)]
+    now = datetime.now().replace(microsecond=0)
+
+    # vehicles currently inside, never more than an area holds
+    parked, filled = {}, Counter()
+    for plate in rng.sample(plates, min(int(users * open_ratio), areas * capacity)):
+        area = rng.choice([a for a in area_codes if filled[a] < capacity])
+        parked[plate] = area
+        filled[area] += 1
+
+    with db_transaction() as cur:
+        _copy(cur, "parking_areas", ("area_code", "area_name", "capacity", "current_count"),
+              [(code, f"Load test {code}", capacity, 0) for code in area_codes])
+
+        _copy(cur, "users", ("full_name", "id_number", "vehicle_type", "mobile_no", "plate_number", "created_at"),
+              [(f"Load Test {i}", f"{prefix}-{i}", "Car", f"09{i:09d}", plate,
+                now - timedelta(days=rng.randint(0, days)))
+               for i, plate in enumerate(plates)])
+
+        batch = []
+        for i in range(logs):
+            time_in = now - timedelta(days=days) + timedelta(seconds=rng.randint(0, days * 86400))
+            time_out = min(time_in + timedelta(minutes=rng.randint(5, 600)), now)
+            batch.append((rng.choice(plates), time_in, time_out, rng.choice(area_codes)))
+            if len(batch) == 50000:
+                _copy(cur, "parking_logs", ("plate_number", "time_in", "time_out", "parking_area"), batch)
+                batch = []
+        batch += [(plate, now - timedelta(minutes=rng.randint(1, 600)), None, area)
+                  for plate, area in parked.items()]
+        _copy(cur, "parking_logs", ("plate_number", "time_in", "time_out", "parking_area"), batch)
+
+        cur.execute(schema.RECOUNT_OCCUPANCY_SQL)
+        rollups.rebuild(cur, partitions.retention_start(app_module.PARKING_LOGS_RETENTION_MONTHS))
+
+    return {
+        "users": users, "areas": areas, "capacity": capacity, "logs": logs,
+        "open_sessions": len(parked), "seconds": round(time.perf_counter() - started, 2),
+    }, area_codes, plates
+
+
+def cleanup(prefix):
+    with db_transaction() as cur:
+        cur.execute("DELETE FROM parking_logs WHERE plate_number LIKE %s", (prefix + "%",))
+        cur.execute("DELETE FROM users WHERE plate_number LIKE %s", (prefix + "%",))
+        cur.execute("DELETE FROM parking_areas WHERE area_code LIKE %s", (prefix + "%",))
+        rollups.rebuild(cur, partitions.retention_start(app_module.PARKING_LOGS_RETENTION_MONTHS))
+
+
+# -----------------------------
+# Workload
+# -----------------------------
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    def __init__(self, plates, area_codes):
+        self.plates = plates
+        self.area_codes = area_codes
+        self.payloads = {plate: app_module.qr_payload(plate) for plate in plates}
+
+    def qr_text(self, rng):
+        return self.payloads[rng.choice(self.plates)]
+
+    def search_term(self, rng):
+        # typeahead-style plate prefixes
+        plate = rng.choice(self.plates)
+        return plate[:rng.randint(4, len(plate))]
+
+
+def _scan_area(w, rng):
+    return "POST", f"/scan_area/{rng.choice(w.area_codes)}", {"qr_text": w.qr_text(rng)}
+
+
+def _scan_qr_browser(w, rng):
+    return "POST", "/scan_qr_browser", {"qr_text": w.qr_text(rng)}
+
+
+def _search(w, rng):
+    return "GET", f"/search?q={w.search_term(rng)}", None
+
+
+def _admin_dashboard(w, rng):
+    return "GET", "/admin_dashboard", None
+
+
+def _history(w, rng):
+    return "GET", "/history", None
+
+
+ENDPOINTS = {
+    "scan_area": _scan_area,
+    "scan_qr_browser": _scan_qr_browser,
+    "search": _search,
+    "admin_dashboard": _admin_dashboard,
+    "history": _history,
+}
+
+
+class Client:
+    # same interface for the in-process test client and a real HTTP server
+    def __init__(self, url):
+        self.url = url
+        if url:
+            import requests
+            self.session = requests.Session()
+            self.session.post(f"{url}/admin_login", data={"password": app_module.ADMIN_PASSWORD})
+        else:
+            self.client = app.test_client()
+            with self.client.session_transaction() as sess:
+                sess["admin"] = True
+
+    def request(self, method, path, body):
+        if self.url:
+            res = self.session.request(method, self.url + path, json=body, allow_redirects=False)
+            status, data = res.status_code, res.content
+            result = res.json().get("status") if "json" in res.headers.get("Content-Type", "") else None
+        else:
+            res = self.client.open(path, method=method, json=body)
+            status, data = res.status_code, res.data
+            result = (res.get_json(silent=True) or {}).get("status") if res.is_json else None
+        return status, result, len(data)
+
+
+def run_load(workload, mix, threads, duration, warmup, url, seed_value):
+    names, weights = list(mix), list(mix.values())
+    samples = defaultdict(list)         # endpoint -> [(latency_ms, statements)]
+    outcomes = defaultdict(Counter)     # endpoint -> {"200 entered": n, ...}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        rng = random.Random(seed_value * 1000 + index)
+        client = Client(url)
+        local_samples = defaultdict(list)
+        local_outcomes = defaultdict(Counter)
+
+        barrier.wait()
+        measure_from = time.perf_counter() + warmup
+        deadline = measure_from + duration
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, body = ENDPOINTS[name](workload, rng)
+
+            before = statements()
+            t0 = time.perf_counter()
+            try:
+                status, result, _ = client.request(method, path, body)
+            except Exception as e:
+                status, result = "exception", type(e).__name__
+            latency = (time.perf_counter() - t0) * 1000
+
+            if t0 >= measure_from:
+                local_samples[name].append((latency, None if url else statements() - before))
+                local_outcomes[name][f"{status} {result}" if result else str(status)] += 1
+
+        with lock:
+            for name, values in local_samples.items():
+                samples[name].extend(values)
+            for name, counts in local_outcomes.items():
+                outcomes[name].update(counts)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return samples, outcomes
+
+
+# -----------------------------
+# Reporting
+# -----------------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def summarize(values, outcomes, duration):
+    latencies = sorted(v[0] for v in values)
+    counts = [v[1] for v in values if v[1] is not None]
+    errors = sum(n for key, n in outcomes.items() if key[:1] not in ("2", "3"))
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "queries_per_request": round(sum(counts) / len(counts), 2) if counts else None,
+        "queries_max": max(counts) if counts else None,
+        "outcomes": dict(outcomes),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def print_report(report, previous=None):
+    print(f"{'endpoint':<17}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}")
+    for name, r in report["endpoints"].items():
+        print(f"{name:<17}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>9}"
+              f"{r['p50_ms']!s:>9}{r['p95_ms']!s:>9}{r['p99_ms']!s:>9}{r['queries_per_request']!s:>7}")
+        old = (previous or {}).get("endpoints", {}).get(name)
+        if old and old.get("p95_ms") and r["p95_ms"]:
+            change = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            rps = (r["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100 \
+                if old.get("throughput_rps") else 0
+            print(f"{'':<17}vs {previous['meta'].get('revision') or 'previous'}: "
+                  f"p95 {change:+.1f}%  rps {rps:+.1f}%")
+    t = report["total"]
+    print(f"{'total':<17}{t['requests']:>8}{t['errors']:>6}{t['throughput_rps']:>9}"
+          f"{t['p50_ms']!s:>9}{t['p95_ms']!s:>9}{t['p99_ms']!s:>9}{t['queries_per_request']!s:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan / dashboard load test")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--areas", type=int, default=4)
+    parser.add_argument("--capacity", type=int, default=500)
+    parser.add_argument("--logs", type=int, default=100000, help="closed historical parking_logs")
+    parser.add_argument("--days", type=int, default=90, help="history spread over this many days")
+    parser.add_argument("--open-ratio", type=float, default=0.3, help="share of users currently parked")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before that")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in place")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    prefix = "LT" + uuid.uuid4().hex[:4].upper()
+
+    if not args.url:
+        install_counting_pool(maxconn=args.threads + 4)
+
+    try:
+        seeded, area_codes, plates = seed(prefix, args.users, args.areas, args.capacity,
+                                          args.logs, args.days, args.open_ratio, rng)
+        print(f"seeded {seeded} as {prefix}*")
+
+        workload = Workload(plates, area_codes)
+        samples, outcomes = run_load(workload, mix, args.threads, args.duration, args.warmup,
+                                     args.url, args.seed)
+    finally:
+        if not args.keep:
+            cleanup(prefix)
+
+    all_samples = [s for values in samples.values() for s in values]
+    all_outcomes = Counter()
+    for counts in outcomes.values():
+        all_outcomes.update(counts)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "mode": "http" if args.url else "in-process",
+            "args": vars(args),
+        },
+        "seed": seeded,
+        "endpoints": {
+            name: summarize(samples[name], outcomes[name], args.duration) for name in mix if samples[name]
+        },
+        "total": summarize(all_samples, all_outcomes, args.duration),
+    }
+    if not args.url:
+        report["pool"] = app_module.get_pool().stats()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        print("saved", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# metrics.py
+# Per-request SQL timing and Prometheus-format metrics.
+#
+#   TimedCursor   - RealDictCursor that, on sampled requests only, records
+#                   statement count, DB time and the slowest statement in
+#                   flask.g; unsampled requests pay one attribute lookup
+#   Counter /
+#   Histogram     - minimal thread-safe Prometheus metrics (per process),
+#                   rendered by REGISTRY.render() for GET /metrics
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2.extras
+from flask import g, has_request_context, request
+
+log = logging.getLogger("parking.sql")
+
+SLOW_QUERY_MS = 200.0
+SLOW_REQUEST_MS = 1000.0
+
+
+# -----------------------------
+# SQL timing
+# -----------------------------
+class RequestSQL:
+    __slots__ = ("count", "seconds", "slowest", "slowest_sql")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+
+
+def _sql_text(query):
+    text = query.decode("utf-8", "replace") if isinstance(query, bytes) else str(query)
+    return " ".join(text.split())[:500]
+
+
+def _record(query, elapsed):
+    stats = g.sql
+    stats.count += 1
+    stats.seconds += elapsed
+    if elapsed > stats.slowest:
+        stats.slowest = elapsed
+        stats.slowest_sql = query
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        log.warning(json.dumps({
+            "event": "slow_query",
+            "route": request.endpoint,
+            "method": request.method,
+            "ms": round(elapsed * 1000, 2),
+            "statement": _sql_text(query),
+        }))
+
+
+class TimedCursor(psycopg2.extras.RealDictCursor):
+    def execute(self, query, vars=None):
+        if not has_request_context() or g.get("sql") is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _record(query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        if not has_request_context() or g.get("sql") is None:
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record(query, time.perf_counter() - started)
+
+
+def server_timing(stats, total_seconds):
+    parts = [f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"']
+    if stats.slowest_sql is not None:
+        parts.append(f"db-slowest;dur={stats.slowest * 1000:.2f}")
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def log_slow_request(route, method, stats, total_seconds):
+    if total_seconds * 1000 < SLOW_REQUEST_MS:
+        return
+    log.warning(json.dumps({
+        "event": "slow_request",
+        "route": route,
+        "method": method,
+        "ms": round(total_seconds * 1000, 2),
+        "queries": stats.count,
+        "db_ms": round(stats.seconds * 1000, 2),
+        "slowest_ms": round(stats.slowest * 1000, 2),
+        "slowest_statement": _sql_text(stats.slowest_sql) if stats.slowest_sql is not None else None,
+    }))
+
+
+# -----------------------------
+# Prometheus metrics
+# -----------------------------
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, total in items:
+            yield f"{self.name}{_labels(self.labels, values)} {total:g}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _labels(self.labels + ("le",), values + (bound,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {series[-1]:g}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.add(Histogram(
+    "parking_http_request_duration_seconds", "Request latency by route",
+    labels=("route", "method", "status")))
+SQL_QUERIES = REGISTRY.add(Histogram(
+    "parking_sql_queries_per_request", "SQL statements per sampled request",
+    labels=("route",), buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100)))
+SQL_SECONDS = REGISTRY.add(Histogram(
+    "parking_sql_duration_seconds_per_request", "Total DB time per sampled request",
+    labels=("route",)))
+SCAN_OUTCOMES = REGISTRY.add(Counter(
+    "parking_scan_outcomes_total", "Scan results by endpoint and outcome",
+    labels=("endpoint", "outcome")))
+POOL = REGISTRY.add(Gauge(
+    "parking_db_pool", "Connection pool state", labels=("state",)))
@@ -0,0 +1,161 @@
+# occupancy_feed.py
+# Live parking_areas occupancy for the /occupancy/stream SSE endpoint.
+#
+# A trigger on parking_areas (migration 007) NOTIFYs every committed change to
+# current_count. Each web process holds ONE listening connection; the hub keeps
+# the latest count per area in memory and fans changes out to any number of
+# browser subscribers, so watchers add no database load at all.
+#
+# Subscribers coalesce: if a client is slow, it gets the newest state of each
+# area it missed rather than a growing backlog of intermediate deltas.
+import json
+import select
+import threading
+import time
+
+CHANNEL = "parking_occupancy"
+
+
+class Subscriber:
+    def __init__(self, areas=None):
+        self.areas = set(areas) if areas else None
+        self._cond = threading.Condition()
+        self._pending = {}
+        self.closed = False
+
+    def push(self, area_code, state):
+        if self.areas is not None and area_code not in self.areas:
+            return
+        with self._cond:
+            self._pending[area_code] = state
+            self._cond.notify()
+
+    def wait(self, timeout):
+        # returns the changed areas since the last call ([] on timeout)
+        with self._cond:
+            if not self._pending and not self.closed:
+                self._cond.wait(timeout)
+            changes, self._pending = list(self._pending.values()), {}
+        return changes
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class OccupancyHub:
+    def __init__(self, connect, load_areas, channel=CHANNEL, retry_sec=2.0, on_change=None):
+        self.connect = connect          # -> new dedicated psycopg2 connection
+        self.load_areas = load_areas    # -> [{"area_code", "capacity", "current_count"}]
+        self.on_change = on_change      # called with each new area state
+        self.channel = channel
+        self.retry_sec = retry_sec
+
+        self._lock = threading.Lock()
+        self._state = {}
+        self._subscribers = set()
+        self._thread = None
+        self._ready = threading.Event()
+        self._stats = {"notifications": 0, "reconnects": 0, "delivered": 0}
+
+    # -----------------------------
+    # Listener
+    # -----------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="occupancy-listen", daemon=True)
+                self._thread.start()
+        self._ready.wait(5)
+
+    def _resync(self):
+        # after (re)connecting: anything missed while disconnected shows up as a change
+        for row in self.load_areas():
+            self._apply(row)
+
+    def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {self.channel}")
+                self._resync()
+                self._ready.set()
+
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        self._stats["notifications"] += 1
+                        try:
+                            self._apply(json.loads(note.payload))
+                        except ValueError:
+                            pass
+            except Exception:
+                self._ready.clear()
+                self._stats["reconnects"] += 1
+                time.sleep(self.retry_sec)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _apply(self, row):
+        code = row["area_code"]
+        count = int(row["current_count"])
+        with self._lock:
+            previous = self._state.get(code)
+            if previous is not None and previous["current_count"] == count \
+                    and previous["capacity"] == row["capacity"]:
+                return
+            state = {
+                "area_code": code,
+                "capacity": row["capacity"],
+                "current_count": count,
+                "delta": count - previous["current_count"] if previous else 0,
+                "at": time.time(),
+            }
+            self._state[code] = state
+            subscribers = list(self._subscribers)
+
+        if self.on_change is not None:
+            try:
+                self.on_change(state)
+            except Exception:
+                pass
+        for sub in subscribers:
+            sub.push(code, state)
+        self._stats["delivered"] += len(subscribers)
+
+    # -----------------------------
+    # Subscribers
+    # -----------------------------
+    def snapshot(self, areas=None):
+        with self._lock:
+            return [s for code, s in sorted(self._state.items()) if not areas or code in areas]
+
+    def subscribe(self, areas=None):
+        sub = Subscriber(areas)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["subscribers"] = len(self._subscribers)
+            s["areas"] = len(self._state)
+        s["listening"] = self._ready.is_set()
+        return s
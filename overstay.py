@@ -0,0 +1,268 @@
+# overstay.py
+# Background overstay detection.
+#
+# Rules are columns on parking_areas (schema 010):
+#   max_stay_minutes   - flag once a session is older than this (NULL: no limit)
+#   overnight_allowed  - if false, flag sessions still open at the midnight after entry
+#   closes_at          - flag sessions still open at the area's closing time
+#
+# Every open session gets one heap entry per rule that applies to it, keyed by
+# the moment it would become an overstay. A tick pops only the entries that
+# are due, checks that those few sessions are still open in the same area,
+# and writes overstay_alerts rows. New sessions are picked up by id since the
+# last tick, area transfers by parking_logs.moved_at (schema 011), so a move
+# into a stricter area is rescheduled on the next tick. A periodic resync
+# rebuilds the heap to catch rule edits, late commits and sessions that
+# ended. Alerts whose session has ended are resolved in the same tick, so
+# readers only ever query overstay_alerts.
+#
+# Several web processes may run a monitor: each tick takes a transaction-level
+# advisory lock and the processes that don't get it skip (and resync when
+# they next win). Within a process one tick runs at a time; stats() never
+# waits for a tick's database work.
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+RULES = ("max_duration", "overnight", "after_hours")
+# sessions opened without an area (entry/exit toggle) keep the old overnight check
+DEFAULT_RULE = {"max_stay_minutes": None, "overnight_allowed": False, "closes_at": None}
+LOCK_KEY = "overstay_monitor"
+# moves are polled from a little before the previous tick, so a transfer whose
+# transaction started before that tick but committed after it is still seen
+MOVE_SLACK = timedelta(minutes=5)
+
+
+def deadlines(rule, time_in):
+    # -> [(due_at, rule_name)] for one session under one area's rules
+    due = []
+    if rule["max_stay_minutes"]:
+        due.append((time_in + timedelta(minutes=rule["max_stay_minutes"]), "max_duration"))
+    if not rule["overnight_allowed"]:
+        due.append((datetime.combine(time_in.date() + timedelta(days=1), datetime.min.time()), "overnight"))
+    if rule["closes_at"] is not None:
+        closing = datetime.combine(time_in.date(), rule["closes_at"])
+        if closing <= time_in:
+            closing += timedelta(days=1)
+        due.append((closing, "after_hours"))
+    return due
+
+
+class OverstayMonitor:
+    def __init__(self, transaction, interval=30.0, resync_sec=600.0, on_change=None):
+        self.transaction = transaction  # -> context manager yielding a dict-row cursor
+        self.interval = interval
+        self.resync_sec = resync_sec
+        self.on_change = on_change      # called with (flagged, resolved) when either is non-zero
+
+        self._lock = threading.Lock()       # _stats and _thread only
+        self._tick_lock = threading.Lock()  # everything below; held for a whole tick
+        self._thread = None
+        self._heap = []                 # (due_at, log_id, rule, area)
+        self._queued = {}               # (log_id, rule) -> area of the live heap entry
+        self._alerted = set()           # (log_id, rule) with an unresolved alert
+        self._rules = {}
+        self._last_id = 0
+        self._moved_since = None
+        self._synced_at = None
+        self._stats = {
+            "ticks": 0, "skipped": 0, "resyncs": 0, "errors": 0,
+            "flagged": 0, "resolved": 0, "last_tick_ms": None, "last_tick_at": None,
+            "queued": 0, "heap": 0, "open_alerts": 0, "next_due": None,
+        }
+
+    # -----------------------------
+    # Scheduler
+    # -----------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="overstay-monitor", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                self._count(errors=1)
+                self._synced_at = None
+            time.sleep(self.interval)
+
+    def tick(self, now=None):
+        # one evaluation pass; returns (flagged, resolved), or None if a tick
+        # is already running here or another process holds the advisory lock
+        if not self._tick_lock.acquire(blocking=False):
+            self._count(skipped=1)
+            return None
+        try:
+            result = self._tick(now or datetime.now())
+        finally:
+            self._tick_lock.release()
+
+        if result and any(result) and self.on_change is not None:
+            self.on_change(*result)
+        return result
+
+    def _tick(self, now):
+        started = time.perf_counter()
+        with self.transaction() as cur:
+            cur.execute(
+                "SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS leader, NOW()::timestamp AS db_now",
+                (LOCK_KEY,)
+            )
+            row = cur.fetchone()
+            if not row["leader"]:
+                self._synced_at = None
+                self._count(skipped=1)
+                return None
+
+            resync = self._synced_at is None or time.monotonic() - self._synced_at >= self.resync_sec
+            if resync:
+                self._resync(cur)
+            else:
+                self._poll_new(cur)
+            self._moved_since = row["db_now"] - MOVE_SLACK
+            flagged = self._evaluate(cur, now)
+            resolved = self._resolve(cur, now)
+
+        with self._lock:
+            self._stats["ticks"] += 1
+            self._stats["resyncs"] += resync
+            self._stats["flagged"] += flagged
+            self._stats["resolved"] += resolved
+            self._stats["last_tick_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._stats["last_tick_at"] = now.isoformat(timespec="seconds")
+            self._stats["queued"] = len(self._queued)
+            self._stats["heap"] = len(self._heap)
+            self._stats["open_alerts"] = len(self._alerted)
+            self._stats["next_due"] = self._heap[0][0].isoformat(timespec="seconds") if self._heap else None
+        return flagged, resolved
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                self._stats[name] += n
+
+    # -----------------------------
+    # Heap of open sessions
+    # -----------------------------
+    def _push(self, log_id, area, time_in):
+        rule = self._rules.get(area or "", DEFAULT_RULE)
+        for due_at, name in deadlines(rule, time_in):
+            key = (log_id, name)
+            if key in self._alerted or self._queued.get(key, False) == area:
+                continue
+            self._queued[key] = area
+            heapq.heappush(self._heap, (due_at, log_id, name, area))
+
+    def _resync(self, cur):
+        cur.execute(
+            "SELECT area_code, max_stay_minutes, overnight_allowed, closes_at FROM parking_areas"
+        )
+        self._rules = {row["area_code"]: row for row in cur.fetchall()}
+
+        cur.execute("SELECT log_id, rule FROM overstay_alerts WHERE resolved_at IS NULL")
+        self._alerted = {(row["log_id"], row["rule"]) for row in cur.fetchall()}
+
+        # read the high-water mark first: a session committed in between is
+        # seen twice, which _push ignores, rather than not at all
+        cur.execute("SELECT COALESCE(MAX(id), 0) AS last_id FROM parking_logs")
+        self._last_id = cur.fetchone()["last_id"]
+
+        self._heap, self._queued = [], {}
+        cur.execute("SELECT id, parking_area, time_in FROM parking_logs WHERE time_out IS NULL")
+        for row in cur.fetchall():
+            self._push(row["id"], row["parking_area"], row["time_in"])
+
+        self._synced_at = time.monotonic()
+
+    def _poll_new(self, cur):
+        cur.execute(
+            "SELECT id, parking_area, time_in, time_out IS NULL AS open FROM parking_logs "
+            "WHERE id > %s ORDER BY id",
+            (self._last_id,)
+        )
+        for row in cur.fetchall():
+            self._last_id = row["id"]
+            if row["open"]:
+                self._push(row["id"], row["parking_area"], row["time_in"])
+
+        # area transfers: _push supersedes the entries queued for the old area
+        if self._moved_since is not None:
+            cur.execute(
+                "SELECT id, parking_area, time_in FROM parking_logs "
+                "WHERE time_out IS NULL AND moved_at >= %s",
+                (self._moved_since,)
+            )
+            for row in cur.fetchall():
+                self._push(row["id"], row["parking_area"], row["time_in"])
+
+    def _evaluate(self, cur, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            key = (entry[1], entry[2])
+            if self._queued.get(key, False) != entry[3]:
+                continue    # superseded after an area transfer
+            del self._queued[key]
+            due.append(entry)
+        if not due:
+            return 0
+
+        cur.execute(
+            "SELECT id, plate_number, parking_area, time_in FROM parking_logs "
+            "WHERE id = ANY(%s) AND time_out IS NULL",
+            (list({entry[1] for entry in due}),)
+        )
+        open_logs = {row["id"]: row for row in cur.fetchall()}
+
+        alerts = []
+        for due_at, log_id, name, area in due:
+            log = open_logs.get(log_id)
+            if log is None:
+                continue    # left before the deadline
+            if (log["parking_area"] or "") != (area or ""):
+                # transferred: the new area's rules decide
+                self._push(log_id, log["parking_area"], log["time_in"])
+                continue
+            alerts.append((log_id, log["time_in"], log["plate_number"], area, name, due_at, now))
+
+        if not alerts:
+            return 0
+        flagged = execute_values(
+            cur,
+            "INSERT INTO overstay_alerts "
+            "(log_id, time_in, plate_number, parking_area, rule, due_at, flagged_at) VALUES %s "
+            "ON CONFLICT (log_id, rule) DO NOTHING RETURNING log_id",
+            alerts, fetch=True
+        )
+        self._alerted.update((a[0], a[4]) for a in alerts)
+        return len(flagged)
+
+    def _resolve(self, cur, now):
+        # sessions that ended (or whose log is gone) close their alerts
+        cur.execute("""
+            UPDATE overstay_alerts a
+            SET resolved_at = COALESCE(l.time_out, %s)
+            FROM overstay_alerts x
+            LEFT JOIN parking_logs l ON l.id = x.log_id AND l.time_in = x.time_in
+            WHERE a.id = x.id AND a.resolved_at IS NULL
+              AND (l.id IS NULL OR l.time_out IS NOT NULL)
+            RETURNING a.log_id, a.rule
+        """, (now,))
+        rows = cur.fetchall()
+        self._alerted.difference_update((row["log_id"], row["rule"]) for row in rows)
+        return len(rows)
+
+    def stats(self):
+        # heap figures are as of the last completed tick
+        with self._lock:
+            s = dict(self._stats)
+        s["running"] = self._thread is not None
+        return s
@@ -0,0 +1,255 @@
+# partitions.py
+# Monthly range partitions of parking_logs on time_in.
+#
+#   parking_logs_pYYYY_MM  - one per calendar month, created MONTHS_AHEAD early
+#   parking_logs_default   - catches anything outside the monthly ranges, so an
+#                            insert never fails for want of a partition
+#
+# Queries filtering on time_in (day / month / today views, rollup rebuilds)
+# only touch the matching partitions, and the hot month stays small.
+# Open-session lookups (by plate, or time_out IS NULL) can't be bounded on
+# time_in: a vehicle may stay parked for months, a month with an open session
+# is never archived, and batch scans carry their own older timestamps. They
+# probe every attached partition's index instead - one small index lookup per
+# month in the retention window, not a scan.
+#
+# Retention: months older than the retention window are detached from
+# parking_logs (only once none of their sessions is still open) and either
+#   "file"  - written to <archive_dir>/parking_logs_YYYY_MM.csv.gz, then dropped
+#   "table" - attached to parking_logs_archive, a cold table the app never reads
+# The report rollups are not touched, so daily / monthly totals stay complete.
+import gzip
+import os
+import re
+from datetime import date
+
+PARENT = "parking_logs"
+DEFAULT = "parking_logs_default"
+ARCHIVE = "parking_logs_archive"
+MONTHS_AHEAD = 3
+ARCHIVE_MODES = ("file", "table")
+
+_NAME = re.compile(r"parking_logs_p(\d{4})_(\d{2})$")
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, n):
+    years, index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_p{month:%Y_%m}"
+
+
+def _lock(cur):
+    # one maintenance run at a time (app thread, cron, migrate)
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('parking_logs_partitions'))")
+
+
+def is_partitioned(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (PARENT,))
+    row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions(cur, parent=PARENT):
+    # [(month, name)] of the monthly partitions, oldest first
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        (parent,)
+    )
+    months = []
+    for (name,) in cur.fetchall():
+        m = _NAME.match(name)
+        if m:
+            months.append((date(int(m.group(1)), int(m.group(2)), 1), name))
+    return sorted(months)
+
+
+def create_partition(cur, month):
+    name = partition_name(month)
+    start, end = month, add_months(month, 1)
+    # rows that already landed in the default partition for this month have to
+    # move first, or ATTACH refuses the overlapping range
+    cur.execute(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+    cur.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT} WHERE time_in >= %s AND time_in < %s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        (start, end)
+    )
+    cur.execute(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+    return name
+
+
+def ensure_partitions(cur, ahead=MONTHS_AHEAD, today=None):
+    # current month plus `ahead` more; returns the names created
+    _lock(cur)
+    existing = {month for month, _ in list_partitions(cur)}
+    current = month_start(today or date.today())
+    created = []
+    for n in range(ahead + 1):
+        month = add_months(current, n)
+        if month not in existing:
+            created.append(create_partition(cur, month))
+    return created
+
+
+def retention_start(keep_months, today=None):
+    # first month kept in parking_logs (None: keep everything)
+    if not keep_months:
+        return None
+    return add_months(month_start(today or date.today()), -keep_months)
+
+
+def expired_partitions(cur, keep_months, today=None):
+    cutoff = retention_start(keep_months, today)
+    if cutoff is None:
+        return []
+    return [(month, name) for month, name in list_partitions(cur) if add_months(month, 1) <= cutoff]
+
+
+def _archive_to_file(cur, name, month, archive_dir):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{PARENT}_{month:%Y_%m}.csv.gz")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            cur.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", gz)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    cur.execute(f"DROP TABLE {name}")
+    return path
+
+
+def _archive_to_table(cur, name, month):
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE} (LIKE {PARENT} INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (time_in)"
+    )
+    cur.execute(
+        f"ALTER TABLE {ARCHIVE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (month, add_months(month, 1))
+    )
+    return ARCHIVE
+
+
+def archive_expired(cur, keep_months, mode="file", archive_dir="archive", today=None):
+    # returns ([(name, destination)], [names skipped because of open sessions])
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"unknown archive mode '{mode}'")
+    _lock(cur)
+
+    archived, skipped = [], []
+    for month, name in expired_partitions(cur, keep_months, today):
+        cur.execute(f"SELECT 1 FROM {name} WHERE time_out IS NULL LIMIT 1")
+        if cur.fetchone():
+            skipped.append(name)
+            continue
+
+        cur.execute(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+        if mode == "file":
+            archived.append((name, _archive_to_file(cur, name, month, archive_dir)))
+        else:
+            archived.append((name, _archive_to_table(cur, name, month)))
+    return archived, skipped
+
+
+# -----------------------------
+# Migration (schema 008)
+# -----------------------------
+def _carry_over(cur, old):
+    # -> (index_defs, foreign_keys) to recreate on the partitioned table;
+    # raises if something can't be kept (a partitioned table's unique indexes
+    # must include time_in, and other tables can't reference id alone)
+    cur.execute(
+        "SELECT i.indisprimary, i.indisunique, i.indisexclusion, c.relname, "
+        "       pg_get_indexdef(i.indexrelid), "
+        "       EXISTS (SELECT 1 FROM pg_attribute a WHERE a.attrelid = i.indrelid "
+        "               AND a.attnum = ANY(i.indkey::int2[]) AND a.attname = 'time_in') "
+        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass(%s)",
+        (old,)
+    )
+    index_defs, lost = [], []
+    for primary, unique, exclusion, name, definition, has_time_in in cur.fetchall():
+        if primary:
+            continue    # becomes (id, time_in)
+        if exclusion or (unique and not has_time_in):
+            lost.append(f"index {name}: {definition}")
+        else:
+            index_defs.append(definition)
+
+    cur.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        (old,)
+    )
+    foreign_keys = cur.fetchall()
+
+    cur.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+        (old,)
+    )
+    lost += [f"foreign key {name} on {table}" for table, name in cur.fetchall()]
+
+    if lost:
+        raise RuntimeError(
+            f"can't partition {PARENT} without dropping: " + "; ".join(lost)
+            + ". Drop or change these first, then rerun the migration."
+        )
+    return index_defs, foreign_keys
+
+
+def partition_parking_logs(cur, today=None):
+    # swap the plain parking_logs table for a partitioned one with the same
+    # columns, rows, id sequence, CHECK / NOT NULL constraints, foreign keys
+    # and secondary indexes; aborts (nothing changed) if any of them can't be
+    # carried over
+    if is_partitioned(cur):
+        return
+    old = f"{PARENT}_unpartitioned"
+
+    cur.execute(f"ALTER TABLE {PARENT} RENAME TO {old}")
+    index_defs, foreign_keys = _carry_over(cur, old)
+    cur.execute(
+        f"CREATE TABLE {PARENT} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (time_in)"
+    )
+    cur.execute(f"ALTER TABLE {PARENT} ALTER COLUMN time_in SET NOT NULL")
+    cur.execute(f"CREATE TABLE {DEFAULT} PARTITION OF {PARENT} DEFAULT")
+
+    cur.execute(f"SELECT MIN(time_in) FROM {old}")
+    first = cur.fetchone()[0]
+    current = month_start(today or date.today())
+    month = month_start(first) if first and first.date() < current else current
+    while month <= add_months(current, MONTHS_AHEAD):
+        cur.execute(
+            f"CREATE TABLE {partition_name(month)} PARTITION OF {PARENT} FOR VALUES FROM (%s) TO (%s)",
+            (month, add_months(month, 1))
+        )
+        month = add_months(month, 1)
+
+    cur.execute(f"INSERT INTO {PARENT} OVERRIDING SYSTEM VALUE SELECT * FROM {old}")
+
+    # a serial id keeps using the old sequence; an identity column got a new one
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id'), pg_get_serial_sequence(%s, 'id')", (old, PARENT))
+    old_seq, new_seq = cur.fetchone()
+    if new_seq:
+        cur.execute(f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {PARENT}), 0) + 1, false)", (new_seq,))
+    elif old_seq:
+        cur.execute(f"ALTER SEQUENCE {old_seq} OWNED BY {PARENT}.id")
+
+    cur.execute(f"DROP TABLE {old}")
+    cur.execute(f"ALTER TABLE {PARENT} ADD PRIMARY KEY (id, time_in)")
+    for sql in index_defs:
+        cur.execute(re.sub(rf"\bON (ONLY )?(\w+\.)?{old}\b", rf"ON \2{PARENT}", sql))
+    for name, definition in foreign_keys:
+        cur.execute(f'ALTER TABLE {PARENT} ADD CONSTRAINT "{name}" {definition}')
+    cur.execute(f"ANALYZE {PARENT}")
@@ -0,0 +1,150 @@
+# qr_cache.py
+# On-demand QR images for /qr/<plate>.
+#
+# Images are addressed by a hash of what they encode (payload + format + render
+# settings), so the same key is valid forever: it is the HTTP ETag, the name in
+# the optional disk cache, and the key of the in-process LRU. Nothing has to be
+# invalidated when a vehicle is deleted; unreferenced disk entries can be
+# removed at any time.
+import hashlib
+import io
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+import qrcode.image.svg
+
+FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# bump when the rendering below changes so old cache entries stop matching
+RENDER_VERSION = "1"
+
+
+def content_key(payload, fmt):
+    return hashlib.sha256(f"{RENDER_VERSION}|{fmt}|{payload}".encode("utf-8")).hexdigest()
+
+
+def render(payload, fmt):
+    buf = io.BytesIO()
+    if fmt == "svg":
+        qrcode.make(payload, image_factory=qrcode.image.svg.SvgPathImage).save(buf)
+    else:
+        qrcode.make(payload).save(buf)
+    return buf.getvalue()
+
+
+def _disk_path(disk_dir, key, fmt):
+    return os.path.join(disk_dir, key[:2], f"{key}.{fmt}")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class QRCache:
+    def __init__(self, max_items=2048, disk_dir=None):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._stats = {"hits": 0, "disk_hits": 0, "renders": 0, "evictions": 0}
+
+    def get(self, payload, fmt):
+        # returns (key, image bytes)
+        key = content_key(payload, fmt)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self._stats["hits"] += 1
+                return key, data
+
+        data = self._load(key, fmt)
+        if data is None:
+            data = render(payload, fmt)
+            with self._lock:
+                self._stats["renders"] += 1
+            if self.disk_dir:
+                _write_atomic(_disk_path(self.disk_dir, key, fmt), data)
+
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self._stats["evictions"] += 1
+        return key, data
+
+    def _load(self, key, fmt):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(_disk_path(self.disk_dir, key, fmt), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        return data
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._items)
+        s["disk_dir"] = self.disk_dir
+        return s
+
+
+def prune(disk_dir, max_age, now=None):
+    # drop disk entries written more than max_age seconds ago. Payloads change
+    # when their expiry window rolls over (or a key / RENDER_VERSION changes),
+    # so older files are no longer referenced; anything removed too early is
+    # just rendered again. Returns the number of files removed.
+    cutoff = (now or time.time()) - max_age
+    removed = 0
+    for root, _, files in os.walk(disk_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+# -----------------------------
+# Pre-rendering (bulk import)
+# -----------------------------
+def _prewarm_job(job):
+    payload, fmt, disk_dir = job
+    path = _disk_path(disk_dir, content_key(payload, fmt), fmt)
+    if not os.path.exists(path):
+        _write_atomic(path, render(payload, fmt))
+    return path
+
+
+def prewarm(payloads, disk_dir, fmt="png", workers=None, chunksize=64):
+    # render straight into the disk cache from a process pool (qrcode/PIL is pure CPU)
+    jobs = [(payload, fmt, disk_dir) for payload in payloads]
+    if not jobs:
+        return 0
+    if workers == 1 or len(jobs) < chunksize:
+        for job in jobs:
+            _prewarm_job(job)
+        return len(jobs)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(1 for _ in pool.map(_prewarm_job, jobs, chunksize=chunksize))
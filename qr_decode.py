@@ -0,0 +1,115 @@
+# qr_decode.py
+# QR decode strategies for scan_qr.py and bench_decode.py.
+#
+# decoder.decode(frame) -> [(text, (x, y, w, h)), ...] in full-frame pixels.
+#
+#   FullFrameDecoder  - pyzbar on the raw BGR frame (the original behaviour)
+#   FastDecoder       - grayscale, skips still frames, tries a tracked ROI
+#                       around the last hit, then a downscaled frame, and only
+#                       falls back to a full-resolution decode every N frames
+import cv2
+from pyzbar.pyzbar import decode as zbar_decode
+
+
+def _results(found, scale=1.0, dx=0, dy=0):
+    out = []
+    for qr in found:
+        x, y, w, h = qr.rect
+        rect = (int(x / scale) + dx, int(y / scale) + dy, int(w / scale), int(h / scale))
+        out.append((qr.data.decode("utf-8").strip(), rect))
+    return out
+
+
+class FullFrameDecoder:
+    name = "full"
+
+    def decode(self, frame):
+        return _results(zbar_decode(frame))
+
+    def stats(self):
+        return {}
+
+
+class FastDecoder:
+    name = "fast"
+
+    def __init__(self, scale=0.5, roi_margin=0.6, full_every=15,
+                 motion_threshold=2.0, motion_size=(64, 48)):
+        self.scale = scale
+        self.roi_margin = roi_margin
+        self.full_every = full_every
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+
+        self._last_rect = None
+        self._last_thumb = None
+        self._since_full = 0
+        self._counts = {"skipped_still": 0, "roi": 0, "downscaled": 0, "full": 0, "miss": 0}
+
+    def _still(self, gray):
+        # mean absolute difference of tiny thumbnails; cheap enough to run every frame
+        thumb = cv2.resize(gray, self.motion_size, interpolation=cv2.INTER_AREA)
+        previous, self._last_thumb = self._last_thumb, thumb
+        if previous is None:
+            return False
+        return float(cv2.absdiff(thumb, previous).mean()) < self.motion_threshold
+
+    def _roi(self, gray):
+        if self._last_rect is None:
+            return []
+        x, y, w, h = self._last_rect
+        mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+        height, width = gray.shape[:2]
+        x0, y0 = max(x - mx, 0), max(y - my, 0)
+        x1, y1 = min(x + w + mx, width), min(y + h + my, height)
+        if x1 <= x0 or y1 <= y0:
+            return []
+        return _results(zbar_decode(gray[y0:y1, x0:x1]), dx=x0, dy=y0)
+
+    def decode(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        self._since_full += 1
+        due_full = self._since_full >= self.full_every
+
+        still = self._still(gray)
+
+        if still and not due_full:
+            self._counts["skipped_still"] += 1
+            return []
+
+        found = self._roi(gray)
+        if found:
+            self._counts["roi"] += 1
+        elif not due_full and self.scale < 1.0:
+            small = cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                               interpolation=cv2.INTER_AREA)
+            found = _results(zbar_decode(small), scale=self.scale)
+            if found:
+                self._counts["downscaled"] += 1
+
+        if not found and due_full:
+            found = _results(zbar_decode(gray))
+            self._counts["full"] += 1
+
+        if due_full:
+            self._since_full = 0
+
+        if found:
+            self._last_rect = found[0][1]
+        else:
+            self._counts["miss"] += 1
+            self._last_rect = None
+        return found
+
+    def stats(self):
+        return dict(self._counts)
+
+
+STRATEGIES = {
+    "full": FullFrameDecoder,
+    "fast": FastDecoder,
+}
+
+
+def make_decoder(name, **kwargs):
+    return STRATEGIES[name](**kwargs)
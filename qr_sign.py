@@ -0,0 +1,105 @@
+# qr_sign.py
+# Signed QR payloads.
+#
+#   P1.<plate>.<expiry>.<kid>.<mac>
+#
+#   expiry - last valid day, as days since 1970-01-01 in base36
+#   kid    - which signing key was used (keys can be rotated without
+#            invalidating codes that are already printed)
+#   mac    - HMAC-SHA256 over "P1.<plate>.<expiry>.<kid>", truncated to 80 bits,
+#            base32 without padding
+#
+# Everything is plain ASCII so it survives any QR reader. Verification is a
+# string split, one HMAC over ~30 bytes from a pre-keyed state and a constant
+# time compare: a few microseconds, and no database access.
+import base64
+import hashlib
+import hmac
+from datetime import date, timedelta
+
+VERSION = "P1"
+MAC_BYTES = 10
+EPOCH = date(1970, 1, 1)
+
+
+class InvalidQR(ValueError):
+    pass
+
+
+class ExpiredQR(InvalidQR):
+    pass
+
+
+def _b36(n):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+def parse_keys(text):
+    # "k1=secret,k2=other" -> {"k1": b"secret", "k2": b"other"}
+    keys = {}
+    for part in (text or "").split(","):
+        if "=" in part:
+            kid, secret = part.split("=", 1)
+            keys[kid.strip()] = secret.strip().encode("utf-8")
+    return keys
+
+
+def is_signed(text):
+    return text.startswith(VERSION + ".")
+
+
+def expiry(today, valid_days, renew_days):
+    # the same date for every day of a renew_days window (so the payload, its
+    # image and ETag stay stable), and always at least valid_days ahead
+    window = (today - EPOCH).days // renew_days * renew_days
+    return EPOCH + timedelta(days=window + renew_days - 1 + valid_days)
+
+
+class Signer:
+    def __init__(self, keys, current_kid):
+        if current_kid not in keys:
+            raise ValueError(f"signing key '{current_kid}' is not configured")
+        for kid in keys:
+            if not kid or "." in kid:
+                raise ValueError(f"invalid key id '{kid}'")
+        self.current_kid = current_kid
+        # keyed HMAC states; copy() skips re-hashing the key pads on every call
+        self._macs = {kid: hmac.new(secret, digestmod=hashlib.sha256) for kid, secret in keys.items()}
+
+    def _mac(self, kid, message):
+        mac = self._macs[kid].copy()
+        mac.update(message.encode("utf-8"))
+        return base64.b32encode(mac.digest()[:MAC_BYTES]).decode("ascii").rstrip("=")
+
+    def sign(self, plate, expires):
+        if "." in plate or not plate:
+            raise ValueError(f"cannot sign plate '{plate}'")
+        body = f"{VERSION}.{plate}.{_b36((expires - EPOCH).days)}.{self.current_kid}"
+        return f"{body}.{self._mac(self.current_kid, body)}"
+
+    def verify(self, text, today=None):
+        # returns (plate, expires) or raises InvalidQR / ExpiredQR
+        body, _, mac = text.strip().rpartition(".")
+        parts = body.split(".")
+        if len(parts) != 4 or parts[0] != VERSION:
+            raise InvalidQR("Malformed QR code")
+
+        _, plate, expiry, kid = parts
+        if kid not in self._macs:
+            raise InvalidQR("Unknown QR signing key")
+        if not hmac.compare_digest(mac, self._mac(kid, body)):
+            raise InvalidQR("Invalid QR signature")
+
+        try:
+            expires = EPOCH + timedelta(days=int(expiry, 36))
+        except (ValueError, OverflowError):
+            raise InvalidQR("Malformed QR code")
+        if expires < (today or date.today()):
+            raise ExpiredQR(f"QR code expired on {expires.isoformat()}")
+        return plate, expires
@@ -0,0 +1,102 @@
+# registration.py
+# Vehicle registration: the bulk CSV import.
+#
+# The bulk path validates every row first, stages the good ones with COPY into
+# a temp table and inserts them with a single INSERT ... SELECT, so 10k
+# registrations cost a few round trips instead of 10k.
+import csv
+import io
+
+FIELDS = ("full_name", "id_number", "vehicle_type", "mobile_no", "plate_number")
+REQUIRED = ("full_name", "plate_number")
+MAX_LENGTHS = {"plate_number": 20}
+
+
+# -----------------------------
+# CSV parsing / validation
+# -----------------------------
+def plate_problem(plate):
+    # plates end up inside the signed QR payload, which is "."-separated
+    if "." in plate:
+        return "plate_number may not contain dots"
+    return None
+
+
+def parse_csv(text):
+    # returns (rows, errors); errors are {"line", "plate_number", "error"}
+    reader = csv.DictReader(io.StringIO(text))
+    header = [h.strip().lower() for h in reader.fieldnames or []]
+    missing = [f for f in REQUIRED if f not in header]
+    if missing:
+        return [], [{"line": 1, "plate_number": None,
+                     "error": f"missing column(s): {', '.join(missing)}"}]
+    reader.fieldnames = header
+
+    rows, errors, seen = [], [], {}
+    for line, raw in enumerate(reader, start=2):
+        row = {f: (raw.get(f) or "").strip() for f in FIELDS}
+        plate = row["plate_number"]
+
+        problem = None
+        for field in REQUIRED:
+            if not row[field]:
+                problem = f"{field} is required"
+                break
+        if not problem:
+            for field, limit in MAX_LENGTHS.items():
+                if len(row[field]) > limit:
+                    problem = f"{field} longer than {limit} characters"
+        if not problem:
+            problem = plate_problem(plate)
+        if not problem and plate in seen:
+            problem = f"duplicate of line {seen[plate]} in this file"
+
+        if problem:
+            errors.append({"line": line, "plate_number": plate or None, "error": problem})
+            continue
+
+        seen[plate] = line
+        row["line"] = line
+        rows.append(row)
+    return rows, errors
+
+
+# -----------------------------
+# Bulk insert
+# -----------------------------
+def import_rows(cur, rows):
+    # returns (inserted, conflicts): inserted is [(plate, created_at)], conflicts
+    # are the rows whose plate was already registered
+    if not rows:
+        return [], []
+
+    # serialize concurrent imports so two files can't both insert the same plate
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('registration_import'))")
+    cur.execute(
+        "CREATE TEMP TABLE import_users "
+        "(full_name TEXT, id_number TEXT, vehicle_type TEXT, mobile_no TEXT, plate_number TEXT) "
+        "ON COMMIT DROP"
+    )
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([row[f] or None for f in FIELDS])
+    buf.seek(0)
+    cur.copy_expert(f"COPY import_users ({', '.join(FIELDS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    cur.execute(f"""
+        INSERT INTO users ({', '.join(FIELDS)})
+        SELECT {', '.join('i.' + f for f in FIELDS)}
+        FROM import_users i
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.plate_number = i.plate_number)
+        RETURNING plate_number, created_at
+    """)
+    inserted = [
+        (r["plate_number"], r["created_at"]) if isinstance(r, dict) else (r[0], r[1])
+        for r in cur.fetchall()
+    ]
+
+    done = {plate for plate, _ in inserted}
+    conflicts = [row for row in rows if row["plate_number"] not in done]
+    return inserted, conflicts
@@ -0,0 +1,120 @@
+# rollups.py
+# Per-day / per-month / per-area entry and exit counters.
+#
+# The scan routes update these inside the same transaction as the parking_logs
+# write, so report pages read one row per day instead of scanning every log.
+# An entry is counted under the area the vehicle is currently parked in
+# (moved on area transfer), an exit under the area it left from.
+
+from datetime import date
+
+from psycopg2.extras import execute_values
+
+
+UPSERT_DAILY = """
+    INSERT INTO parking_daily_stats (day, parking_area, entries, exits)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (day, parking_area) DO UPDATE
+    SET entries = parking_daily_stats.entries + EXCLUDED.entries,
+        exits   = parking_daily_stats.exits   + EXCLUDED.exits
+"""
+
+UPSERT_MONTHLY = """
+    INSERT INTO parking_monthly_stats (month, parking_area, entries, exits)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (month, parking_area) DO UPDATE
+    SET entries = parking_monthly_stats.entries + EXCLUDED.entries,
+        exits   = parking_monthly_stats.exits   + EXCLUDED.exits
+"""
+
+
+# Lock order: a scan transaction locks its parking_areas rows first and the
+# rollup rows last, all daily rows before any monthly row, each set sorted by
+# key. So callers collect their changes with add() / add_transfer() and write
+# them once, at the end of the transaction, with upserts() or record_many().
+
+def add(daily, when, area, entries=0, exits=0):
+    # daily: {(day, area): [entries, exits]}
+    if when is None:
+        return
+    day = when.date() if hasattr(when, "date") else when
+    bucket = daily.setdefault((day, area or ""), [0, 0])
+    bucket[0] += entries
+    bucket[1] += exits
+
+
+def add_transfer(daily, time_in, old_area, new_area):
+    if (old_area or "") == (new_area or ""):
+        return
+    add(daily, time_in, old_area, entries=-1)
+    add(daily, time_in, new_area, entries=1)
+
+
+def _rows(daily):
+    monthly = {}
+    for (day, area), (entries, exits) in daily.items():
+        bucket = monthly.setdefault((day.replace(day=1), area), [0, 0])
+        bucket[0] += entries
+        bucket[1] += exits
+
+    for sql, rows in (
+        (UPSERT_DAILY, daily),
+        (UPSERT_MONTHLY, monthly),
+    ):
+        yield sql, [(k[0], k[1] or "", v[0], v[1]) for k, v in sorted(rows.items()) if v[0] or v[1]]
+
+
+def upserts(daily):
+    # [(sql, args)] one statement per row, in lock order; a single scan
+    # touches at most two rows per table
+    return [(sql, row) for sql, values in _rows(daily) for row in values]
+
+
+def record_many(cur, daily):
+    # batch scan path: one multi-row statement per table
+    for sql, values in _rows(daily):
+        if values:
+            execute_values(cur, sql.replace("VALUES (%s, %s, %s, %s)", "VALUES %s"), values)
+
+
+def rebuild(cur, since=None):
+    # recompute from parking_logs; safe to rerun at any time. With `since`
+    # (a first-of-month date) only that month onwards is rebuilt, so totals for
+    # months whose logs were archived (partitions.py) are kept.
+    if since is None:
+        cur.execute("DELETE FROM parking_daily_stats")
+        cur.execute("DELETE FROM parking_monthly_stats")
+        entries_from = exits_from = "IS NOT NULL"
+        args = ()
+    else:
+        cur.execute("DELETE FROM parking_daily_stats WHERE day >= %s", (since,))
+        cur.execute("DELETE FROM parking_monthly_stats WHERE month >= %s", (since,))
+        entries_from = exits_from = ">= %s"
+        args = (since, since)
+
+    cur.execute(f"""
+        INSERT INTO parking_daily_stats (day, parking_area, entries, exits)
+        SELECT day, area, SUM(entries), SUM(exits)
+        FROM (
+            SELECT DATE(time_in) AS day, COALESCE(parking_area, '') AS area,
+                   1 AS entries, 0 AS exits
+            FROM parking_logs
+            WHERE time_in {entries_from}
+            UNION ALL
+            SELECT DATE(time_out), COALESCE(parking_area, ''), 0, 1
+            FROM parking_logs
+            WHERE time_out {exits_from}
+        ) events
+        GROUP BY day, area
+    """, args)
+    days = cur.rowcount
+
+    cur.execute("""
+        INSERT INTO parking_monthly_stats (month, parking_area, entries, exits)
+        SELECT DATE_TRUNC('month', day)::date, parking_area, SUM(entries), SUM(exits)
+        FROM parking_daily_stats
+        WHERE day >= %s
+        GROUP BY DATE_TRUNC('month', day), parking_area
+    """, (since or date.min,))
+
+    return days
@@ -1,69 +1,403 @@
 # scan_qr.py
+#
+# Desktop / kiosk QR scanner.
+#
+#   capture thread  ->  frame queue  ->  decode workers  ->  local spool  ->  sender thread
+#
+# Capture never waits on decoding or the network: when the decoders fall behind
+# the oldest frame is dropped, and scans go to a durable local spool that the
+# sender drains over a keep-alive session, backing off while the server is down.
+#
+#   python scan_qr.py                        # window, default camera
+#   python scan_qr.py --area A --headless    # kiosk mode, posts to /scan_batch for area A
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+
 import cv2
-from pyzbar.pyzbar import decode
 import requests
-import time
+from requests.adapters import HTTPAdapter
+
+from qr_decode import STRATEGIES, make_decoder
+from scan_spool import ScanSpool
 
-# Flask server URL — must match your app.py route
-SERVER_URL = "http://127.0.0.1:5000/scan_qr"
+# Flask server — must match your app.py routes
+SERVER_URL = "http://127.0.0.1:5000"
+
+# Scans are written here first and removed once the server has them
+SPOOL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_spool.sqlite3")
 
 # Cooldown time (in seconds) to prevent double-scanning the same QR locally
 COOLDOWN_TIME = 5  # keep short for testing
 
-def scan_qr():
-    cap = cv2.VideoCapture(0)
-    print("📷 QR Scanner started. Press 'q' to quit.\n")
+# /scan_batch refuses larger batches (BATCH_MAX_SCANS in app.py)
+BATCH_MAX_SCANS = 5000
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.dropped_frames = 0
+        self.decoded = 0
+        self.sent = 0
+        self.send_failures = 0
+        self._decode_ms = deque(maxlen=500)
+        self._started = time.monotonic()
+        self._last_frames = 0
+        self._last_tick = self._started
+
+    def add(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def decode_time(self, seconds):
+        with self._lock:
+            self._decode_ms.append(seconds * 1000)
+
+    def snapshot(self, **queues):
+        with self._lock:
+            now = time.monotonic()
+            fps = (self.frames - self._last_frames) / max(now - self._last_tick, 1e-6)
+            self._last_frames, self._last_tick = self.frames, now
+
+            samples = sorted(self._decode_ms)
+            avg = sum(samples) / len(samples) if samples else 0.0
+            p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0.0
+
+            snap = {
+                "fps": round(fps, 1),
+                "frames": self.frames,
+                "dropped_frames": self.dropped_frames,
+                "decode_ms_avg": round(avg, 2),
+                "decode_ms_p95": round(p95, 2),
+                "decoded": self.decoded,
+                "sent": self.sent,
+                "send_failures": self.send_failures,
+            }
+        for name, q in queues.items():
+            snap[f"{name}_depth"] = q.qsize()
+        return snap
 
-    last_scan = None
-    last_time = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("⚠️ Unable to access camera.")
-            break
+# -----------------------------
+# Sender (drains the local spool)
+# -----------------------------
+class Sender(threading.Thread):
+    """
+    Replays spooled scans to the server in their original order.
 
-        # Decode QR codes in the frame
-        for qr in decode(frame):
-            vehicle_number = qr.data.decode('utf-8').strip()
+    With an area the spool goes to /scan_batch in chunks. Without an area
+    each scan is posted to /scan_qr_browser one by one over the same
+    keep-alive session. Either way every scan carries its original time and
+    scan_id, so the server applies it at the moment it was read and drops
+    anything it already applied (e.g. when the response to a previous attempt
+    was lost). Nothing is removed from the spool until the server has
+    answered for those scans - a 413 for the whole batch, a proxy's error
+    page or a wrong URL keeps them for retry; the retry delay grows with the
+    head row's failed attempts.
+    """
 
-            # Prevent spam scanning (same QR within cooldown time)
-            now = time.time()
-            if last_scan == vehicle_number and (now - last_time < COOLDOWN_TIME):
+    def __init__(self, server, spool, stats, area=None, batch_size=200,
+                 backoff=0.5, max_backoff=30, timeout=10):
+        super().__init__(name="sender", daemon=True)
+        self.server = server.rstrip("/")
+        self.spool = spool
+        self.stats = stats
+        self.area = area
+        self.batch_size = batch_size if area else 1
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+
+        # one keep-alive connection reused for every request
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+    def submit(self, qr_text, scanned_at):
+        self.spool.append(qr_text, scanned_at)
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _send(self, rows):
+        if self.area:
+            body = {
+                "area_code": self.area,
+                "scans": [
+                    {"qr_text": r["qr_text"], "time": r["scanned_at"], "scan_id": r["scan_id"]}
+                    for r in rows
+                ],
+            }
+            response = self.session.post(f"{self.server}/scan_batch", json=body, timeout=self.timeout)
+        else:
+            row = rows[0]
+            body = {
+                "qr_text": row["qr_text"],
+                "plate_number": row["qr_text"],
+                "time": row["scanned_at"],
+                "scan_id": row["scan_id"],
+            }
+            response = self.session.post(f"{self.server}/scan_qr_browser", json=body, timeout=self.timeout)
+
+        if response.status_code >= 500:
+            raise requests.exceptions.HTTPError(f"server error {response.status_code}")
+
+        data = self._answer(rows, response)
+        if data is None:
+            if response.status_code == 413 and len(rows) > 1:
+                self.batch_size = max(1, len(rows) // 2)
+                print(f"❌ Batch of {len(rows)} too large, sending {self.batch_size} at a time")
+            raise requests.exceptions.HTTPError(
+                f"no per-scan answer: {response.status_code} {response.text[:200]}"
+            )
+        return response, data
+
+    def _answer(self, rows, response):
+        # the parsed body if it is the server's verdict on these scans, else None
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        if self.area:
+            results = data.get("results")
+            return data if isinstance(results, list) and len(results) == len(rows) else None
+        return data if "status" in data else None
+
+    def _report(self, rows, response, data):
+        if response.status_code >= 400:
+            # this scan was rejected (bad signature, no plate): retrying won't help
+            print("❌ Scan rejected:", response.status_code, data.get("message"))
+            return
+
+        if self.area:
+            for row, result in zip(rows, data.get("results", [])):
+                print(f"🚗 {row['qr_text'].splitlines()[0]}: {result.get('status')}")
+        else:
+            print("🚗 Server response:", data)
+
+    def run(self):
+        while True:
+            rows = self.spool.peek(self.batch_size)
+            if not rows:
+                if self._stopping.is_set():
+                    return
+                self._wakeup.wait(0.5)
+                self._wakeup.clear()
+                continue
+
+            try:
+                response, data = self._send(rows)
+            except requests.exceptions.RequestException as e:
+                self.stats.add("send_failures")
+                attempts = self.spool.failed(rows[0]["seq"])
+                delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+                if self._stopping.is_set():
+                    print(f"⚠️ Server unreachable, {self.spool.qsize()} scans kept in spool")
+                    return
+                print(f"❌ Send failed ({e}); {self.spool.qsize()} scans spooled, "
+                      f"retrying in {delay:.1f}s")
+                self._stopping.wait(delay)
                 continue
 
-            last_scan = vehicle_number
-            last_time = now
+            self.spool.ack(rows[-1]["seq"])
+            self.stats.add("sent", len(rows))
+            self._report(rows, response, data)
+
+
+# -----------------------------
+# Scanner pipeline
+# -----------------------------
+class Scanner:
+    def __init__(self, source, sender, stats, workers=2, frame_queue=4, headless=False,
+                 strategy="fast"):
+        self.source = source
+        self.strategy = strategy
+        self.sender = sender
+        self.stats = stats
+        self.workers = workers
+        self.headless = headless
+
+        self.frames = queue.Queue(maxsize=frame_queue)
+        self.stop_event = threading.Event()
+
+        self._cooldown_lock = threading.Lock()
+        self._last_seen = {}
+
+        # latest frame + boxes for the preview window
+        self._preview_lock = threading.Lock()
+        self._preview = None
+        self._boxes = []
+
+    def capture_loop(self):
+        cap = cv2.VideoCapture(self.source)
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    print("⚠️ Unable to access camera.")
+                    break
 
-            print(f"✅ Detected vehicle (raw): {vehicle_number}")
+                self.stats.add("frames")
+                with self._preview_lock:
+                    self._preview = frame
 
-            # Send QR data to Flask backend
+                try:
+                    self.frames.put_nowait(frame)
+                except queue.Full:
+                    # keep the newest frame, drop the oldest
+                    try:
+                        self.frames.get_nowait()
+                        self.stats.add("dropped_frames")
+                    except queue.Empty:
+                        pass
+                    try:
+                        self.frames.put_nowait(frame)
+                    except queue.Full:
+                        self.stats.add("dropped_frames")
+        finally:
+            cap.release()
+            self.stop_event.set()
+
+    def _should_send(self, text):
+        # Prevent spam scanning (same QR within cooldown time)
+        now = time.monotonic()
+        with self._cooldown_lock:
+            if now - self._last_seen.get(text, -COOLDOWN_TIME) < COOLDOWN_TIME:
+                return False
+            self._last_seen[text] = now
+            if len(self._last_seen) > 1000:
+                cutoff = now - COOLDOWN_TIME
+                self._last_seen = {k: t for k, t in self._last_seen.items() if t >= cutoff}
+            return True
+
+    def decode_loop(self):
+        # decoders keep per-stream state (ROI, motion), so one per worker
+        decoder = make_decoder(self.strategy)
+
+        while not self.stop_event.is_set():
             try:
-                response = requests.post(SERVER_URL, json={"plate_number": vehicle_number})
-                if response.status_code == 429:
-                    print("⏱ Server cooldown:", response.json().get("message"))
-                elif response.status_code >= 400:
-                    print("❌ Server returned error:", response.status_code, response.text)
+                frame = self.frames.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            started = time.perf_counter()
+            found = decoder.decode(frame)
+            self.stats.decode_time(time.perf_counter() - started)
+
+            boxes = []
+            for qr_text, rect in found:
+                boxes.append(rect)
+                self.stats.add("decoded")
+
+                if self._should_send(qr_text):
+                    print(f"✅ Detected vehicle (raw): {qr_text}")
+                    self.sender.submit(qr_text, time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+            with self._preview_lock:
+                self._boxes = boxes
+
+    def run(self, stats_interval=5.0):
+        threads = [threading.Thread(target=self.capture_loop, name="capture", daemon=True)]
+        threads += [
+            threading.Thread(target=self.decode_loop, name=f"decode-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in threads:
+            t.start()
+
+        print("📷 QR Scanner started." + ("" if self.headless else " Press 'q' to quit.") + "\n")
+        next_stats = time.monotonic() + stats_interval
+
+        try:
+            while not self.stop_event.is_set():
+                if self.headless:
+                    self.stop_event.wait(0.2)
                 else:
-                    print("🚗 Server response:", response.json())
-            except requests.exceptions.ConnectionError:
-                print("❌ Cannot connect to Flask server. Make sure it's running at 127.0.0.1:5000")
-            except requests.exceptions.RequestException as e:
-                print("⚠️ Request failed:", e)
+                    with self._preview_lock:
+                        frame = None if self._preview is None else self._preview.copy()
+                        boxes = list(self._boxes)
+                    if frame is not None:
+                        # Draw a rectangle around the QR for visual feedback
+                        for (x, y, w, h) in boxes:
+                            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
+                        cv2.imshow("QR Scanner", frame)
+
+                    # Quit when pressing 'q'
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        break
+
+                if stats_interval and time.monotonic() >= next_stats:
+                    print("📊", self.stats.snapshot(frames=self.frames, spool=self.sender.spool))
+                    next_stats = time.monotonic() + stats_interval
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            for t in threads:
+                t.join(timeout=2)
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="QR parking scanner")
+    parser.add_argument("--source", default="0",
+                        help="camera index or video file (default: 0)")
+    parser.add_argument("--server", default=SERVER_URL, help="Flask server base URL")
+    parser.add_argument("--area", help="post to /scan_batch for this area instead of /scan_qr_browser")
+    parser.add_argument("--headless", action="store_true", help="no preview window")
+    parser.add_argument("--workers", type=int, default=2, help="decode worker threads")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="fast",
+                        help="decode strategy (see qr_decode.py / bench_decode.py)")
+    parser.add_argument("--spool", default=SPOOL_PATH, help="local spool file for unsent scans")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help=f"scans per /scan_batch request when draining the spool (1-{BATCH_MAX_SCANS})")
+    parser.add_argument("--stats-interval", type=float, default=5.0,
+                        help="seconds between stats lines (0 = off)")
+    args = parser.parse_args()
+    if not 1 <= args.batch_size <= BATCH_MAX_SCANS:
+        parser.error(f"--batch-size must be between 1 and {BATCH_MAX_SCANS}")
+    return args
+
+
+def scan_qr():
+    args = parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
 
-            # Draw a rectangle around the QR for visual feedback
-            (x, y, w, h) = qr.rect
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
+    stats = Stats()
+    spool = ScanSpool(args.spool)
+    pending = spool.qsize()
+    if pending:
+        print(f"📦 {pending} scans left in spool from last run, replaying")
 
-        # Show the camera window
-        cv2.imshow("QR Scanner", frame)
+    sender = Sender(args.server, spool, stats, area=args.area, batch_size=args.batch_size)
+    sender.start()
 
-        # Quit when pressing 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    try:
+        Scanner(source, sender, stats, workers=args.workers, headless=args.headless,
+                strategy=args.strategy).run(
+            stats_interval=args.stats_interval
+        )
+    finally:
+        sender.stop()
+        sender.join(timeout=15)
+        print("📊", stats.snapshot(spool=spool))
+        spool.close()
 
-    cap.release()
-    cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     scan_qr()
@@ -0,0 +1,317 @@
+# scan_service.py
+# Async front for the gate endpoints:
+#
+#   POST /scan_area/<area_code>
+#   POST /scan_qr_browser
+#   GET  /search
+#   GET  /metrics   (this process's series, same names as the Flask app)
+#
+# Same request and response contracts as the Flask routes in app.py, but
+# served from one event loop with an asyncpg pool, so a process can hold
+# thousands of open gate connections while only `ASYNC_DB_POOL_MAX` of them
+# are talking to Postgres at any moment. A scan waiting on the database
+# costs a coroutine, not a worker thread.
+#
+# The admin and registration pages stay on Flask. Run both side by side and
+# route the three paths above to this service:
+#
+#   uvicorn scan_service:app --host 0.0.0.0 --port 8001
+#
+# Config (DB settings, QR signing keys, cooldown, search limits) is taken
+# from app.py, so both services accept exactly the same QR codes.
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import time
+from datetime import datetime
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.http import http_date
+
+import cooldown
+import metrics
+import scan_transactions
+from ttl_cache import TTLCache
+
+import app as flask_app
+
+ASYNC_DB_POOL_MIN = int(os.environ.get("ASYNC_DB_POOL_MIN", 5))
+ASYNC_DB_POOL_MAX = int(os.environ.get("ASYNC_DB_POOL_MAX", 40))
+# a scan that can't get a connection in this long answers 503 instead of queueing forever
+ASYNC_DB_ACQUIRE_TIMEOUT = float(os.environ.get("ASYNC_DB_ACQUIRE_TIMEOUT", 5))
+
+search_cache = TTLCache(flask_app.SEARCH_CACHE_TTL, max_size=4096)
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _json_default(o):
+    # match Flask's jsonify so clients see identical payloads
+    if hasattr(o, "timetuple"):
+        return http_date(o)
+    return str(o)
+
+
+def jsonify(data, status=200):
+    body = json.dumps(data, default=_json_default, separators=(",", ":"), sort_keys=True)
+    return Response(body, status_code=status, media_type="application/json")
+
+
+class Areas:
+    # area_code -> row, reloaded every AREA_CACHE_TTL seconds; one reload at a time
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._rows = {}
+        self._loaded = None
+        self._lock = asyncio.Lock()
+
+    def _stale(self):
+        return self._loaded is None or asyncio.get_running_loop().time() - self._loaded > self.ttl
+
+    async def get(self, pool, area_code):
+        if self._stale():
+            async with self._lock:
+                if self._stale():
+                    rows = await fetch(pool, "SELECT area_code, area_name, capacity FROM parking_areas")
+                    self._rows = {r["area_code"]: r for r in rows}
+                    self._loaded = asyncio.get_running_loop().time()
+        return self._rows.get(area_code)
+
+
+areas = Areas(flask_app.AREA_CACHE_TTL)
+
+
+# -----------------------------
+# Database access
+# -----------------------------
+# Every connection is taken with ASYNC_DB_ACQUIRE_TIMEOUT; asyncio.TimeoutError
+# becomes a 503 in the routes.
+async def fetch(pool, sql, args=(), stats=None):
+    async with pool.acquire(timeout=ASYNC_DB_ACQUIRE_TIMEOUT) as conn:
+        return await scan_transactions.fetch(conn, sql, args, stats)
+
+
+async def transaction(request, steps):
+    # steps: a generator from scan_transactions, the same ones app.py runs.
+    # The open log is looked up after taking the plate lock, so no
+    # per-process session index is needed here.
+    pool = request.app.state.pool
+    async with pool.acquire(timeout=ASYNC_DB_ACQUIRE_TIMEOUT) as conn:
+        async with conn.transaction():
+            return await scan_transactions.run_async(conn, steps, request.state.sql)
+
+
+def instrumented(route):
+    # the request latency, per-request SQL and scan outcome series the Flask
+    # app records, for this process's /metrics
+    def wrap(handler):
+        @functools.wraps(handler)
+        async def timed(request):
+            started = time.perf_counter()
+            request.state.sql = metrics.RequestSQL()
+            response = await handler(request)
+            elapsed = time.perf_counter() - started
+
+            stats = request.state.sql
+            status = str(response.status_code)
+            metrics.REQUEST_SECONDS.observe(elapsed, route, request.method, status)
+            metrics.SQL_QUERIES.observe(stats.count, route)
+            metrics.SQL_SECONDS.observe(stats.seconds, route)
+            response.headers["Server-Timing"] = metrics.server_timing(stats, elapsed)
+
+            if route in flask_app.SCAN_ENDPOINTS:
+                data = json.loads(response.body)
+                outcome = data.get("status") or ("error" if response.status_code >= 400 else "unknown")
+                metrics.SCAN_OUTCOMES.inc(route, outcome)
+            return response
+        return timed
+    return wrap
+
+
+async def cooldown_hit(key):
+    # the sqlite store does file I/O and waits on its lock, so it runs on a
+    # worker thread; the in-memory one is a dict lookup
+    store = flask_app.scan_cooldown
+    if isinstance(store, cooldown.MemoryCooldownStore):
+        return store.hit(key)
+    return await asyncio.to_thread(store.hit, key)
+
+
+async def read_payload(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+# -----------------------------
+# Routes
+# -----------------------------
+@instrumented("scan_area")
+async def scan_area(request):
+    area_code = request.path_params["area_code"]
+    payload = await read_payload(request)
+    plate, rejected = flask_app.read_plate(payload)
+    now = datetime.now()
+
+    if rejected:
+        return jsonify({"status": "rejected", "message": rejected}, 403)
+    if not plate:
+        return jsonify({"status": "error", "message": "No plate found"}, 400)
+
+    if await cooldown_hit(f"{area_code}|{plate}"):
+        return jsonify({"status": "ignored", "message": "Duplicate scan"})
+
+    try:
+        area_info = await areas.get(request.app.state.pool, area_code)
+
+        if not area_info:
+            return jsonify({"status": "error", "message": "Unknown area"}, 404)
+
+        name = area_info["area_name"]
+        leaving = payload.get("action") == "exit"
+
+        result = await transaction(request, scan_transactions.admit(plate, area_code, now, None, leaving))
+        status = result["status"]
+
+        if status == "exited":
+            return jsonify({
+                "status": "exited",
+                "plate": plate,
+                "area": area_code,
+                "area_name": name,
+                "time": str(now)
+            })
+
+        if status == "not_inside":
+            return jsonify({"status": "ignored", "message": f"{plate} is not parked"})
+
+        if status == "full":
+            return jsonify({"status": "full", "message": f"{name} is full"})
+
+        if status == "updated":
+            return jsonify({
+                "status": "updated",
+                "plate": plate,
+                "area": area_code,
+                "area_name": name,
+                "time": str(now),
+                "note": "Vehicle already inside, parking area updated."
+            })
+
+        return jsonify({
+            "status": "entered",
+            "plate": plate,
+            "area": area_code,
+            "area_name": name,
+            "occupancy": result["occupancy"],
+            "time": str(now)
+        })
+
+    except asyncio.TimeoutError:
+        return jsonify({"status": "error", "message": "Database busy, try again"}, 503)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"DB error: {e}"}, 500)
+
+
+@instrumented("scan_qr_browser")
+async def scan_qr_browser(request):
+    payload = await read_payload(request)
+    plate, rejected = flask_app.read_plate(payload)
+
+    if rejected:
+        return jsonify({"status": "rejected", "message": rejected}, 403)
+    if not plate:
+        return jsonify({"status": "error", "message": "No plate found"}, 400)
+
+    try:
+        now = flask_app.scan_time(payload.get("time"))
+    except (ValueError, TypeError):
+        return jsonify({"status": "error", "message": "Invalid time"}, 400)
+
+    if not flask_app.replayed_scan(payload) and await cooldown_hit(plate):
+        return jsonify({"status": "ignored", "message": "Duplicate scan"})
+
+    try:
+        steps = scan_transactions.toggle(plate, now, False, payload.get("scan_id"))
+        result = await transaction(request, steps)
+        if result["status"] == "ignored":
+            return jsonify({"status": "ignored", "message": "Already applied", "plate": plate})
+        return jsonify({"status": result["status"], "plate": plate, "time": str(now)})
+
+    except asyncio.TimeoutError:
+        return jsonify({"status": "error", "message": "Database busy, try again"}, 503)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"DB error: {e}"}, 500)
+
+
+@instrumented("search")
+async def search(request):
+    q, limit = flask_app.search_params(request.query_params.get("q"), request.query_params.get("limit"))
+    if not q:
+        return jsonify({"logs": [], "vehicles": []})
+
+    key = (q.lower(), limit)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return jsonify(cached)
+
+    pool = request.app.state.pool
+    try:
+        # the two lookups run concurrently on separate connections
+        logs, vehicles = await asyncio.gather(
+            fetch(pool, *flask_app.search_logs_sql(q, limit), request.state.sql),
+            fetch(pool, *flask_app.search_vehicles_sql(q, limit), request.state.sql),
+        )
+    except asyncio.TimeoutError:
+        return jsonify({"error": "Database busy, try again", "logs": [], "vehicles": []}, 503)
+    except Exception as e:
+        return jsonify({"error": str(e), "logs": [], "vehicles": []}, 500)
+
+    result = {"logs": logs, "vehicles": vehicles}
+    search_cache.set(key, result)
+    return jsonify(result)
+
+
+async def metrics_endpoint(request):
+    pool = request.app.state.pool
+    # same states as db_pool.ConnectionPool.stats()
+    metrics.POOL.set("in_use", value=pool.get_size() - pool.get_idle_size())
+    metrics.POOL.set("idle", value=pool.get_idle_size())
+    metrics.POOL.set("minconn", value=pool.get_min_size())
+    metrics.POOL.set("maxconn", value=pool.get_max_size())
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    app.state.pool = await asyncpg.create_pool(
+        host=flask_app.DB_HOST,
+        database=flask_app.DB_NAME,
+        user=flask_app.DB_USER,
+        password=flask_app.DB_PASS,
+        min_size=ASYNC_DB_POOL_MIN,
+        max_size=ASYNC_DB_POOL_MAX,
+    )
+    try:
+        yield
+    finally:
+        await app.state.pool.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/scan_area/{area_code}", scan_area, methods=["POST"]),
+        Route("/scan_qr_browser", scan_qr_browser, methods=["POST"]),
+        Route("/search", search),
+        Route("/metrics", metrics_endpoint),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,76 @@
+# scan_spool.py
+# Durable local queue for scan_qr.py.
+#
+# Every decoded scan is appended to a SQLite write-ahead log (with its original
+# timestamp and a unique scan_id) before anything touches the network. The
+# sender drains it in order and only deletes rows once the server confirmed
+# them, so a backend outage or a crash never loses scans.
+import os
+import sqlite3
+import threading
+import uuid
+
+
+class ScanSpool:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id    TEXT NOT NULL UNIQUE,
+                qr_text    TEXT NOT NULL,
+                scanned_at TEXT NOT NULL,
+                attempts   INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    def append(self, qr_text, scanned_at, scan_id=None):
+        scan_id = scan_id or uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO spool (scan_id, qr_text, scanned_at) VALUES (?, ?, ?)",
+                (scan_id, qr_text, scanned_at)
+            )
+        return scan_id
+
+    def peek(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, scan_id, qr_text, scanned_at, attempts FROM spool ORDER BY seq LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"seq": r[0], "scan_id": r[1], "qr_text": r[2], "scanned_at": r[3], "attempts": r[4]}
+            for r in rows
+        ]
+
+    def ack(self, up_to_seq):
+        # rows are always confirmed in order, so everything up to seq is done
+        with self._lock:
+            self._conn.execute("DELETE FROM spool WHERE seq <= ?", (up_to_seq,))
+
+    def failed(self, seq):
+        # -> failed sends so far for this row; kept across restarts, so the
+        # sender's backoff doesn't start from scratch against a dead server
+        with self._lock:
+            self._conn.execute("UPDATE spool SET attempts = attempts + 1 WHERE seq = ?", (seq,))
+            row = self._conn.execute("SELECT attempts FROM spool WHERE seq = ?", (seq,)).fetchone()
+        return row[0] if row else 0
+
+    def qsize(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
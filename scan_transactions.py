@@ -0,0 +1,299 @@
+# scan_transactions.py
+# The per-scan transactions (entry, area transfer, exit, entry/exit toggle),
+# written once and run by both web fronts:
+#
+#   app.py          - run(cur, steps) on a psycopg2 cursor
+#   scan_service.py - await run_async(conn, steps) on an asyncpg connection
+#
+# A transaction is a generator: it yields (sql, args) with psycopg2 %s
+# placeholders and is sent back the result rows as dicts ([] for statements
+# without RETURNING). Steps compose with `yield from`, so the SQL, the guards
+# and the lock order live here only.
+#
+# Guarded writes: each one re-checks the database state, so a stale
+# active-session index entry only means trying the other statement next.
+#
+# Lock order, the same in every scan transaction and in batch_scans.py:
+#   0. processed_scans row of a replayed scan_id
+#   1. per-plate advisory lock(s), so two gates can't both open a log for
+#      the same plate
+#   2. parking_areas rows, several in area_code order
+#   3. rollup rows, written last (rollups.upserts / record_many)
+import functools
+import re
+import time
+
+import rollups
+
+# replayed spools carry a scan_id per scan (processed_scans); ids are
+# remembered this long, swept by prune_scan_ids from the maintenance loop
+SCAN_ID_RETENTION_DAYS = 7
+
+
+# -----------------------------
+# Drivers
+# -----------------------------
+def run(cur, steps):
+    rows = None
+    try:
+        while True:
+            sql, args = steps.send(rows)
+            cur.execute(sql, args)
+            rows = cur.fetchall() if cur.description is not None else []
+    except StopIteration as done:
+        return done.value
+
+
+async def run_async(conn, steps, stats=None):
+    rows = None
+    try:
+        while True:
+            sql, args = steps.send(rows)
+            rows = await fetch(conn, sql, args, stats)
+    except StopIteration as done:
+        return done.value
+
+
+async def fetch(conn, sql, args=(), stats=None):
+    # one psycopg2-style statement on an asyncpg connection -> [dict];
+    # stats: optional metrics.RequestSQL, filled in like TimedCursor does
+    query, values = to_asyncpg(sql, args)
+    started = time.perf_counter()
+    rows = await conn.fetch(query, *values)
+    if stats is not None:
+        elapsed = time.perf_counter() - started
+        stats.count += 1
+        stats.seconds += elapsed
+        if elapsed > stats.slowest:
+            stats.slowest, stats.slowest_sql = elapsed, sql
+    return [dict(r) for r in rows]
+
+
+_NAMED = re.compile(r"%\((\w+)\)s")
+
+
+def to_asyncpg(sql, args=()):
+    # psycopg2 placeholders -> asyncpg: %s / %(name)s become $1, $2, ...
+    if isinstance(args, dict):
+        names = []
+
+        def number(m):
+            if m.group(1) not in names:
+                names.append(m.group(1))
+            return f"${names.index(m.group(1)) + 1}"
+
+        return _NAMED.sub(number, sql), [args[n] for n in names]
+
+    return numbered(sql), list(args)
+
+
+@functools.lru_cache(maxsize=256)
+def numbered(sql):
+    count = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda m: f"${next(count)}", sql)
+
+
+# -----------------------------
+# Steps
+# -----------------------------
+# asyncpg infers parameter types from the statement, so values that don't
+# land directly in a column carry an explicit cast.
+def claim_scan_id(scan_id):
+    # replayed spools carry a scan_id per scan; False if it was applied before
+    rows = yield (
+        "INSERT INTO processed_scans (scan_id) VALUES (%s) "
+        "ON CONFLICT DO NOTHING RETURNING scan_id",
+        (scan_id,)
+    )
+    return bool(rows)
+
+
+def prune_scan_ids(days=SCAN_ID_RETENTION_DAYS):
+    rows = yield (
+        "WITH gone AS ("
+        "  DELETE FROM processed_scans WHERE received_at < NOW() - %s::int * INTERVAL '1 day' "
+        "  RETURNING 1"
+        ") SELECT count(*) AS removed FROM gone",
+        (days,)
+    )
+    return rows[0]["removed"]
+
+
+def lock_plate(plate):
+    yield "SELECT pg_advisory_xact_lock(hashtext(%s))", (plate,)
+
+
+def lock_areas(*areas):
+    codes = sorted({a for a in areas if a})
+    if codes:
+        yield (
+            "SELECT area_code FROM parking_areas WHERE area_code = ANY(%s) "
+            "ORDER BY area_code FOR UPDATE",
+            (codes,)
+        )
+
+
+def claim_slot(area):
+    # atomic capacity check: only succeeds while the lot has room
+    rows = yield (
+        "UPDATE parking_areas SET current_count = current_count + 1 "
+        "WHERE area_code=%s AND current_count < capacity "
+        "RETURNING current_count",
+        (area,)
+    )
+    return rows[0]["current_count"] if rows else None
+
+
+def release_slot(area):
+    if area:
+        yield (
+            "UPDATE parking_areas SET current_count = GREATEST(current_count - 1, 0) "
+            "WHERE area_code=%s",
+            (area,)
+        )
+
+
+def enter_area(plate, now, area, daily):
+    # claim a slot and open the log in one statement; does nothing when the
+    # lot is full or the plate already has an open log
+    rows = yield (
+        "WITH slot AS ("
+        "  UPDATE parking_areas SET current_count = current_count + 1 "
+        "  WHERE area_code=%s AND current_count < capacity AND NOT EXISTS ("
+        "    SELECT 1 FROM parking_logs WHERE plate_number=%s AND time_out IS NULL"
+        "  ) RETURNING current_count"
+        "), log AS ("
+        "  INSERT INTO parking_logs (plate_number, time_in, parking_area) "
+        "  SELECT %s::text, %s::timestamp, %s::text FROM slot RETURNING id"
+        ") SELECT log.id, slot.current_count AS occupancy FROM log, slot",
+        (area, plate, plate, now, area)
+    )
+    if rows:
+        rollups.add(daily, now, area, entries=1)
+        return rows[0]
+    return None
+
+
+def open_log(plate, now, area, daily):
+    rows = yield (
+        "INSERT INTO parking_logs (plate_number, time_in, parking_area) "
+        "SELECT %s::text, %s::timestamp, %s::text WHERE NOT EXISTS ("
+        "  SELECT 1 FROM parking_logs WHERE plate_number=%s AND time_out IS NULL"
+        ") RETURNING id",
+        (plate, now, area, plate)
+    )
+    if rows:
+        rollups.add(daily, now, area, entries=1)
+        return rows[0]
+    return None
+
+
+def close_logs(plate, now, daily):
+    rows = yield (
+        "UPDATE parking_logs SET time_out=%s WHERE plate_number=%s AND time_out IS NULL "
+        "RETURNING id, parking_area",
+        (now, plate)
+    )
+    for row in sorted(rows, key=lambda r: r["parking_area"] or ""):
+        yield from release_slot(row["parking_area"])
+        rollups.add(daily, now, row["parking_area"], exits=1)
+    return rows
+
+
+def move_log(log_id, area, old_area, daily):
+    rows = yield (
+        "UPDATE parking_logs SET parking_area=%s, moved_at=NOW() WHERE id=%s AND time_out IS NULL "
+        "RETURNING id, time_in",
+        (area, log_id)
+    )
+    if rows:
+        rollups.add_transfer(daily, rows[0]["time_in"], old_area, area)
+        return rows[0]
+    return None
+
+
+def find_open_log(plate):
+    rows = yield (
+        "SELECT id, parking_area, time_in FROM parking_logs "
+        "WHERE plate_number=%s AND time_out IS NULL ORDER BY id DESC LIMIT 1",
+        (plate,)
+    )
+    return rows[0] if rows else None
+
+
+def record_rollups(daily):
+    for sql, args in rollups.upserts(daily):
+        yield sql, args
+
+
+# -----------------------------
+# Transactions
+# -----------------------------
+def toggle(plate, now, inside, scan_id=None):
+    # entry/exit without an area: exit if inside, otherwise enter.
+    # `inside` is only a hint (the session index); None/False tries entry first.
+    if scan_id and not (yield from claim_scan_id(scan_id)):
+        return {"status": "ignored", "log": None}
+
+    daily = {}
+    yield from lock_plate(plate)
+    opened = closed = None
+    if inside:
+        closed = yield from close_logs(plate, now, daily)
+    if not closed:
+        opened = yield from open_log(plate, now, None, daily)
+    if not opened and not closed:
+        closed = yield from close_logs(plate, now, daily)
+    yield from record_rollups(daily)
+
+    if opened:
+        return {"status": "entered", "log": opened}
+    return {"status": "exited", "log": closed[-1] if closed else None}
+
+
+def admit(plate, area, now, known, leaving=False):
+    # one transaction per scan: entry, area transfer or exit, with the
+    # parking_areas counters moved in the same commit. `known` is the open
+    # log the caller believes the plate has (or None).
+    daily = {}
+    yield from lock_plate(plate)
+    result = yield from _admit(plate, area, now, known, leaving, daily)
+    yield from record_rollups(daily)
+    return result
+
+
+def _admit(plate, area, now, known, leaving, daily):
+    if leaving:
+        closed = yield from close_logs(plate, now, daily)
+        if not closed:
+            return {"status": "not_inside"}
+        return {"status": "exited", "log": closed[-1]}
+
+    if not known:
+        opened = yield from enter_area(plate, now, area, daily)
+        if opened:
+            return {"status": "entered", "log": opened, "occupancy": opened["occupancy"]}
+
+        # full, or the caller missed an open log: transfer instead
+        known = yield from find_open_log(plate)
+        if not known:
+            return {"status": "full"}
+
+    old_area = known["parking_area"]
+    same_area = (old_area or "") == area
+
+    if not same_area:
+        yield from lock_areas(old_area, area)
+        if (yield from claim_slot(area)) is None:
+            return {"status": "full"}
+
+    moved = yield from move_log(known["id"], area, old_area, daily)
+    if not moved:
+        # stale entry: the vehicle already left, so this is an entry
+        if not same_area:
+            yield from release_slot(area)
+        return (yield from _admit(plate, area, now, None, False, daily))
+
+    if not same_area:
+        yield from release_slot(old_area)
+    return {"status": "updated", "log": moved}
@@ -0,0 +1,272 @@
+# schema.py
+# Database migrations for everything added on top of the original
+# users / parking_logs / parking_areas tables. Run with: flask migrate
+#
+# A migration is either SQL text or a function taking the cursor.
+import partitions
+
+RECOUNT_OCCUPANCY_SQL = """
+    UPDATE parking_areas a
+    SET current_count = (
+        SELECT COUNT(*) FROM parking_logs l
+        WHERE l.parking_area = a.area_code AND l.time_out IS NULL
+    )
+"""
+
+
+MIGRATIONS = [
+    ("001_report_rollups", """
+        CREATE TABLE IF NOT EXISTS parking_daily_stats (
+            day          DATE    NOT NULL,
+            parking_area TEXT    NOT NULL DEFAULT '',
+            entries      INTEGER NOT NULL DEFAULT 0,
+            exits        INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, parking_area)
+        );
+
+        CREATE TABLE IF NOT EXISTS parking_monthly_stats (
+            month        DATE    NOT NULL,
+            parking_area TEXT    NOT NULL DEFAULT '',
+            entries      INTEGER NOT NULL DEFAULT 0,
+            exits        INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, parking_area)
+        );
+    """),
+
+    ("002_parking_logs_indexes", """
+        -- open sessions: active count, overstay (time_in < today), lot views
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_open
+            ON parking_logs (time_in) WHERE time_out IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_open_area
+            ON parking_logs (parking_area) WHERE time_out IS NULL;
+
+        -- "last log for this plate" lookup in the scan routes
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_plate_id
+            ON parking_logs (plate_number, id DESC);
+
+        -- half-open range filters used by the daily / monthly / today views
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_time_in
+            ON parking_logs (time_in);
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_time_out
+            ON parking_logs (time_out);
+        CREATE INDEX IF NOT EXISTS idx_users_created_at
+            ON users (created_at);
+
+        ANALYZE parking_logs;
+        ANALYZE users;
+    """),
+
+    # current_count used to be incremented on entry and never decremented;
+    # start the atomic accounting from the real number of open sessions
+    ("003_resync_occupancy", RECOUNT_OCCUPANCY_SQL),
+
+    # scan ids from replayed scanner spools, so a re-sent batch isn't applied twice
+    ("004_processed_scans", """
+        CREATE TABLE IF NOT EXISTS processed_scans (
+            scan_id     TEXT PRIMARY KEY,
+            received_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_processed_scans_received
+            ON processed_scans (received_at);
+    """),
+
+    # registration (single and bulk import) checks for an existing plate
+    ("005_users_plate_index", """
+        CREATE INDEX IF NOT EXISTS idx_users_plate
+            ON users (plate_number);
+    """),
+
+    # /search: trigram GIN for substring matches, upper() pattern indexes for
+    # the (more common) plate-prefix typeahead
+    ("006_search_indexes", """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_plate_trgm
+            ON parking_logs USING gin (plate_number gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_plate_prefix
+            ON parking_logs (upper(plate_number) text_pattern_ops);
+        CREATE INDEX IF NOT EXISTS idx_users_plate_trgm
+            ON users USING gin (plate_number gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_users_name_trgm
+            ON users USING gin (full_name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS idx_users_plate_prefix
+            ON users (upper(plate_number) text_pattern_ops);
+        ANALYZE parking_logs;
+        ANALYZE users;
+    """),
+
+    # live occupancy feed (occupancy_feed.py): every committed current_count
+    # change is broadcast, whichever code path made it
+    ("007_occupancy_notify", """
+        CREATE OR REPLACE FUNCTION notify_parking_occupancy() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('parking_occupancy', json_build_object(
+                'area_code', NEW.area_code,
+                'capacity', NEW.capacity,
+                'current_count', NEW.current_count
+            )::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS parking_areas_occupancy_notify ON parking_areas;
+        CREATE TRIGGER parking_areas_occupancy_notify
+            AFTER INSERT OR UPDATE OF current_count, capacity ON parking_areas
+            FOR EACH ROW EXECUTE FUNCTION notify_parking_occupancy();
+    """),
+
+    # monthly range partitions on time_in (partitions.py); rewrites the table
+    ("008_partition_parking_logs", partitions.partition_parking_logs),
+
+    # dashboard lot cards: one row per area. The count is the counter the scan
+    # transactions already keep; the plates are the newest open sessions, read
+    # straight off a partial index, capped so the query stays the same size
+    # however many vehicles are parked
+    ("009_area_occupancy_view", """
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_open_area_time
+            ON parking_logs (parking_area, time_in DESC) WHERE time_out IS NULL;
+        DROP INDEX IF EXISTS idx_parking_logs_open_area;
+
+        CREATE OR REPLACE VIEW parking_area_occupancy AS
+        SELECT a.area_code, a.area_name, a.capacity, a.current_count,
+               ARRAY(
+                   SELECT l.plate_number FROM parking_logs l
+                   WHERE l.parking_area = a.area_code AND l.time_out IS NULL
+                   ORDER BY l.time_in DESC
+                   LIMIT 20
+               ) AS recent_plates
+        FROM parking_areas a;
+    """),
+
+    # overstay rules per area and the alerts the background monitor writes
+    # (overstay.py); the dashboard and /overstay_alerts read only this table
+    ("010_overstay_alerts", """
+        ALTER TABLE parking_areas
+            ADD COLUMN IF NOT EXISTS max_stay_minutes  INTEGER,
+            ADD COLUMN IF NOT EXISTS overnight_allowed BOOLEAN NOT NULL DEFAULT FALSE,
+            ADD COLUMN IF NOT EXISTS closes_at         TIME;
+
+        CREATE TABLE IF NOT EXISTS overstay_alerts (
+            id           BIGSERIAL PRIMARY KEY,
+            log_id       BIGINT    NOT NULL,
+            time_in      TIMESTAMP NOT NULL,
+            plate_number TEXT      NOT NULL,
+            parking_area TEXT,
+            rule         TEXT      NOT NULL,
+            due_at       TIMESTAMP NOT NULL,
+            flagged_at   TIMESTAMP NOT NULL DEFAULT NOW(),
+            resolved_at  TIMESTAMP,
+            UNIQUE (log_id, rule)
+        );
+        CREATE INDEX IF NOT EXISTS idx_overstay_alerts_open
+            ON overstay_alerts (time_in DESC) WHERE resolved_at IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_overstay_alerts_flagged
+            ON overstay_alerts (flagged_at);
+    """),
+
+    # area transfers stamp the log, so the overstay monitor can pick up a
+    # move into a stricter area on its next tick instead of at the old deadline
+    ("011_parking_logs_moved_at", """
+        ALTER TABLE parking_logs ADD COLUMN IF NOT EXISTS moved_at TIMESTAMP;
+        -- archived months are attached here and must keep the same columns
+        ALTER TABLE IF EXISTS parking_logs_archive ADD COLUMN IF NOT EXISTS moved_at TIMESTAMP;
+        CREATE INDEX IF NOT EXISTS idx_parking_logs_open_moved
+            ON parking_logs (moved_at) WHERE time_out IS NULL AND moved_at IS NOT NULL;
+    """),
+]
+
+
+# -----------------------------
+# Index usage check (flask check-indexes)
+# -----------------------------
+# Hot predicates from app.py; each one must be servable by an index.
+INDEXED_QUERIES = [
+    ("last log for plate",
+     "SELECT id, time_out FROM parking_logs WHERE plate_number = %s ORDER BY id DESC LIMIT 1",
+     ("ABC123",)),
+    ("active parked",
+     "SELECT COUNT(*) FROM parking_logs WHERE time_out IS NULL", ()),
+    ("open overstay alerts",
+     "SELECT log_id, rule FROM overstay_alerts WHERE resolved_at IS NULL ORDER BY time_in DESC", ()),
+    ("lot occupants",
+     "SELECT plate_number FROM parking_logs WHERE parking_area = %s AND time_out IS NULL",
+     ("A",)),
+    ("lot recent plates",
+     "SELECT plate_number FROM parking_logs WHERE parking_area = %s AND time_out IS NULL "
+     "ORDER BY time_in DESC LIMIT 20",
+     ("A",)),
+    ("entries today",
+     "SELECT * FROM parking_logs WHERE time_in >= CURRENT_DATE AND time_in < CURRENT_DATE + 1", ()),
+    ("exits today",
+     "SELECT * FROM parking_logs WHERE time_out >= CURRENT_DATE AND time_out < CURRENT_DATE + 1", ()),
+    ("month view",
+     "SELECT * FROM parking_logs WHERE time_in >= %s AND time_in < %s",
+     ("2025-01-01", "2025-02-01")),
+    ("registered plate",
+     "SELECT 1 FROM users WHERE plate_number = %s", ("ABC123",)),
+    ("search log by plate prefix",
+     "SELECT id FROM parking_logs WHERE upper(plate_number) LIKE %s", ("ABC%",)),
+    ("search log by plate substring",
+     "SELECT id FROM parking_logs WHERE plate_number ILIKE %s", ("%BC12%",)),
+    ("search user by name",
+     "SELECT plate_number FROM users WHERE full_name ILIKE %s", ("%dela cruz%",)),
+    ("registered today",
+     "SELECT * FROM users WHERE created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1", ()),
+]
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_index_usage(conn):
+    # small dev tables are always cheaper to seq scan, so turn that off and
+    # ask whether the planner *can* use an index for each predicate
+    results = []
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for label, sql, args in INDEXED_QUERIES:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, args)
+            plan = cur.fetchone()[0][0]["Plan"]
+            node_types = [node["Node Type"] for node in _plan_nodes(plan)]
+            indexed = "Seq Scan" not in node_types and any("Index" in t for t in node_types)
+            results.append((label, indexed, node_types))
+    finally:
+        conn.rollback()
+        cur.close()
+    return results
+
+
+def migrate(conn):
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name       TEXT PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    conn.commit()
+
+    cur.execute("SELECT name FROM schema_migrations")
+    done = {row[0] for row in cur.fetchall()}
+
+    applied = []
+    for name, sql in MIGRATIONS:
+        if name in done:
+            continue
+        try:
+            if callable(sql):
+                sql(cur)
+            else:
+                cur.execute(sql)
+            cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(name)
+
+    cur.close()
+    return applied
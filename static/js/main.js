@@ -9,31 +9,62 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     });
 
-    // wire global search inputs if present
+    // wire global search inputs if present (typeahead + button/Enter)
     const searchInputs = document.querySelectorAll(".global-search-input");
     searchInputs.forEach(inp => {
         const btn = inp.parentElement.querySelector(".global-search-btn");
-        const doSearch = () => {
+        let timer = null;
+        let inflight = null;
+        const cache = new Map();
+
+        const doSearch = (typed=false) => {
+            clearTimeout(timer);
             const q = inp.value.trim();
             if (!q) {
-                showFloatingNotice("Type a plate or name to search");
+                if (!typed) showFloatingNotice("Type a plate or name to search");
                 return;
             }
-            fetch('/search?q=' + encodeURIComponent(q))
+            if (typed && q.length < SEARCH_MIN_CHARS) return;
+
+            const url = '/search?q=' + encodeURIComponent(q) + (typed ? '&limit=' + TYPEAHEAD_LIMIT : '');
+            if (cache.has(url)) {
+                renderSearchResults(cache.get(url), inp);
+                return;
+            }
+
+            // only the latest keystroke's request matters
+            if (inflight) inflight.abort();
+            inflight = new AbortController();
+            fetch(url, { signal: inflight.signal })
                 .then(r => r.json())
                 .then(data => {
+                    cache.set(url, data);
+                    if (cache.size > 50) cache.delete(cache.keys().next().value);
                     renderSearchResults(data, inp);
                 })
                 .catch(e => {
+                    if (e.name === 'AbortError') return;
                     showFloatingNotice("Search failed");
                     console.error(e);
                 });
         };
-        if (btn) btn.addEventListener('click', doSearch);
+        if (btn) btn.addEventListener('click', () => doSearch());
         inp.addEventListener('keydown', (e) => { if (e.key === 'Enter') doSearch(); });
+        inp.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => doSearch(true), SEARCH_DEBOUNCE_MS);
+        });
     });
 });
 
+const SEARCH_DEBOUNCE_MS = 250;
+const SEARCH_MIN_CHARS = 2;
+const TYPEAHEAD_LIMIT = 20;
+
+function esc(value){
+    return String(value ?? '').replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c]));
+}
+
 // small floating notice
 function showFloatingNotice(text, timeout=2000){
     let n = document.createElement('div');
@@ -61,7 +92,7 @@ function renderSearchResults(data, inputElement){
         html += '<h3>Registered Vehicles</h3>';
         html += '<table class="table"><thead><tr><th>Plate</th><th>Name</th><th>Type</th><th>Mobile</th></tr></thead><tbody>';
         data.vehicles.forEach(v=>{
-            html += `<tr><td>${v.plate_number}</td><td>${v.full_name}</td><td>${v.vehicle_type||''}</td><td>${v.mobile_no||''}</td></tr>`;
+            html += `<tr><td>${esc(v.plate_number)}</td><td>${esc(v.full_name)}</td><td>${esc(v.vehicle_type)}</td><td>${esc(v.mobile_no)}</td></tr>`;
         });
         html += '</tbody></table>';
     }
@@ -69,7 +100,7 @@ function renderSearchResults(data, inputElement){
         html += '<h3>Parking Logs</h3>';
         html += '<table class="table"><thead><tr><th>ID</th><th>Plate</th><th>Time In</th><th>Time Out</th><th>Area</th></tr></thead><tbody>';
         data.logs.forEach(l=>{
-            html += `<tr><td>${l.id}</td><td>${l.plate_number}</td><td>${l.time_in||'-'}</td><td>${l.time_out||'-'}</td><td>${l.parking_area||'-'}</td></tr>`;
+            html += `<tr><td>${esc(l.id)}</td><td>${esc(l.plate_number)}</td><td>${esc(l.time_in||'-')}</td><td>${esc(l.time_out||'-')}</td><td>${esc(l.parking_area||'-')}</td></tr>`;
         });
         html += '</tbody></table>';
     }
@@ -0,0 +1,28 @@
+// static/js/occupancy.js
+// Keeps occupancy numbers live from /occupancy/stream (Server-Sent Events).
+//   <span data-occupancy="A">12</span>   -> current_count of area A
+//   <span data-available="A">8</span>    -> capacity - current_count of area A
+document.addEventListener("DOMContentLoaded", () => {
+    const counts = document.querySelectorAll("[data-occupancy]");
+    const available = document.querySelectorAll("[data-available]");
+    if ((!counts.length && !available.length) || !window.EventSource) return;
+
+    const areas = new Set();
+    counts.forEach(el => areas.add(el.dataset.occupancy));
+    available.forEach(el => areas.add(el.dataset.available));
+    const qs = [...areas].map(a => "area=" + encodeURIComponent(a)).join("&");
+
+    const apply = (s) => {
+        counts.forEach(el => {
+            if (el.dataset.occupancy === s.area_code) el.innerText = s.current_count;
+        });
+        available.forEach(el => {
+            if (el.dataset.available === s.area_code) el.innerText = Math.max(s.capacity - s.current_count, 0);
+        });
+    };
+
+    // EventSource reconnects by itself; the server resends a snapshot each time
+    const source = new EventSource("/occupancy/stream?" + qs);
+    source.addEventListener("snapshot", e => JSON.parse(e.data).forEach(apply));
+    source.addEventListener("occupancy", e => apply(JSON.parse(e.data)));
+});
@@ -0,0 +1,165 @@
+# stress_capacity.py
+# Concurrency check for the /scan_area admission path.
+#
+# Creates two throwaway parking areas, hammers them from many threads with
+# entries, transfers (both directions) and exits at the same time, then
+# checks that:
+#   - current_count never ends above capacity
+#   - current_count matches the open parking_logs rows for each area
+#   - every scan got a 2xx answer (a deadlock or lock timeout shows up as a 500)
+#
+# Needs the real database (run `flask migrate` first):
+#   python stress_capacity.py --capacity 10 --vehicles 300 --threads 32
+import argparse
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from app import COOLDOWN_SEC, app, query_db
+
+
+def make_area(code, capacity):
+    query_db(
+        "INSERT INTO parking_areas (area_code, area_name, capacity, current_count) "
+        "VALUES (%s,%s,%s,0)",
+        (code, f"Stress {code}", capacity),
+        fetch=False
+    )
+
+
+def cleanup(areas, prefix):
+    query_db("DELETE FROM parking_logs WHERE plate_number LIKE %s", (prefix + "%",), fetch=False)
+    for code in areas:
+        query_db("DELETE FROM parking_daily_stats WHERE parking_area=%s", (code,), fetch=False)
+        query_db("DELETE FROM parking_monthly_stats WHERE parking_area=%s", (code,), fetch=False)
+        query_db("DELETE FROM parking_areas WHERE area_code=%s", (code,), fetch=False)
+
+
+def run_scans(jobs, threads):
+    # jobs: list of (area_code, plate, action)
+    results = Counter()
+    failures = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    chunks = [jobs[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        client = app.test_client()
+        barrier.wait()
+        for area, plate, action in chunk:
+            body = {"qr_text": plate}
+            if action:
+                body["action"] = action
+            res = client.post(f"/scan_area/{area}", json=body)
+            data = res.get_json(silent=True) or {}
+            with lock:
+                if 200 <= res.status_code < 300:
+                    results[data.get("status", res.status_code)] += 1
+                else:
+                    results[f"http_{res.status_code}"] += 1
+                    failures.append((area, plate, action, res.status_code, data.get("message")))
+
+    workers = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return results, failures
+
+
+def parked(code):
+    rows = query_db(
+        "SELECT plate_number FROM parking_logs WHERE parking_area=%s AND time_out IS NULL",
+        (code,)
+    )
+    return [row["plate_number"] for row in rows]
+
+
+def check(areas):
+    ok = True
+    for code in areas:
+        area = query_db(
+            "SELECT capacity, current_count FROM parking_areas WHERE area_code=%s",
+            (code,), one=True
+        )
+        parked = query_db(
+            "SELECT COUNT(*) AS c FROM parking_logs WHERE parking_area=%s AND time_out IS NULL",
+            (code,), one=True
+        )["c"]
+
+        print(f"  {code}: count={area['current_count']} open_logs={parked} capacity={area['capacity']}")
+        if area["current_count"] > area["capacity"]:
+            print("  !! capacity exceeded")
+            ok = False
+        if area["current_count"] != parked:
+            print("  !! current_count drifted from open logs")
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capacity", type=int, default=10)
+    parser.add_argument("--vehicles", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    tag = uuid.uuid4().hex[:6].upper()
+    prefix = f"STRESS-{tag}-"
+    lot, overflow = f"SA{tag}", f"SB{tag}"
+
+    make_area(lot, args.capacity)
+    make_area(overflow, args.vehicles)
+
+    try:
+        # phase 1: park half the fleet in the overflow lot, a few in the small lot
+        staged = [f"{prefix}{i}" for i in range(args.vehicles // 2)]
+        leavers = [f"{prefix}L{i}" for i in range(args.capacity // 2)]
+        _, staging_failures = run_scans(
+            [(overflow, p, None) for p in staged] + [(lot, p, None) for p in leavers], args.threads
+        )
+
+        # phase 2: everything at once against the small lot
+        fresh = [f"{prefix}N{i}" for i in range(args.vehicles - len(staged))]
+        jobs = (
+            [(lot, p, None) for p in staged]          # transfers overflow -> lot
+            + [(lot, p, None) for p in fresh]         # new entries
+            + [(lot, p, "exit") for p in leavers]     # exits freeing slots
+        )
+        random.shuffle(jobs)
+        results, failures = run_scans(jobs, args.threads)
+
+        # phase 3: transfers in both directions and exits at the same time
+        # (opposite transfers lock the same two area rows)
+        time.sleep(COOLDOWN_SEC)    # or the repeat scans are ignored as duplicates
+        in_lot, in_overflow = parked(lot), parked(overflow)
+        jobs = (
+            [(overflow, p, None) for p in in_lot[::2]]
+            + [(lot, p, None) for p in in_overflow[::2]]
+            + [(overflow, p, "exit") for p in in_overflow[1::2]]
+        )
+        random.shuffle(jobs)
+        swap_results, swap_failures = run_scans(jobs, args.threads)
+        results.update(swap_results)
+        failures = staging_failures + failures + swap_failures
+
+        print("scan results:", dict(results))
+        ok = check([lot, overflow])
+        if failures:
+            print(f"  !! {len(failures)} scans failed")
+            for area, plate, action, code, message in failures[:10]:
+                print(f"     {code} {area} {plate} {action or 'entry'}: {message}")
+            ok = False
+    finally:
+        cleanup([lot, overflow], prefix)
+
+    print("PASS" if ok else "FAIL")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
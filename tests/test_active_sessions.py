@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from active_sessions import ActiveSessionIndex
+
+T = datetime(2026, 10, 18, 8, 0)
+
+
+def row(log_id, plate, area="A", time_in=T):
+    return {"id": log_id, "plate_number": plate, "parking_area": area, "time_in": time_in}
+
+
+def test_warm_keeps_newest_open_log_per_plate():
+    index = ActiveSessionIndex()
+    assert not index.warmed
+    index.warm([row(1, "ABC123", "A"), row(2, "XYZ789"), row(3, "ABC123", "B")])
+    assert index.warmed
+    assert len(index) == 2
+    assert index.get("ABC123") == {"id": 3, "parking_area": "B", "time_in": T}
+
+
+def test_opened_moved_closed():
+    index = ActiveSessionIndex()
+    index.opened("ABC123", 7, "A", T)
+    index.moved("ABC123", "B")
+    assert index.get("ABC123")["parking_area"] == "B"
+    index.closed("ABC123")
+    assert index.get("ABC123") is None
+    index.closed("ABC123")          # closing twice is harmless
+    index.moved("NOPE", "B")        # as is moving an unknown plate
+
+
+def test_get_returns_a_copy():
+    index = ActiveSessionIndex()
+    index.opened("ABC123", 7, "A", T)
+    index.get("ABC123")["parking_area"] = "Z"
+    assert index.get("ABC123")["parking_area"] == "A"
+
+
+def test_reconcile_reports_and_repairs_drift():
+    index = ActiveSessionIndex()
+    index.warm([row(1, "KEEP"), row(2, "GONE"), row(3, "MOVED", "A")])
+
+    drift = index.reconcile([row(1, "KEEP"), row(3, "MOVED", "B"), row(4, "NEW")])
+
+    assert drift == {"added": ["NEW"], "removed": ["GONE"], "changed": ["MOVED"]}
+    assert index.get("GONE") is None
+    assert index.get("NEW")["id"] == 4
+    assert index.get("MOVED")["parking_area"] == "B"
+    assert index.stats()["repaired"] == 3
+
+
+def test_reconcile_without_drift():
+    index = ActiveSessionIndex()
+    index.warm([row(1, "ABC123")])
+    assert index.reconcile([row(1, "ABC123")]) == {"added": [], "removed": [], "changed": []}
+    assert index.stats()["reconciles"] == 1
+
+
+def test_stats_count_hits_and_misses():
+    index = ActiveSessionIndex()
+    index.opened("ABC123", 1, None, T)
+    index.get("ABC123")
+    index.get("XYZ789")
+    s = index.stats()
+    assert (s["hits"], s["misses"], s["open_sessions"]) == (1, 1, 1)
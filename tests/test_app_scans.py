@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("qrcode")
+pytest.importorskip("psycopg2")
+
+import app as app_module
+import cooldown
+
+
+@pytest.fixture
+def client(monkeypatch):
+    inside = set()
+    applied = []
+
+    def toggle_plate(plate, now, scan_id=None):
+        applied.append((plate, now, scan_id))
+        if plate in inside:
+            inside.discard(plate)
+            return "exited"
+        inside.add(plate)
+        return "entered"
+
+    monkeypatch.setattr(app_module, "toggle_plate", toggle_plate)
+    monkeypatch.setattr(app_module, "scan_cooldown", cooldown.make_store("memory", 60))
+    monkeypatch.setattr(app_module, "QR_REQUIRE_SIGNED", False)
+    # no partition thread: there is no database here
+    monkeypatch.setattr(app_module, "_partition_thread", object())
+    client = app_module.app.test_client()
+    client.applied = applied
+    return client
+
+
+def test_replayed_entry_and_exit_are_both_applied(client):
+    entry = client.post("/scan_qr_browser", json={
+        "qr_text": "Plate: ABC123", "time": "2026-10-18T08:00:00", "scan_id": "gate1-1"
+    })
+    exit_ = client.post("/scan_qr_browser", json={
+        "qr_text": "Plate: ABC123", "time": "2026-10-18T11:30:00", "scan_id": "gate1-2"
+    })
+
+    assert entry.get_json()["status"] == "entered"
+    assert exit_.get_json()["status"] == "exited"
+    assert [scan_id for _, _, scan_id in client.applied] == ["gate1-1", "gate1-2"]
+    assert [str(now) for _, now, _ in client.applied] == ["2026-10-18 08:00:00", "2026-10-18 11:30:00"]
+
+
+def test_live_rescan_within_cooldown_is_ignored(client):
+    first = client.post("/scan_qr_browser", json={"qr_text": "Plate: ABC123"})
+    again = client.post("/scan_qr_browser", json={"qr_text": "Plate: ABC123"})
+
+    assert first.get_json()["status"] == "entered"
+    assert again.get_json() == {"status": "ignored", "message": "Duplicate scan"}
+    assert len(client.applied) == 1
+
+
+def test_typed_plate_is_refused_in_strict_mode(client, monkeypatch):
+    monkeypatch.setattr(app_module, "QR_REQUIRE_SIGNED", True)
+    page = client.post("/entry_exit", data={"plate_number": "ABC123"})
+
+    assert b"Unsigned QR code" in page.data
+    assert client.applied == []
+
+
+def test_typed_plate_is_accepted_otherwise(client):
+    page = client.post("/entry_exit", data={"plate_number": "ABC123"})
+
+    assert b"ABC123 entered" in page.data
+    assert [plate for plate, _, _ in client.applied] == ["ABC123"]
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import batch_scans
+import rollups
+
+T = datetime(2026, 10, 18, 8, 0)
+COOLDOWN = 5
+
+
+class FakeCursor:
+    # answers the lock / lookup statements apply_batch makes; writes are recorded
+    def __init__(self, open_logs=(), areas=(), seen_scan_ids=()):
+        self.open_logs = list(open_logs)
+        self.areas = {a["area_code"]: dict(a) for a in areas}
+        self.seen = set(seen_scan_ids)
+        self.writes = []
+        self._rows = []
+
+    def execute(self, sql, args=()):
+        if "INSERT INTO processed_scans" in sql:
+            fresh = [i for i in dict.fromkeys(args[0]) if i not in self.seen]
+            self.seen.update(fresh)
+            self._rows = [{"scan_id": i} for i in fresh]
+        elif "FROM parking_logs" in sql:
+            self._rows = [dict(r) for r in self.open_logs if r["plate_number"] in args[0]]
+        elif "FROM parking_areas" in sql:
+            self._rows = [dict(self.areas[c]) for c in args[0] if c in self.areas]
+        else:
+            self._rows = []
+
+    def fetchall(self):
+        return self._rows
+
+    def written(self, table):
+        return [rows for sql, rows in self.writes if table in sql]
+
+
+@pytest.fixture(autouse=True)
+def record_execute_values(monkeypatch):
+    def execute_values(cur, sql, rows, template=None, page_size=100, fetch=False):
+        rows = list(rows)
+        cur.writes.append((sql, rows))
+        if fetch:
+            return [{"id": 100 + i} for i in range(len(rows))]
+
+    monkeypatch.setattr(batch_scans, "execute_values", execute_values)
+    monkeypatch.setattr(rollups, "execute_values", execute_values)
+
+
+def area(code, capacity=10, current=0):
+    return {"area_code": code, "area_name": f"Lot {code}", "capacity": capacity, "current_count": current}
+
+
+def scan(plate, code="A", minutes=0, action=None, scan_id=None):
+    return {"plate": plate, "area_code": code, "time": T + timedelta(minutes=minutes),
+            "action": action, "scan_id": scan_id}
+
+
+def statuses(results):
+    return [r["status"] for r in results]
+
+
+def test_entry_and_exit_in_one_batch_insert_a_closed_log():
+    cur = FakeCursor(areas=[area("A", current=3)])
+    results, sessions = batch_scans.apply_batch(
+        cur, [scan("ABC123"), scan("ABC123", minutes=30, action="exit")], COOLDOWN
+    )
+
+    assert statuses(results) == ["entered", "exited"]
+    assert results[0]["occupancy"] == 4
+    [inserted] = cur.written("INSERT INTO parking_logs")
+    assert inserted == [("ABC123", T, T + timedelta(minutes=30), "A")]
+    assert sessions["ABC123"].time_out == T + timedelta(minutes=30)
+    assert cur.written("UPDATE parking_areas") == []     # back to 3
+
+
+def test_scans_grouped_per_plate_in_gate_order():
+    cur = FakeCursor(areas=[area("A"), area("B")])
+    scans = [scan("P1", "A"), scan("P2", "A", 1), scan("P1", "B", 2), scan("P2", "A", 3, action="exit")]
+    results, sessions = batch_scans.apply_batch(cur, scans, COOLDOWN)
+
+    assert statuses(results) == ["entered", "entered", "updated", "exited"]
+    assert sessions["P1"].area == "B" and sessions["P1"].time_out is None
+    [inserted] = cur.written("INSERT INTO parking_logs")
+    assert sorted(inserted) == [("P1", T, None, "B"), ("P2", T + timedelta(minutes=1), T + timedelta(minutes=3), "A")]
+    [counts] = cur.written("UPDATE parking_areas")
+    assert sorted(counts) == [("B", 1)]
+
+
+def test_rollups_written_once_per_day_and_area():
+    cur = FakeCursor(areas=[area("A")])
+    batch_scans.apply_batch(
+        cur, [scan("P1"), scan("P2", minutes=1), scan("P1", minutes=10, action="exit")], COOLDOWN
+    )
+    [daily] = cur.written("parking_daily_stats")
+    [monthly] = cur.written("parking_monthly_stats")
+    assert daily == [(T.date(), "A", 2, 1)]
+    assert monthly == [(T.date().replace(day=1), "A", 2, 1)]
+
+
+def test_transfer_of_an_open_log_moves_counts_and_rollups():
+    cur = FakeCursor(
+        open_logs=[{"id": 7, "plate_number": "ABC123", "parking_area": "A", "time_in": T}],
+        areas=[area("A", current=1), area("B", current=0)],
+    )
+    results, _ = batch_scans.apply_batch(cur, [scan("ABC123", "B", 60)], COOLDOWN)
+
+    assert statuses(results) == ["updated"]
+    [updated] = cur.written("UPDATE parking_logs")
+    assert updated == [(7, "B", None)]
+    [counts] = cur.written("UPDATE parking_areas")
+    assert sorted(counts) == [("A", 0), ("B", 1)]
+    [daily] = cur.written("parking_daily_stats")
+    assert daily == [(T.date(), "A", -1, 0), (T.date(), "B", 1, 0)]
+
+
+def test_already_applied_scan_ids_are_ignored():
+    cur = FakeCursor(areas=[area("A")], seen_scan_ids={"s1"})
+    results, _ = batch_scans.apply_batch(
+        cur, [scan("P1", scan_id="s1"), scan("P2", scan_id="s2")], COOLDOWN
+    )
+    assert statuses(results) == ["ignored", "entered"]
+    assert results[0]["message"] == "Already applied"
+    assert results[0]["scan_id"] == "s1"
+
+
+def test_scan_id_repeated_within_a_batch_applies_once():
+    cur = FakeCursor(areas=[area("A")])
+    results, _ = batch_scans.apply_batch(
+        cur, [scan("P1", scan_id="s1"), scan("P1", minutes=30, action="exit", scan_id="s1")], COOLDOWN
+    )
+    assert statuses(results) == ["entered", "ignored"]
+
+
+def test_replaying_a_whole_batch_changes_nothing():
+    scans = [scan("P1", scan_id="s1"), scan("P1", minutes=30, action="exit", scan_id="s2")]
+    cur = FakeCursor(areas=[area("A")])
+    batch_scans.apply_batch(cur, scans, COOLDOWN)
+
+    replay = FakeCursor(areas=[area("A")], seen_scan_ids=cur.seen)
+    results, _ = batch_scans.apply_batch(replay, scans, COOLDOWN)
+    assert statuses(results) == ["ignored", "ignored"]
+    assert replay.writes == []
+
+
+def test_cooldown_is_per_plate_and_area():
+    cur = FakeCursor(areas=[area("A"), area("B")])
+    results, _ = batch_scans.apply_batch(
+        cur, [scan("P1", "A"), scan("P1", "A", 0.05), scan("P1", "B", 0.06), scan("P1", "A", 1)], COOLDOWN
+    )
+    assert statuses(results) == ["entered", "ignored", "updated", "updated"]
+
+
+def test_full_area_and_unknown_area():
+    cur = FakeCursor(areas=[area("A", capacity=1, current=0)])
+    results, _ = batch_scans.apply_batch(cur, [scan("P1"), scan("P2", minutes=1), scan("P3", "NOPE")], COOLDOWN)
+    assert statuses(results) == ["entered", "full", "error"]
+    assert results[2]["message"] == "Unknown area"
+
+
+def test_exit_without_open_log_is_ignored():
+    cur = FakeCursor(areas=[area("A")])
+    results, _ = batch_scans.apply_batch(cur, [scan("P1", action="exit")], COOLDOWN)
+    assert statuses(results) == ["ignored"]
+    assert cur.writes == []
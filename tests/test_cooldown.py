@@ -0,0 +1,77 @@
+import pytest
+
+import cooldown
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, clock, monkeypatch, tmp_path):
+    monkeypatch.setattr(cooldown, "time", clock)
+    return cooldown.make_store(request.param, ttl=5, max_size=3, path=str(tmp_path / "cooldown.sqlite3"))
+
+
+def test_repeat_inside_window_is_a_hit(store, clock):
+    assert store.hit("A|ABC123") is False
+    clock.advance(4.9)
+    assert store.hit("A|ABC123") is True
+
+
+def test_window_is_not_extended_by_hits(store, clock):
+    store.hit("A|ABC123")
+    clock.advance(3)
+    assert store.hit("A|ABC123") is True
+    clock.advance(2)
+    assert store.hit("A|ABC123") is False
+
+
+def test_new_window_after_expiry(store, clock):
+    store.hit("A|ABC123")
+    clock.advance(5)
+    assert store.hit("A|ABC123") is False
+    clock.advance(1)
+    assert store.hit("A|ABC123") is True
+
+
+def test_keys_are_independent(store):
+    assert store.hit("A|ABC123") is False
+    assert store.hit("B|ABC123") is False
+    assert store.hit("A|XYZ789") is False
+
+
+def test_stats(store):
+    store.hit("k")
+    store.hit("k")
+    s = store.stats()
+    assert (s["hits"], s["misses"], s["size"]) == (1, 1, 1)
+
+
+def test_memory_store_is_bounded(clock, monkeypatch):
+    monkeypatch.setattr(cooldown, "time", clock)
+    store = cooldown.MemoryCooldownStore(ttl=5, max_size=3)
+    for key in "abcd":
+        store.hit(key)
+    assert len(store) == 3
+    assert store.hit("a") is False      # oldest window evicted
+
+
+def test_memory_store_drops_expired_keys(clock, monkeypatch):
+    monkeypatch.setattr(cooldown, "time", clock)
+    store = cooldown.MemoryCooldownStore(ttl=5)
+    store.hit("a")
+    store.hit("b")
+    clock.advance(6)
+    store.hit("c")
+    assert len(store) == 1
+
+
+def test_sqlite_store_is_shared_between_instances(clock, monkeypatch, tmp_path):
+    monkeypatch.setattr(cooldown, "time", clock)
+    path = str(tmp_path / "shared.sqlite3")
+    first = cooldown.SQLiteCooldownStore(path, ttl=5)
+    second = cooldown.SQLiteCooldownStore(path, ttl=5)
+    assert first.hit("A|ABC123") is False
+    assert second.hit("A|ABC123") is True
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        cooldown.make_store("redis", ttl=5)
@@ -0,0 +1,48 @@
+import threading
+
+import exports
+
+
+class Pool:
+    def __init__(self):
+        self.returned = threading.Event()
+        self.discarded = None
+
+    def getconn(self):
+        return object()
+
+    def putconn(self, conn, discard=False):
+        self.discarded = discard
+        self.returned.set()
+
+
+def endless_export(conn, table, fmt, out, **filters):
+    while True:
+        out.write(b"row\n")
+
+
+def small_export(conn, table, fmt, out, **filters):
+    out.write(b"a\n")
+    out.write(b"b\n")
+
+
+def test_cancel_before_first_chunk_returns_the_connection(monkeypatch):
+    monkeypatch.setattr(exports, "write_export", endless_export)
+    pool = Pool()
+    pipe = exports.stream_export(pool.getconn, pool.putconn, "parking_logs", "csv")
+
+    pipe.chunks()       # the response never pulls a chunk
+    pipe.cancel()       # what response.call_on_close runs
+
+    assert pool.returned.wait(5)
+    assert pool.discarded is True
+
+
+def test_finished_export_keeps_the_connection(monkeypatch):
+    monkeypatch.setattr(exports, "write_export", small_export)
+    pool = Pool()
+    pipe = exports.stream_export(pool.getconn, pool.putconn, "parking_logs", "csv")
+
+    assert b"".join(pipe.chunks()) == b"a\nb\n"
+    assert pool.returned.wait(5)
+    assert pool.discarded is False
@@ -0,0 +1,159 @@
+import contextlib
+from datetime import datetime, time, timedelta
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import overstay
+from overstay import deadlines
+
+T = datetime(2026, 10, 18, 8, 0)
+
+
+def rule(max_stay=None, overnight=True, closes_at=None):
+    return {"max_stay_minutes": max_stay, "overnight_allowed": overnight, "closes_at": closes_at}
+
+
+class FakeDB:
+    # parking_areas rules and parking_logs rows, answered by statement prefix
+    def __init__(self, rules):
+        self.rules = rules
+        self.logs = {}
+        self.now = T
+        self.alerts = []
+
+    def park(self, log_id, plate, area, time_in):
+        self.logs[log_id] = {"id": log_id, "plate_number": plate, "parking_area": area,
+                             "time_in": time_in, "time_out": None, "moved_at": None}
+
+    def move(self, log_id, area):
+        self.logs[log_id].update(parking_area=area, moved_at=self.now)
+
+    def answer(self, sql, args):
+        open_logs = [log for log in self.logs.values() if log["time_out"] is None]
+        if sql.startswith("SELECT pg_try_advisory_xact_lock"):
+            return [{"leader": True, "db_now": self.now}]
+        if sql.startswith("SELECT area_code, max_stay_minutes"):
+            return [dict(r, area_code=code) for code, r in self.rules.items()]
+        if sql.startswith("SELECT log_id, rule FROM overstay_alerts"):
+            return []
+        if sql.startswith("SELECT COALESCE(MAX(id), 0)"):
+            return [{"last_id": max(self.logs, default=0)}]
+        if "time_out IS NULL AS open" in sql:
+            return [dict(log, open=log["time_out"] is None) for log in self.logs.values() if log["id"] > args[0]]
+        if "moved_at >= %s" in sql:
+            return [log for log in open_logs if log["moved_at"] and log["moved_at"] >= args[0]]
+        if "WHERE id = ANY(%s)" in sql:
+            return [log for log in open_logs if log["id"] in args[0]]
+        if sql.startswith("SELECT id, parking_area, time_in FROM parking_logs"):
+            return open_logs
+        return []
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, args=()):
+        self._rows = self.db.answer(" ".join(sql.split()), args)
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB({"A": rule(max_stay=60), "B": rule(max_stay=30)})
+
+    def execute_values(cur, sql, rows, fetch=False):
+        db.alerts.extend(rows)
+        return [(row[0],) for row in rows]
+
+    monkeypatch.setattr(overstay, "execute_values", execute_values)
+    return db
+
+
+@pytest.fixture
+def monitor(db):
+    @contextlib.contextmanager
+    def transaction():
+        yield FakeCursor(db)
+    return overstay.OverstayMonitor(transaction, resync_sec=3600)
+
+
+def alerted(db):
+    return [(a[0], a[4], a[5]) for a in db.alerts]
+
+
+def test_deadlines_per_rule():
+    assert deadlines(rule(max_stay=90), T) == [(T + timedelta(minutes=90), "max_duration")]
+    assert deadlines(rule(overnight=False), T) == [(datetime(2026, 10, 19), "overnight")]
+    assert deadlines(rule(closes_at=time(18, 0)), T) == [(datetime(2026, 10, 18, 18, 0), "after_hours")]
+    assert deadlines(rule(), T) == []
+
+
+def test_closing_time_before_entry_is_the_next_day():
+    late = datetime(2026, 10, 18, 20, 0)
+    assert deadlines(rule(closes_at=time(18, 0)), late) == [(datetime(2026, 10, 19, 18, 0), "after_hours")]
+
+
+def test_due_entries_fire_in_deadline_order(db, monitor):
+    db.park(1, "AAA111", "A", T)                         # due 09:00
+    db.park(2, "BBB222", "B", T + timedelta(minutes=10))  # due 08:40
+    db.park(3, "CCC333", "B", T + timedelta(hours=2))     # due 10:30
+
+    assert monitor.tick(now=T + timedelta(minutes=30)) == (0, 0)
+    assert monitor.tick(now=T + timedelta(hours=1)) == (2, 0)
+    assert alerted(db) == [
+        (2, "max_duration", T + timedelta(minutes=40)),
+        (1, "max_duration", T + timedelta(hours=1)),
+    ]
+    assert monitor.stats()["next_due"] == "2026-10-18T10:30:00"
+
+
+def test_session_that_left_is_not_flagged(db, monitor):
+    db.park(1, "AAA111", "A", T)
+    monitor.tick(now=T)
+    db.logs[1]["time_out"] = T + timedelta(minutes=20)
+
+    assert monitor.tick(now=T + timedelta(hours=2)) == (0, 0)
+    assert db.alerts == []
+
+
+def test_transfer_rearms_under_the_new_areas_rule(db, monitor):
+    db.park(1, "AAA111", "A", T)                         # A: due 09:00
+    monitor.tick(now=T)
+
+    db.now = T + timedelta(minutes=5)
+    db.move(1, "B")                                      # B: due 08:30
+    monitor.tick(now=T + timedelta(minutes=10))
+    assert monitor.tick(now=T + timedelta(minutes=30)) == (1, 0)
+    assert alerted(db) == [(1, "max_duration", T + timedelta(minutes=30))]
+
+    # the entry queued for area A is superseded, not fired a second time
+    assert monitor.tick(now=T + timedelta(hours=2)) == (0, 0)
+    assert len(db.alerts) == 1
+
+
+def test_transfer_seen_only_at_the_deadline_is_rescheduled(db, monitor):
+    db.park(1, "AAA111", "B", T)                         # B: due 08:30
+    monitor.tick(now=T)
+    db.logs[1]["parking_area"] = "A"                     # moved, without moved_at
+
+    assert monitor.tick(now=T + timedelta(minutes=45)) == (0, 0)
+    assert monitor.tick(now=T + timedelta(hours=1)) == (1, 0)
+    assert alerted(db) == [(1, "max_duration", T + timedelta(hours=1))]
+
+
+def test_flagged_session_is_not_queued_again(db, monitor):
+    db.park(1, "AAA111", "B", T)
+    monitor.tick(now=T + timedelta(hours=1))
+    db.now = T + timedelta(hours=1)
+    db.move(1, "B")
+
+    assert monitor.tick(now=T + timedelta(hours=3)) == (0, 0)
+    assert monitor.stats()["queued"] == 0
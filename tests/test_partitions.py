@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+
+import partitions
+from partitions import add_months, retention_start
+
+TODAY = date(2026, 10, 18)
+
+
+class FakeCursor:
+    # plain tuple cursor; `names` are the child tables of parking_logs
+    def __init__(self, names, open_sessions=()):
+        self.names = names
+        self.open_sessions = set(open_sessions)
+        self.statements = []
+        self._rows = []
+
+    def execute(self, sql, args=()):
+        self.statements.append(sql)
+        if "FROM pg_inherits" in sql:
+            self._rows = [(name,) for name in self.names]
+        elif "WHERE time_out IS NULL" in sql:
+            table = sql.split(" FROM ")[1].split()[0]
+            self._rows = [(1,)] if table in self.open_sessions else []
+        else:
+            self._rows = []
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+@pytest.mark.parametrize("month, n, expected", [
+    (date(2026, 10, 1), 1, date(2026, 11, 1)),
+    (date(2026, 12, 1), 1, date(2027, 1, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 10, 1), -24, date(2024, 10, 1)),
+    (date(2026, 10, 1), 27, date(2029, 1, 1)),
+    (date(2026, 10, 1), 0, date(2026, 10, 1)),
+])
+def test_add_months(month, n, expected):
+    assert add_months(month, n) == expected
+
+
+def test_partition_name():
+    assert partitions.partition_name(date(2026, 3, 1)) == "parking_logs_p2026_03"
+
+
+def test_retention_start():
+    assert retention_start(24, TODAY) == date(2024, 10, 1)
+    assert retention_start(1, date(2026, 1, 31)) == date(2025, 12, 1)
+    assert retention_start(0, TODAY) is None
+
+
+def test_expired_partitions_are_whole_months_before_the_window():
+    cur = FakeCursor([
+        "parking_logs_p2024_11", "parking_logs_default", "parking_logs_p2024_09",
+        "parking_logs_p2024_10", "parking_logs_p2026_10", "parking_logs_old_backup",
+    ])
+    expired = partitions.expired_partitions(cur, 24, TODAY)
+    assert expired == [(date(2024, 9, 1), "parking_logs_p2024_09")]
+
+
+def test_nothing_expires_when_keeping_everything():
+    cur = FakeCursor(["parking_logs_p2001_01"])
+    assert partitions.expired_partitions(cur, 0, TODAY) == []
+    assert cur.statements == []
+
+
+def test_ensure_partitions_creates_missing_months_only():
+    cur = FakeCursor(["parking_logs_p2026_10", "parking_logs_p2026_12"])
+    created = partitions.ensure_partitions(cur, ahead=3, today=TODAY)
+    assert created == ["parking_logs_p2026_11", "parking_logs_p2027_01"]
+
+
+def test_archive_skips_months_with_open_sessions(tmp_path):
+    cur = FakeCursor(
+        ["parking_logs_p2024_08", "parking_logs_p2024_09", "parking_logs_p2026_10"],
+        open_sessions={"parking_logs_p2024_08"},
+    )
+    archived, skipped = partitions.archive_expired(cur, 24, mode="table", today=TODAY)
+
+    assert [name for name, _ in archived] == ["parking_logs_p2024_09"]
+    assert skipped == ["parking_logs_p2024_08"]
+    assert not any("DETACH PARTITION parking_logs_p2024_08" in sql for sql in cur.statements)
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+pytest.importorskip("qrcode")
+
+import qr_cache
+
+
+def test_prune_removes_only_old_files(tmp_path):
+    cache = qr_cache.QRCache(disk_dir=str(tmp_path))
+    old_key, _ = cache.get("P1.OLD", "png")
+    new_key, _ = cache.get("P1.NEW", "png")
+    old_path = qr_cache._disk_path(str(tmp_path), old_key, "png")
+    new_path = qr_cache._disk_path(str(tmp_path), new_key, "png")
+    os.utime(old_path, (1000, 1000))
+    os.utime(new_path, (5000, 5000))
+
+    assert qr_cache.prune(str(tmp_path), 2000, now=6000) == 1
+    assert not os.path.exists(old_path)
+    assert os.path.exists(new_path)
+
+
+def test_pruned_image_is_rendered_again(tmp_path):
+    cache = qr_cache.QRCache(max_items=0, disk_dir=str(tmp_path))
+    _, first = cache.get("P1.ABC", "png")
+    qr_cache.prune(str(tmp_path), 0, now=10 ** 12)
+
+    _, again = cache.get("P1.ABC", "png")
+    assert again == first
+    assert cache.stats()["renders"] == 2
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+import pytest
+
+import qr_sign
+from qr_sign import ExpiredQR, InvalidQR, Signer
+
+KEYS = {"k1": b"first-secret", "k2": b"second-secret"}
+TODAY = date(2026, 10, 18)
+
+
+@pytest.fixture
+def signer():
+    return Signer(KEYS, "k1")
+
+
+def test_round_trip(signer):
+    text = signer.sign("ABC123", date(2027, 1, 31))
+    assert qr_sign.is_signed(text)
+    assert text.split(".")[:2] == ["P1", "ABC123"]
+    assert signer.verify(text, today=TODAY) == ("ABC123", date(2027, 1, 31))
+
+
+def test_valid_through_expiry_day(signer):
+    text = signer.sign("ABC123", TODAY)
+    assert signer.verify(text, today=TODAY)[0] == "ABC123"
+    with pytest.raises(ExpiredQR):
+        signer.verify(text, today=date(2026, 10, 19))
+
+
+def test_expired_is_also_invalid(signer):
+    assert issubclass(ExpiredQR, InvalidQR)
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda t: t.replace("ABC123", "ABC124"),
+    lambda t: t[:-1] + ("A" if t[-1] != "A" else "B"),
+    lambda t: ".".join(t.split(".")[:2] + ["zzzz"] + t.split(".")[3:]),
+])
+def test_tampering_is_rejected(signer, tamper):
+    text = signer.sign("ABC123", date(2027, 1, 31))
+    with pytest.raises(InvalidQR, match="signature"):
+        signer.verify(tamper(text), today=TODAY)
+
+
+@pytest.mark.parametrize("text", ["P1.ABC123", "Plate: ABC123", "P2.ABC123.abc.k1.MAC", ""])
+def test_malformed(signer, text):
+    with pytest.raises(InvalidQR):
+        signer.verify(text, today=TODAY)
+
+
+def test_key_rotation_keeps_old_codes_valid():
+    old = Signer(KEYS, "k1").sign("ABC123", date(2027, 1, 31))
+    rotated = Signer(KEYS, "k2")
+    new = rotated.sign("ABC123", date(2027, 1, 31))
+
+    assert new.split(".")[3] == "k2"
+    assert rotated.verify(old, today=TODAY)[0] == "ABC123"
+    assert rotated.verify(new, today=TODAY)[0] == "ABC123"
+
+
+def test_retired_key_is_rejected():
+    old = Signer(KEYS, "k1").sign("ABC123", date(2027, 1, 31))
+    retired = Signer({"k2": KEYS["k2"]}, "k2")
+    with pytest.raises(InvalidQR, match="Unknown"):
+        retired.verify(old, today=TODAY)
+
+
+def test_same_kid_different_secret_is_rejected():
+    text = Signer(KEYS, "k1").sign("ABC123", date(2027, 1, 31))
+    other = Signer({"k1": b"someone-else"}, "k1")
+    with pytest.raises(InvalidQR, match="signature"):
+        other.verify(text, today=TODAY)
+
+
+def test_parse_keys():
+    assert qr_sign.parse_keys(" k1=abc , k2=d=e,junk") == {"k1": b"abc", "k2": b"d=e"}
+    assert qr_sign.parse_keys(None) == {}
+
+
+@pytest.mark.parametrize("keys, kid", [(KEYS, "k3"), ({"a.b": b"x"}, "a.b"), ({"": b"x"}, "")])
+def test_bad_signer_config(keys, kid):
+    with pytest.raises(ValueError):
+        Signer(keys, kid)
+
+
+@pytest.mark.parametrize("plate", ["", "AB.123"])
+def test_unsignable_plates(signer, plate):
+    with pytest.raises(ValueError):
+        signer.sign(plate, TODAY)
+
+
+def test_expiry_is_stable_within_a_renewal_window():
+    window = [date(2026, 10, 4) + timedelta(days=d) for d in range(30)]
+    dates = {qr_sign.expiry(day, 365, 30) for day in window}
+    assert len(dates) == 1
+    assert qr_sign.expiry(window[-1] + timedelta(days=1), 365, 30) == dates.pop() + timedelta(days=30)
+
+
+def test_expiry_is_at_least_valid_days_ahead():
+    for d in range(60):
+        today = TODAY + timedelta(days=d)
+        assert 365 <= (qr_sign.expiry(today, 365, 30) - today).days < 395
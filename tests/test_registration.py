@@ -0,0 +1,71 @@
+from registration import parse_csv, plate_problem
+
+HEADER = "full_name,id_number,vehicle_type,mobile_no,plate_number\n"
+
+
+def test_valid_rows_keep_their_line_numbers():
+    rows, errors = parse_csv(HEADER + "Ana Cruz,1001,Car,0917,ABC123\nBen Reyes,,,,XYZ789\n")
+    assert errors == []
+    assert [(r["line"], r["plate_number"]) for r in rows] == [(2, "ABC123"), (3, "XYZ789")]
+    assert rows[1]["id_number"] == "" and rows[1]["full_name"] == "Ben Reyes"
+
+
+def test_header_is_case_and_space_insensitive():
+    rows, errors = parse_csv(" Full_Name , PLATE_NUMBER ,Notes\n Ana Cruz , ABC123 ,x\n")
+    assert errors == []
+    assert rows[0]["full_name"] == "Ana Cruz" and rows[0]["plate_number"] == "ABC123"
+    assert rows[0]["mobile_no"] == ""
+
+
+def test_missing_required_column_rejects_the_file():
+    rows, errors = parse_csv("full_name,mobile_no\nAna Cruz,0917\n")
+    assert rows == []
+    assert errors == [{"line": 1, "plate_number": None, "error": "missing column(s): plate_number"}]
+
+
+def test_empty_file():
+    rows, errors = parse_csv("")
+    assert rows == []
+    assert errors[0]["error"] == "missing column(s): full_name, plate_number"
+
+
+def test_malformed_rows_are_reported_and_skipped():
+    text = HEADER + "\n".join([
+        ",1002,Car,0917,NONAME1",           # 2: no name
+        "Ana Cruz,1003,Car,0917,",          # 3: no plate
+        "Ana Cruz,1004,Car,0917," + "X" * 21,
+        "Ana Cruz,1005,Car,0917,AB.123",    # 5: dot
+        "Ana Cruz,1006",                    # 6: short row
+        "Ana Cruz,1007,Car,0917,GOOD1",
+    ]) + "\n"
+    rows, errors = parse_csv(text)
+
+    assert [r["plate_number"] for r in rows] == ["GOOD1"]
+    assert [(e["line"], e["error"]) for e in errors] == [
+        (2, "full_name is required"),
+        (3, "plate_number is required"),
+        (4, "plate_number longer than 20 characters"),
+        (5, "plate_number may not contain dots"),
+        (6, "plate_number is required"),
+    ]
+    assert errors[1]["plate_number"] is None
+
+
+def test_duplicates_keep_the_first_occurrence():
+    text = HEADER + "Ana Cruz,1,Car,1,ABC123\nBen Reyes,2,Car,2,XYZ789\nCarl Diaz,3,Car,3,ABC123\n"
+    rows, errors = parse_csv(text)
+
+    assert [r["line"] for r in rows] == [2, 3]
+    assert errors == [{"line": 4, "plate_number": "ABC123", "error": "duplicate of line 2 in this file"}]
+
+
+def test_rejected_row_does_not_claim_its_plate():
+    text = HEADER + ",1,Car,1,ABC123\nAna Cruz,2,Car,2,ABC123\n"
+    rows, errors = parse_csv(text)
+    assert [r["line"] for r in rows] == [3]
+    assert [e["line"] for e in errors] == [2]
+
+
+def test_plate_problem():
+    assert plate_problem("ABC 123") is None
+    assert plate_problem("A.B") == "plate_number may not contain dots"
@@ -0,0 +1,79 @@
+import pytest
+
+# the decoder needs the zbar system library
+scan_qr = pytest.importorskip("scan_qr", exc_type=ImportError)
+
+from scan_spool import ScanSpool
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, text=""):
+        self.status_code = status_code
+        self._data = data
+        self.text = text
+
+    def json(self):
+        if self._data is None:
+            raise ValueError("not JSON")
+        return self._data
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.bodies = []
+
+    def post(self, url, json=None, timeout=None):
+        self.bodies.append(json)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = ScanSpool(str(tmp_path / "scans.sqlite3"))
+    for i in range(4):
+        spool.append(f"Plate: P{i}", f"2026-10-18T08:00:0{i}")
+    yield spool
+    spool.close()
+
+
+def drain(spool, session, area=None, batch_size=200):
+    sender = scan_qr.Sender("http://gate", spool, scan_qr.Stats(), area=area,
+                            batch_size=batch_size, backoff=0)
+    sender.session = session
+    sender.stop()           # run() returns once the spool is empty or a send fails
+    sender.run()
+    return sender
+
+
+def test_oversized_batch_is_kept_and_split(spool):
+    too_large = FakeResponse(413, {"status": "error", "message": "At most 2 scans per batch"})
+    session = FakeSession(too_large)
+    sender = drain(spool, session, area="A", batch_size=4)
+
+    assert spool.qsize() == 4
+    assert sender.batch_size == 2
+
+
+def test_batch_with_per_scan_results_is_acked(spool):
+    results = {"results": [{"status": "entered"}] * 4, "summary": {"entered": 4}}
+    drain(spool, FakeSession(FakeResponse(200, results)), area="A", batch_size=4)
+    assert spool.qsize() == 0
+
+
+def test_error_page_is_not_acked(spool):
+    drain(spool, FakeSession(FakeResponse(404, text="<html>Not Found</html>")))
+    assert spool.qsize() == 4
+
+
+def test_rejected_scan_is_acked(spool):
+    rejected = FakeResponse(403, {"status": "rejected", "message": "Invalid QR signature"})
+    ok = FakeResponse(200, {"status": "entered"})
+    drain(spool, FakeSession(rejected, ok, ok, ok))
+    assert spool.qsize() == 0
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr("sys.argv", ["scan_qr.py", "--area", "A", "--batch-size", "5001"])
+    with pytest.raises(SystemExit):
+        scan_qr.parse_args()
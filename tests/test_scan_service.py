@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("asyncpg")
+pytest.importorskip("qrcode")
+
+import app as flask_app
+import cooldown
+import scan_service
+
+
+def test_sqlite_cooldown_runs_off_the_event_loop(tmp_path, monkeypatch):
+    store = cooldown.make_store("sqlite", 60, path=str(tmp_path / "cooldown.sqlite3"))
+    threads = []
+    hit = store.hit
+
+    def recording_hit(key):
+        threads.append(threading.current_thread())
+        return hit(key)
+
+    monkeypatch.setattr(store, "hit", recording_hit)
+    monkeypatch.setattr(flask_app, "scan_cooldown", store)
+
+    async def scan_twice():
+        return [await scan_service.cooldown_hit("A|ABC123") for _ in range(2)], threading.current_thread()
+
+    results, loop_thread = asyncio.run(scan_twice())
+    assert results == [False, True]
+    assert all(t is not loop_thread for t in threads)
@@ -0,0 +1,62 @@
+import pytest
+
+from scan_spool import ScanSpool
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = ScanSpool(str(tmp_path / "spool" / "scans.sqlite3"))
+    yield spool
+    spool.close()
+
+
+def test_peek_returns_scans_in_order(spool):
+    for i in range(5):
+        spool.append(f"Plate: P{i}", f"2026-10-18T08:00:0{i}")
+    rows = spool.peek(3)
+    assert [r["qr_text"] for r in rows] == ["Plate: P0", "Plate: P1", "Plate: P2"]
+    assert [r["scanned_at"] for r in rows] == ["2026-10-18T08:00:00", "2026-10-18T08:00:01", "2026-10-18T08:00:02"]
+    assert all(r["attempts"] == 0 and r["scan_id"] for r in rows)
+    assert spool.qsize() == 5               # peek doesn't remove
+
+
+def test_ack_removes_up_to_seq(spool):
+    for i in range(4):
+        spool.append(f"P{i}", "2026-10-18T08:00:00")
+    rows = spool.peek(2)
+    spool.ack(rows[-1]["seq"])
+    assert [r["qr_text"] for r in spool.peek(10)] == ["P2", "P3"]
+
+
+def test_same_scan_id_is_spooled_once(spool):
+    first = spool.append("P1", "2026-10-18T08:00:00", scan_id="abc")
+    second = spool.append("P1", "2026-10-18T08:00:00", scan_id="abc")
+    assert first == second == "abc"
+    assert spool.qsize() == 1
+
+
+def test_scan_ids_are_unique(spool):
+    ids = {spool.append("P1", "2026-10-18T08:00:00") for _ in range(20)}
+    assert len(ids) == 20
+
+
+def test_failed_counts_attempts(spool):
+    spool.append("P1", "2026-10-18T08:00:00")
+    seq = spool.peek(1)[0]["seq"]
+    assert spool.failed(seq) == 1
+    assert spool.failed(seq) == 2
+    assert spool.peek(1)[0]["attempts"] == 2
+    assert spool.failed(seq + 100) == 0     # already acked
+
+
+def test_survives_reopen(tmp_path):
+    path = str(tmp_path / "scans.sqlite3")
+    spool = ScanSpool(path)
+    spool.append("P1", "2026-10-18T08:00:00", scan_id="abc")
+    spool.failed(spool.peek(1)[0]["seq"])
+    spool.close()
+
+    reopened = ScanSpool(path)
+    [row] = reopened.peek(10)
+    assert (row["scan_id"], row["attempts"]) == ("abc", 1)
+    reopened.close()
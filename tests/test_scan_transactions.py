@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import scan_transactions as tx
+
+T = datetime(2026, 10, 18, 8, 0)
+
+
+class FakeCursor:
+    # rows for each statement come from `answer(sql)`; None means no result set
+    def __init__(self, answer):
+        self.answer = answer
+        self.statements = []
+        self.description = None
+
+    def execute(self, sql, args=()):
+        self.statements.append((" ".join(sql.split()), args))
+        self._rows = self.answer(" ".join(sql.split()))
+        self.description = None if self._rows is None else [("col",)]
+
+    def fetchall(self):
+        return self._rows
+
+
+def db(open_log=None, room=True, moved=True, can_enter=None):
+    if can_enter is None:
+        can_enter = room and open_log is None
+
+    def answer(sql):
+        if sql.startswith("SELECT pg_advisory_xact_lock"):
+            return [{"pg_advisory_xact_lock": None}]
+        if sql.startswith("SELECT area_code FROM parking_areas"):
+            return []
+        if sql.startswith("WITH slot AS"):
+            return [{"id": 9, "occupancy": 4}] if can_enter else []
+        if sql.startswith("UPDATE parking_areas SET current_count = current_count + 1"):
+            return [{"current_count": 4}] if room else []
+        if sql.startswith("SELECT id, parking_area, time_in FROM parking_logs"):
+            return [open_log] if open_log else []
+        if sql.startswith("UPDATE parking_logs SET parking_area"):
+            return [{"id": open_log["id"], "time_in": open_log["time_in"]}] if moved else []
+        if sql.startswith("UPDATE parking_logs SET time_out"):
+            return [{"id": open_log["id"], "parking_area": open_log["parking_area"]}] if open_log else []
+        if sql.startswith("INSERT INTO parking_logs"):
+            return [{"id": 9}] if open_log is None else []
+        if sql.startswith("INSERT INTO processed_scans"):
+            return [{"scan_id": "s1"}]
+        return None
+    return answer
+
+
+def kinds(cur):
+    out = []
+    for sql, _ in cur.statements:
+        if "pg_advisory_xact_lock" in sql:
+            out.append("plate")
+        elif "FOR UPDATE" in sql:
+            out.append("areas")
+        elif sql.startswith("UPDATE parking_areas") or sql.startswith("WITH slot"):
+            out.append("slot")
+        elif "parking_daily_stats" in sql:
+            out.append("daily")
+        elif "parking_monthly_stats" in sql:
+            out.append("monthly")
+        else:
+            out.append("log")
+    return out
+
+
+def test_entry():
+    cur = FakeCursor(db())
+    result = tx.run(cur, tx.admit("ABC123", "A", T, None))
+    assert result["status"] == "entered" and result["occupancy"] == 4
+    assert kinds(cur) == ["plate", "slot", "daily", "monthly"]
+
+
+def test_transfer_locks_plate_then_areas_then_rollups():
+    log = {"id": 7, "parking_area": "B", "time_in": T}
+    cur = FakeCursor(db(open_log=log))
+    result = tx.run(cur, tx.admit("ABC123", "A", T, log))
+
+    assert result["status"] == "updated"
+    assert kinds(cur) == ["plate", "areas", "slot", "log", "slot", "daily", "daily", "monthly", "monthly"]
+    assert cur.statements[1][1] == (["A", "B"],)         # both areas, sorted
+    daily = [args for sql, args in cur.statements if "parking_daily_stats" in sql]
+    assert daily == [(T.date(), "A", 1, 0), (T.date(), "B", -1, 0)]
+
+
+def test_transfer_into_full_area():
+    log = {"id": 7, "parking_area": "B", "time_in": T}
+    cur = FakeCursor(db(open_log=log, room=False))
+    assert tx.run(cur, tx.admit("ABC123", "A", T, log))["status"] == "full"
+    assert "log" not in kinds(cur)
+
+
+def test_same_area_scan_touches_the_log_only():
+    log = {"id": 7, "parking_area": "A", "time_in": T}
+    cur = FakeCursor(db(open_log=log))
+    assert tx.run(cur, tx.admit("ABC123", "A", T, log))["status"] == "updated"
+    assert kinds(cur) == ["plate", "log"]
+
+
+def test_stale_index_entry_falls_back_to_entry():
+    # the index says parked in B, but the vehicle already left
+    stale = {"id": 7, "parking_area": "B", "time_in": T}
+    cur = FakeCursor(db(open_log=stale, moved=False, can_enter=True))
+    result = tx.run(cur, tx.admit("ABC123", "A", T, stale))
+    assert result["status"] == "entered"
+    # the slot claimed for the failed transfer is given back before entering
+    assert kinds(cur) == ["plate", "areas", "slot", "log", "slot", "slot", "daily", "monthly"]
+
+
+def test_exit_releases_slot_before_rollups():
+    log = {"id": 7, "parking_area": "A", "time_in": T}
+    cur = FakeCursor(db(open_log=log))
+    assert tx.run(cur, tx.admit("ABC123", "A", T, log, leaving=True))["status"] == "exited"
+    assert kinds(cur) == ["plate", "log", "slot", "daily", "monthly"]
+
+
+def test_toggle_replayed_scan_id_is_ignored():
+    cur = FakeCursor(db())
+    cur.answer = lambda sql: [] if sql.startswith("INSERT INTO processed_scans") else db()(sql)
+    assert tx.run(cur, tx.toggle("ABC123", T, False, scan_id="s1"))["status"] == "ignored"
+    assert not any("pg_advisory" in sql for sql, _ in cur.statements)
+
+
+def test_scan_id_claim_does_not_sweep_old_ids():
+    cur = FakeCursor(db())
+    tx.run(cur, tx.toggle("ABC123", T, False, scan_id="s1"))
+    assert not any("DELETE" in sql for sql, _ in cur.statements)
+
+
+def test_prune_scan_ids():
+    cur = FakeCursor(lambda sql: [{"removed": 12}])
+    assert tx.run(cur, tx.prune_scan_ids()) == 12
+    assert cur.statements[0][1] == (tx.SCAN_ID_RETENTION_DAYS,)
+
+
+def test_toggle_enters_then_exits():
+    cur = FakeCursor(db())
+    assert tx.run(cur, tx.toggle("ABC123", T, False, scan_id="s1"))["status"] == "entered"
+    log = {"id": 9, "parking_area": None, "time_in": T}
+    cur = FakeCursor(db(open_log=log))
+    assert tx.run(cur, tx.toggle("ABC123", T, True))["status"] == "exited"
+
+
+def test_asyncpg_placeholders():
+    assert tx.to_asyncpg("a=%s AND b=%s", ("x", 1)) == ("a=$1 AND b=$2", ["x", 1])
+    sql, args = tx.to_asyncpg("a=%(q)s OR b=%(q)s LIMIT %(n)s", {"q": "x", "n": 5})
+    assert (sql, args) == ("a=$1 OR b=$1 LIMIT $2", ["x", 5])
+
+
+def test_run_async_matches_run():
+    class Conn:
+        def __init__(self):
+            self.cur = FakeCursor(db())
+
+        async def fetch(self, sql, *args):
+            self.cur.execute(sql.replace("$1", "%s"), args)
+            return self.cur.fetchall() or []
+
+    conn = Conn()
+    result = asyncio.run(tx.run_async(conn, tx.admit("ABC123", "A", T, None)))
+    assert result["status"] == "entered"
+    assert kinds(conn.cur) == ["plate", "slot", "daily", "monthly"]
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+import schema
+
+
+def plan(node_type, *children):
+    node = {"Node Type": node_type}
+    if children:
+        node["Plans"] = list(children)
+    return node
+
+
+class FakeCursor:
+    def __init__(self, plans):
+        self.plans = plans
+        self.statements = []
+        self.closed = False
+
+    def execute(self, sql, args=()):
+        self.statements.append(sql)
+        self._label = sql
+
+    def fetchone(self):
+        return [[{"Plan": self.plans(self._label)}]]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConn:
+    def __init__(self, plans):
+        self.cur = FakeCursor(plans)
+        self.rolled_back = False
+
+    def cursor(self):
+        return self.cur
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_nested_index_nodes_count_as_indexed():
+    bitmap = plan("Bitmap Heap Scan", plan("Bitmap Index Scan"))
+    conn = FakeConn(lambda sql: plan("Limit", plan("Sort", bitmap)))
+    results = schema.check_index_usage(conn)
+
+    assert len(results) == len(schema.INDEXED_QUERIES)
+    assert all(indexed for _, indexed, _ in results)
+    assert results[0][2] == ["Limit", "Sort", "Bitmap Heap Scan", "Bitmap Index Scan"]
+
+
+def test_any_seq_scan_fails_the_query():
+    def plans(sql):
+        if "ILIKE" in sql:
+            return plan("Hash Join", plan("Seq Scan"), plan("Index Scan"))
+        return plan("Index Only Scan")
+
+    results = schema.check_index_usage(FakeConn(plans))
+    failed = {label for label, indexed, _ in results if not indexed}
+    assert failed == {label for label, sql, _ in schema.INDEXED_QUERIES if "ILIKE" in sql}
+
+
+def test_plan_without_an_index_node_fails():
+    results = schema.check_index_usage(FakeConn(lambda sql: plan("Result")))
+    assert not any(indexed for _, indexed, _ in results)
+
+
+def test_seqscan_is_disabled_and_rolled_back():
+    conn = FakeConn(lambda sql: plan("Index Scan"))
+    schema.check_index_usage(conn)
+
+    assert conn.cur.statements[0] == "SET LOCAL enable_seqscan = off"
+    assert all(sql.startswith("EXPLAIN (FORMAT JSON) ") for sql in conn.cur.statements[1:])
+    assert conn.rolled_back and conn.cur.closed
+
+
+# Against a real database: TEST_DATABASE_URL="dbname=parking_test user=postgres"
+# (the schema is migrated in place, so point it at a scratch database).
+@pytest.mark.skipif(not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_indexed_queries_use_an_index():
+    psycopg2 = pytest.importorskip("psycopg2")
+    conn = psycopg2.connect(os.environ["TEST_DATABASE_URL"])
+    try:
+        schema.migrate(conn)
+        results = schema.check_index_usage(conn)
+    finally:
+        conn.close()
+
+    seq = [f"{label}: {' > '.join(nodes)}" for label, indexed, nodes in results if not indexed]
+    assert not seq
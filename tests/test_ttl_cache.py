@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+import ttl_cache
+from ttl_cache import TTLCache
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def cache(clock, monkeypatch):
+    monkeypatch.setattr(ttl_cache, "time", clock)
+    return TTLCache(ttl=10, max_size=3)
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.set("a", 1)
+    clock.advance(9.9)
+    assert cache.get("a") == 1
+    clock.advance(0.2)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_per_key_ttl(cache, clock):
+    cache.set("short", 1, ttl=1)
+    cache.set("long", 2)
+    clock.advance(2)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+
+
+def test_evicts_least_recently_used(cache):
+    for key in "abc":
+        cache.set(key, key)
+    cache.get("a")
+    cache.set("d", "d")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_get_or_load_caches_until_expiry(cache, clock):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_load("k", loader) == 1
+    assert cache.get_or_load("k", loader) == 1
+    clock.advance(11)
+    assert cache.get_or_load("k", loader) == 2
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_load(cache):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+    leader.start()
+    assert started.wait(5)
+
+    followers = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+        for _ in range(5)
+    ]
+    for t in followers:
+        t.start()
+    wait_until(lambda: cache.stats()["coalesced"] == 5)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert results == ["value"] * 6
+    assert len(calls) == 1
+    assert cache.stats()["loads"] == 1
+
+
+def test_load_error_reaches_waiters_and_is_not_cached(cache):
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("db down")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_load("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    wait_until(lambda: cache.stats()["coalesced"] == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ["db down", "db down"]
+    assert cache.get_or_load("k", lambda: "ok") == "ok"
+
+
+def test_invalidate_during_load_is_not_stored(cache):
+    def loader():
+        cache.invalidate("k")
+        return "stale"
+
+    assert cache.get_or_load("k", loader) == "stale"
+    assert cache.get("k") is None
+    assert cache.get_or_load("k", lambda: "fresh") == "fresh"
+    assert cache.get("k") == "fresh"
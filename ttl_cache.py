@@ -0,0 +1,126 @@
+# ttl_cache.py
+# Small in-process cache for read-mostly query results.
+#
+# Entries expire `ttl` seconds after they were stored (per key if given); the
+# cache is bounded and evicts least-recently-used keys first.
+#
+# get_or_load() is read-through with single-flight: when many requests miss
+# the same key at once, one of them runs the loader and the rest wait for its
+# result instead of all hitting the database. invalidate() drops keys, and a
+# load that was already running when its key got invalidated is returned to
+# its callers but not stored, so a stale result can't outlive the write.
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, ttl, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()     # key -> (expires, value)
+        self._flights = {}              # key -> _Flight for loads in progress
+        self._generations = {}          # key -> times invalidated
+        self._stats = {
+            "hits": 0, "misses": 0, "evictions": 0,
+            "loads": 0, "load_errors": 0, "coalesced": 0, "invalidations": 0,
+        }
+
+    def _lookup(self, key, now):
+        # caller holds the lock
+        entry = self._items.get(key, _MISSING)
+        if entry is not _MISSING and entry[0] > now:
+            self._items.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+        if entry is not _MISSING:
+            del self._items[key]
+        self._stats["misses"] += 1
+        return _MISSING
+
+    def _store(self, key, value, ttl):
+        # caller holds the lock
+        self._items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is not _MISSING:
+                return value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generations.get(key, 0)
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats["load_errors"] += 1
+            raise
+        else:
+            with self._lock:
+                self._stats["loads"] += 1
+                if self._generations.get(key, 0) == generation:
+                    self._store(key, flight.value, ttl)
+            return flight.value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+                if key in self._flights:
+                    self._generations[key] = self._generations.get(key, 0) + 1
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in self._flights:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._items)
+        lookups = s["hits"] + s["misses"]
+        s["hit_ratio"] = round(s["hits"] / lookups, 4) if lookups else None
+        return s